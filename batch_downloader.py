@@ -4,105 +4,410 @@ Pinterest Image Downloader - Batch Mode
 This script allows you to provide multiple Pinterest URLs in a file or as command-line arguments.
 """
 
-import asyncio
+import argparse
+import itertools
+import json
 import sys
 import os
-from pinterest_downloader import PinterestDownloader
+from storage_layout import LAYOUTS, DEDUP_MODES
+from image_resolution import RESOLUTIONS
+from output_sinks import ARCHIVE_FORMATS, DEFAULT_SHARD_SIZE, build_sink
+from page_profile import PROFILES, WAIT_CONDITIONS, build_profile
+from downloader_options import group_options
+
+# Input URLs must contain one of these host names; tests add their local stub server
+PINTEREST_HOSTS = ('pinterest.com',)
+
+def is_pinterest_url(url):
+    """Return True if url contains one of PINTEREST_HOSTS."""
+    return any(host in url for host in PINTEREST_HOSTS)
 
 def read_urls_from_file(filepath):
     """Read URLs from a text file."""
-    urls = []
+    return list(iter_urls_from_file(filepath))
+
+def iter_urls_from_file(filepath):
+    """Yield the URLs of a text file one line at a time, without loading the whole file."""
     try:
         with open(filepath, 'r', encoding='utf-8') as f:
             for line in f:
                 line = line.strip()
-                if line and 'pinterest.com' in line:
-                    urls.append(line)
-        return urls
+                if line and is_pinterest_url(line):
+                    yield line
     except Exception as e:
         print(f"Error reading file {filepath}: {e}")
-        return []
 
-async def batch_download(urls, output_folder=None):
-    """Download images from multiple Pinterest URLs."""
-    if not urls:
+async def batch_download(urls, output_folder=None, archive=None, shard_size=DEFAULT_SHARD_SIZE, **options):
+    """Download images from multiple Pinterest URLs.
+    
+    Extra keyword options are PinterestDownloader settings by their flat
+    names (see downloader_options.group_options). urls may also be an
+    iterator, which is consumed lazily. archive ('zip', 'tar' or
+    'webdataset') writes the images into an archive in the output folder
+    instead of loose files; webdataset shards roll over at shard_size bytes.
+    """
+    if isinstance(urls, list) and not urls:
         print("No valid Pinterest URLs provided!")
         return
     
     print(f"Pinterest Batch Image Downloader")
     print("=" * 50)
-    print(f"Processing {len(urls)} URL(s)...")
+    if isinstance(urls, list):
+        print(f"Processing {len(urls)} URL(s)...")
+    else:
+        print("Processing URLs as they are read...")
+    
+    # Imported here so that --help and argument errors do not wait for the downloader's dependencies
+    from pinterest_downloader import PinterestDownloader
+    
+    if archive:
+        if options.get('post_process') or options.get('perceptual_dedup'):
+            # Checked before build_sink, which creates the archive file
+            raise ValueError("post_process and perceptual_dedup need files and cannot write to an archive")
+        options['sink'] = build_sink(archive, output_folder or os.path.join(os.getcwd(), "downloads"), shard_size)
     
     # Create downloader
-    downloader = PinterestDownloader(download_folder=output_folder)
+    downloader = PinterestDownloader(download_folder=output_folder, **group_options(options))
     
     # Process all URLs
-    summary = await downloader.process_pinterest_urls(urls)
+    try:
+        summary = await downloader.process_pinterest_urls(urls)
+    finally:
+        downloader.close()
+    
+    print_summary(summary)
+    return summary
+
+def submit_to_daemon(urls, output_folder=None, daemon_url=None, priority=0, **options):
+    """Hand the URLs to a running download service as one job and follow it until it ends.
+    
+    Ctrl+C cancels the job. Options the service sets itself (browser pages,
+    page profile, headless, metrics port) are ignored. daemon_url defaults to the
+    service's local address.
+    """
+    from download_daemon import DaemonClient, DaemonError, DEFAULT_URL, split_job_options
     
-    # Print detailed summary
+    daemon_url = daemon_url or DEFAULT_URL
+    client = DaemonClient(daemon_url)
+    job_options, ignored = split_job_options(options)
+    if ignored:
+        print(f"Ignoring options set by the service itself: {', '.join(ignored)}")
+    try:
+        job_id = client.submit(urls, output_folder, priority=priority, **job_options)
+    except DaemonError as e:
+        print(f"Error: {e}")
+        print("Start the service with: python download_daemon.py")
+        return
+    print(f"Submitted job {job_id} with {len(urls)} URL(s) to {daemon_url}")
+    
+    shown = [None]
+    def show(status):
+        progress = status.get('progress')
+        if status['status'] == 'queued':
+            line = "Waiting in the queue..."
+        elif progress and progress['total']:
+            line = f"{progress['done']}/{progress['total']} images ({progress['failed']} failed)"
+        else:
+            return
+        if line != shown[0]:
+            print(line)
+            shown[0] = line
+    
+    try:
+        status = client.wait(job_id, on_status=show)
+    except KeyboardInterrupt:
+        client.cancel(job_id)
+        print(f"Cancelled job {job_id}")
+        return
+    except DaemonError as e:
+        print(f"Error: {e}")
+        return
+    
+    if status['status'] != 'done':
+        print(f"Job {job_id} {status['status']}" + (f": {status['error']}" if status['error'] else ""))
+        return
+    print_summary(status['summary'])
+    return status['summary']
+
+def print_summary(summary):
+    """Print the detailed summary of a finished batch."""
     print("\n" + "=" * 50)
     print("BATCH DOWNLOAD SUMMARY")
     print("=" * 50)
     print(f"Successfully downloaded: {summary['downloaded_count']} images")
     print(f"Failed downloads: {summary['failed_count']}")
-    print(f"Images saved to: {summary['download_folder']}")
+    print(f"Already downloaded (skipped): {summary['skipped_count']}")
+    print(f"Duplicate content: {summary['duplicate_count']}")
+    if summary['variant_counts']:
+        variants = ", ".join(f"{variant}: {count}" for variant, count in summary['variant_counts'].items())
+        print(f"Resolutions used: {variants} ({summary['probe_count']} HEAD probes)")
+    if summary['unchanged_count'] or summary['resumed_count']:
+        print(f"Unchanged (304): {summary['unchanged_count']}, resumed transfers: {summary['resumed_count']}")
+    if summary.get('post_processed_count') or summary.get('rejected_count'):
+        print(f"Post-processed: {summary['post_processed_count']}, "
+              f"rejected as invalid: {summary['rejected_count']}")
+    if summary['retry_count'] or summary['breaker_trips']:
+        print(f"Retries: {summary['retry_count']} ({summary['throttled_count']} throttled), "
+              f"pauses: {summary['breaker_trips']}")
+    if summary.get('archive'):
+        print(f"Images archived to: {summary['archive']}")
+    else:
+        print(f"Images saved to: {summary['download_folder']}")
+    print(f"Throughput: {summary['images_per_second']:.2f} images/s, "
+          f"{summary['mb_per_second']:.2f} MB/s "
+          f"({summary['bytes_downloaded'] / (1024 * 1024):.1f} MB in {summary['elapsed_seconds']:.1f}s)")
+    timed = {stage: t for stage, t in summary['stage_timings'].items() if t['count']}
+    if timed:
+        print("Time per stage:")
+        for stage, t in timed.items():
+            print(f"  {stage:<9} {t['count']:>5} x, total {t['sum']:.1f}s, p50 <= {t['p50']}s, "
+                  f"p95 <= {t['p95']}s, max {t['max']:.2f}s")
     
-    if summary['downloaded_files']:
+    if summary['downloaded_count']:
         print(f"\nDownloaded files:")
-        for file in summary['downloaded_files'][:10]:  # Show first 10
+        for file in itertools.islice(summary['downloaded_files'], 10):  # Show first 10
             print(f"  - {os.path.basename(file)}")
-        if len(summary['downloaded_files']) > 10:
-            print(f"  ... and {len(summary['downloaded_files']) - 10} more files")
+        if summary['downloaded_count'] > 10:
+            print(f"  ... and {summary['downloaded_count'] - 10} more files")
     
-    if summary['failed_urls']:
+    if summary['failed_count']:
+        # A streaming run may have failed on far too many URLs to list
+        shown = 10 if summary['results_file'] else None
         print(f"\nFailed URLs:")
-        for url in summary['failed_urls']:
+        for url in itertools.islice(summary['failed_urls'], shown):
             print(f"  - {url}")
+        if shown and summary['failed_count'] > shown:
+            print(f"  ... and {summary['failed_count'] - shown} more")
     
-    return summary
+    if summary['results_file']:
+        print(f"\nPer-image results: {summary['results_file']}")
+
+# Numeric command-line options, the PinterestDownloader setting each one controls and its help
+INT_OPTIONS = {
+    '--concurrency': ('concurrency', "images downloaded at the same time (default: 8)"),
+    '--pages': ('page_pool_size', "browser pages visiting URLs in parallel (default: 1)"),
+    '--max-scrolls': ('max_scrolls', "scrolls per page at most (default: 50)"),
+    '--max-pins': ('max_pins', "pins per page at most"),
+    '--scroll-budget': ('scroll_time_budget', "seconds of scrolling per page at most (default: 60)"),
+    '--max-bytes': ('max_bytes', "skip image variants larger than this many bytes"),
+    '--max-retries': ('max_retries', "retries of a throttled or failed download (default: 4)"),
+    '--rate-limit': ('rate_limit', "requests per second to each image host"),
+    '--metrics-port': ('metrics_port', "serve Prometheus metrics on this port"),
+}
+
+# Flags that switch a PinterestDownloader setting, the value they set and their help
+FLAG_OPTIONS = {
+    '--show-browser': ('headless', False, "show the browser window"),
+    '--dom-only': ('intercept_network', False, "read images from the page only, not its network responses"),
+    '--browser-only': ('http_first', False, "always use the browser, without trying plain HTTP first"),
+    '--no-probe': ('probe_resolutions', False, "download the URLs found without probing for larger variants"),
+    '--no-adaptive': ('adaptive_concurrency', False, "keep the connections per host fixed"),
+    '--no-manifest': ('use_manifest', False, "keep no manifest, so everything is downloaded again"),
+    '--no-resume': ('resume', False, "start over instead of resuming an interrupted run"),
+    '--revalidate': ('revalidate', True, "re-request downloaded images and update the ones that changed"),
+    '--stream': ('streaming', True, "keep memory flat on very large batches"),
+}
 
-def main():
+# Parsed arguments that are not PinterestDownloader settings
+CLI_ARGUMENTS = ('urls', 'url_files', 'output_folder', 'list_only', 'daemon', 'daemon_url', 'priority')
+
+# Parsed arguments passed to build_stages
+POST_ARGUMENTS = ('verify', 'transcode', 'metadata', 'max_side', 'thumbnails')
+
+# Options that need loose files, so they cannot be combined with --archive
+ARCHIVE_CONFLICTS = {
+    'verify': '--verify', 'transcode': '--transcode', 'max_side': '--max-side',
+    'thumbnails': '--thumbnails', 'metadata': '--image-metadata',
+    'post_process_workers': '--post-workers', 'perceptual_threshold': '--perceptual-dedup',
+}
+
+# Parsed arguments passed to build_profile
+PROFILE_ARGUMENTS = ('page_profile', 'block_images', 'wait_until', 'storage_state', 'cache_dir')
+
+def _number(text):
+    """argparse type for a whole number of at least zero."""
+    if not text.isdigit():
+        raise argparse.ArgumentTypeError(f"expected a number, got {text!r}")
+    return int(text)
+
+def _size(unit):
+    """argparse type for a positive size in units of unit bytes, returned in bytes."""
+    def parse(text):
+        value = _number(text)
+        if not value:
+            raise argparse.ArgumentTypeError("must be more than 0")
+        return value * unit
+    return parse
+
+def build_parser():
+    """Return the command-line parser.
+    
+    Options that are not given are left out of the parsed namespace, so
+    PinterestDownloader keeps its own defaults for them.
+    """
+    parser = argparse.ArgumentParser(
+        prog="batch_downloader.py", argument_default=argparse.SUPPRESS,
+        description="Download the images of Pinterest pins, boards and searches.",
+        epilog="Example: python batch_downloader.py --file urls.txt --output my_images --concurrency 16")
+    parser.add_argument('urls', nargs='*', default=[], metavar='URL', help="Pinterest URLs to download from")
+    parser.add_argument('--file', dest='url_files', action='append', default=[], metavar='FILE',
+                        help="text file with one URL per line; may be given more than once")
+    parser.add_argument('--output', dest='output_folder', default=None, metavar='FOLDER',
+                        help="download folder (default: ./downloads)")
+    parser.add_argument('--dry-run', '--list-only', dest='list_only', action='store_true', default=False,
+                        help="print the image URLs found as JSON lines instead of downloading them")
+    
+    downloading = parser.add_argument_group("scraping and downloading")
+    for flag, (setting, help_text) in INT_OPTIONS.items():
+        downloading.add_argument(flag, dest=setting, type=_number, metavar='N', help=help_text)
+    for flag, (setting, value, help_text) in FLAG_OPTIONS.items():
+        downloading.add_argument(flag, dest=setting, action='store_const', const=value, help=help_text)
+    downloading.add_argument('--max-resolution', choices=RESOLUTIONS,
+                             help="largest variant to download (default: originals)")
+    downloading.add_argument('--metrics-file', metavar='FILE', help="append metrics to this JSON-lines file")
+    downloading.add_argument('--results-file', metavar='FILE',
+                             help="per-image results of a --stream run (default: in the download folder)")
+    
+    storage = parser.add_argument_group("storage")
+    storage.add_argument('--dedup', choices=DEDUP_MODES,
+                         help="what to do with content already downloaded (default: skip)")
+    storage.add_argument('--perceptual-dedup', dest='perceptual_threshold', type=_number, metavar='BITS',
+                         help="also treat images whose dHash differs in at most BITS bits as duplicates")
+    storage.add_argument('--layout', choices=LAYOUTS, help="folder layout of the download folder (default: flat)")
+    storage.add_argument('--archive', choices=ARCHIVE_FORMATS, help="write the images into an archive instead of files")
+    storage.add_argument('--shard-size', type=_size(1024 * 1024), metavar='MB',
+                         help="size at which a webdataset shard is rolled over (default: 512)")
+    storage.add_argument('--write-buffer', type=_size(1024), metavar='KIB',
+                         help="file write buffer in KiB (default: 256)")
+    
+    post = parser.add_argument_group("post-processing")
+    post.add_argument('--verify', action='store_true', help="delete truncated files and error pages saved as images")
+    post.add_argument('--transcode', action='store_true', help="convert WebP to JPEG")
+    post.add_argument('--max-side', type=_number, metavar='PX', help="shrink images larger than PX pixels")
+    post.add_argument('--thumbnails', type=_number, metavar='PX', help="write thumbnails of PX pixels")
+    post.add_argument('--image-metadata', dest='metadata', action='store_true',
+                      help="record dimensions, format and EXIF tags")
+    post.add_argument('--post-workers', dest='post_process_workers', type=_number, metavar='N',
+                      help="post-processing processes (default: one per CPU)")
+    
+    browser = parser.add_argument_group("browser pages")
+    browser.add_argument('--page-profile', choices=PROFILES,
+                         help="'lean' skips fonts, video and third-party requests and reads the page "
+                              "once pins appear (default: full)")
+    browser.add_argument('--block-images', action='store_true',
+                         help="do not load images in the browser; their URLs are still found")
+    browser.add_argument('--wait-until', choices=WAIT_CONDITIONS,
+                         help="what navigation waits for before scrolling (default: set by the profile)")
+    browser.add_argument('--browser-state', dest='storage_state', metavar='FILE',
+                         help="load cookies and storage from FILE and save them back after the run")
+    browser.add_argument('--browser-cache', dest='cache_dir', metavar='FOLDER',
+                         help="keep the browser profile and HTTP cache in FOLDER between runs")
+    
+    service = parser.add_argument_group("background service")
+    service.add_argument('--daemon', action='store_true', default=False, help="send the batch to the download service")
+    service.add_argument('--daemon-url', default=None, metavar='URL',
+                         help="address of the download service (implies --daemon)")
+    service.add_argument('--priority', type=int, default=0, help="job priority; higher runs first (default: 0)")
+    return parser
+
+async def list_images(urls, output_folder=None, archive=None, shard_size=None, **options):
+    """Print every image URL found on the input URLs as a JSON line, without downloading anything.
+    
+    Progress messages go to stderr, so stdout can be piped to a file.
+    Returns the number of images found.
+    """
+    import tempfile
+    from pinterest_downloader import PinterestDownloader
+    from download_events import ConsoleReporter
+    
+    options.update(use_manifest=False, quiet=True, on_event=ConsoleReporter(sys.stderr))
+    
+    def show(url, pin_id, source):
+        print(json.dumps({"url": url, "pin_id": pin_id, "source": source}))
+    
+    with tempfile.TemporaryDirectory(prefix='pinterest-dry-run-') as scratch:
+        if options.get('streaming'):
+            # Nothing is downloaded, so the results spool stays out of the download folder
+            options['results_file'] = os.path.join(scratch, "results.jsonl")
+        downloader = PinterestDownloader(download_folder=output_folder, **group_options(options))
+        try:
+            count = await downloader.list_images(urls, show)
+        finally:
+            downloader.close()
+    print(f"Found {count} images", file=sys.stderr)
+    return count
+
+def main(argv=None):
     """Main function for batch processing."""
-    if len(sys.argv) < 2:
-        print("Usage:")
-        print("  python batch_downloader.py <url1> [url2] [url3] ...")
-        print("  python batch_downloader.py --file <urls_file.txt>")
-        print("  python batch_downloader.py --file <urls_file.txt> --output <output_folder>")
-        return
+    parser = build_parser()
+    args = vars(parser.parse_args(argv))
+    if not args['urls'] and not args['url_files']:
+        if len(sys.argv if argv is None else argv) <= 1:
+            parser.print_help()
+            return
+        parser.error("give Pinterest URLs or --file")
+    if 'archive' in args:
+        conflicts = [flag for key, flag in ARCHIVE_CONFLICTS.items() if key in args]
+        if conflicts:
+            parser.error(f"--archive writes no loose files, so it cannot be combined with {', '.join(conflicts)}")
+    if 'post_process_workers' in args and not any(key in args for key in POST_ARGUMENTS):
+        parser.error("--post-workers needs a post-processing option such as --verify or --thumbnails")
     
     urls = []
-    output_folder = None
+    for url in args['urls']:
+        if is_pinterest_url(url):
+            urls.append(url)
+        else:
+            print(f"Skipping {url}: not a Pinterest URL", file=sys.stderr)
+    url_files = args['url_files']
+    output_folder = args['output_folder']
+    post_options = {key: args[key] for key in POST_ARGUMENTS if key in args}
+    profile_options = {key: args[key] for key in PROFILE_ARGUMENTS if key in args}
+    options = {key: value for key, value in args.items()
+               if key not in CLI_ARGUMENTS + POST_ARGUMENTS + PROFILE_ARGUMENTS}
+    if 'perceptual_threshold' in options:
+        options['perceptual_dedup'] = True
+    if profile_options:
+        # Without --page-profile the other options adjust the default (full) profile
+        options['page_profile'] = build_profile(profile_options.pop('page_profile', 'full'), **profile_options)
     
-    # Parse command line arguments
-    i = 1
-    while i < len(sys.argv):
-        arg = sys.argv[i]
-        
-        if arg == '--file':
-            if i + 1 < len(sys.argv):
-                urls.extend(read_urls_from_file(sys.argv[i + 1]))
-                i += 1
-            else:
-                print("Error: --file requires a filename")
-                return
-        elif arg == '--output':
-            if i + 1 < len(sys.argv):
-                output_folder = sys.argv[i + 1]
-                i += 1
-            else:
-                print("Error: --output requires a folder path")
-                return
-        elif 'pinterest.com' in arg:
-            urls.append(arg)
+    # Loaded only now, so --help and bad arguments return at once
+    import asyncio
+    
+    if args['list_only']:
+        urls = itertools.chain(urls, *(iter_urls_from_file(path) for path in url_files))
+        asyncio.run(list_images(urls, output_folder, **options))
+        return
+    
+    if post_options:
+        from post_processing import build_stages
         
-        i += 1
+        # Later stages decode the image anyway, so it is always verified first
+        post_options['verify'] = True
+        options['post_process'] = build_stages(**post_options)
     
-    if not urls:
-        print("No valid Pinterest URLs found!")
+    if args['daemon'] or args['daemon_url']:
+        # The job is sent to the service as a whole, so read every URL now
+        for path in url_files:
+            urls.extend(read_urls_from_file(path))
+        if not urls:
+            print("No valid Pinterest URLs found!")
+            return
+        submit_to_daemon(urls, output_folder, args['daemon_url'], args['priority'], **options)
         return
     
+    if options.get('streaming'):
+        # Read URL files lazily instead of loading them up front
+        urls = itertools.chain(urls, *(iter_urls_from_file(path) for path in url_files))
+    else:
+        for path in url_files:
+            urls.extend(read_urls_from_file(path))
+        if not urls:
+            print("No valid Pinterest URLs found!")
+            return
+    
     # Run the batch download
-    asyncio.run(batch_download(urls, output_folder))
+    asyncio.run(batch_download(urls, output_folder, **options))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,521 @@
+#!/usr/bin/env python3
+"""
+Pinterest Image Downloader - Benchmark
+Runs the real batch download path against a local stand-in for Pinterest
+(infinite-scroll board pages, resource endpoints and an image CDN with
+configurable latency, bandwidth and error injection) and reports pins/s,
+MB/s, time to first byte, peak memory, browser time and page traffic per URL
+as JSON that can be compared between versions.
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# Size of each CDN variant relative to the original
+VARIANT_SCALE = {'originals': 1.0, '1200x': 0.8, '736x': 0.5, '564x': 0.35, '236x': 0.1}
+
+# Named scenarios: fake server settings and PinterestDownloader options
+SCENARIOS = {
+    "http": {"server": {}, "downloader": {"http_first": True}},
+    "http-errors": {"server": {"error_rate": 0.05}, "downloader": {"http_first": True}},
+    "http-streaming": {"server": {}, "downloader": {"http_first": True, "streaming": True}},
+    "http-archive": {"server": {}, "downloader": {"http_first": True, "archive": "webdataset"}},
+    "browser": {"server": {}, "downloader": {"http_first": False}},
+    "browser-lean": {"server": {}, "downloader": {"http_first": False, "page_profile": "lean"}},
+}
+
+# Entry-point modules checked by --startup, and the heavy dependencies each
+# must not load at import time
+STARTUP_MODULES = {
+    "batch_downloader": ("requests", "playwright", "PIL", "asyncio"),
+    "pinterest_downloader": ("requests", "playwright", "PIL"),
+}
+
+# Import time allowed for each entry-point module, in seconds
+STARTUP_BUDGET_SECONDS = 0.3
+
+# Fresh interpreters started per module by --startup; the fastest counts
+STARTUP_RUNS = 3
+
+# Result fields compared by --compare, and whether higher is better
+COMPARED_FIELDS = {
+    "pins_per_second": True,
+    "mb_per_second": True,
+    "time_to_first_byte": False,
+    "wall_seconds": False,
+    "peak_rss_mb": False,
+    "browser_seconds_mean": False,
+    "page_mb_per_url": False,
+}
+
+# Page resources the scraper does not need, as real boards load them: served
+# under /static/, the script from another host name so it counts as third-party
+STATIC_ASSETS = {
+    "board.woff2": ('font/woff2', 64 * 1024),
+    "intro.mp4": ('video/mp4', 512 * 1024),
+    "analytics.js": ('application/javascript', 32 * 1024),
+}
+
+BOARD_PAGE = """<html><head><title>{title}</title>
+<style>@font-face {{ font-family: 'Board'; src: url('/static/board.woff2'); }}
+body {{ font-family: 'Board', sans-serif; }}</style>
+<script src="{third_party}/static/analytics.js" async></script>
+</head><body>
+<h1>{title}</h1>
+<video src="/static/intro.mp4" preload="auto" muted></video>
+<div id="grid">{images}</div>
+<script id="__PWS_INITIAL_PROPS__" type="application/json">{props}</script>
+<script>
+let bookmark = {bookmark};
+let loading = false;
+window.addEventListener('scroll', async () => {{
+    if (loading || bookmark === '-end-' ||
+        window.innerHeight + window.scrollY < document.body.scrollHeight - 200) return;
+    loading = true;
+    const data = JSON.stringify({{options: {{board_id: {board_id}, page_size: {page_size},
+                                             bookmarks: [bookmark]}}, context: {{}}}});
+    const params = new URLSearchParams({{source_url: location.pathname, data: data}});
+    const body = await (await fetch('/resource/BoardFeedResource/get/?' + params)).json();
+    for (const pin of body.resource_response.data) {{
+        document.getElementById('grid').insertAdjacentHTML('beforeend', pinImage(pin.images['236x'].url));
+    }}
+    bookmark = body.resource_response.bookmark;
+    loading = false;
+}});
+function pinImage(src) {{ return '<img src="' + src + '" width="236" height="300" style="display:block">'; }}
+</script>
+</body></html>"""
+
+PIN_IMAGE = '<img src="{src}" width="236" height="300" style="display:block">'
+
+class FakePinterest:
+    """Local stand-in for Pinterest boards and the i.pinimg.com CDN.
+
+    Boards live at /bench/board-<n>/ and hold pins_per_board pins, served
+    page_size at a time: the first page is embedded in the HTML, the rest
+    come from /resource/BoardFeedResource/get/ with a bookmark cursor, which
+    the page also calls when scrolled to the bottom. Images are served under
+    /i.pinimg.com/<variant>/... after latency_ms, at bandwidth_kbps per
+    connection (0 for unlimited), and error_rate of the image requests get a
+    429 or 503 instead. Board pages also load a font, a video and a script
+    from "localhost", a host other than the page's.
+    """
+
+    def __init__(self, boards=4, pins_per_board=200, page_size=25, image_kb=64, latency_ms=0,
+                 bandwidth_kbps=0, error_rate=0.0, seed=0, port=0):
+        self.boards = boards
+        self.pins_per_board = pins_per_board
+        self.page_size = page_size
+        self.image_kb = image_kb
+        self.latency_ms = latency_ms
+        self.bandwidth_kbps = bandwidth_kbps
+        self.error_rate = error_rate
+        self.port = port
+        self.stats = {"requests": 0, "image_requests": 0, "asset_requests": 0, "injected_errors": 0,
+                      "bytes_sent": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def board_urls(self):
+        return [f"{self.base_url}/bench/board-{n}/" for n in range(self.boards)]
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                fake.handle(self, send_body=True)
+
+            def do_HEAD(self):
+                fake.handle(self, send_body=False)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def _pin(self, board, index):
+        digest = hashlib.md5(f"{board}-{index}".encode()).hexdigest()
+        path = f"{digest[0:2]}/{digest[2:4]}/{digest[4:6]}/{digest}"
+        cdn = f"{self.base_url}/i.pinimg.com"
+        return {
+            "id": f"{board}{index:06d}",
+            "type": "pin",
+            "images": {
+                "236x": {"url": f"{cdn}/236x/{path}.jpg", "width": 236},
+                "orig": {"url": f"{cdn}/originals/{path}.jpg", "width": 1200},
+            }
+        }
+
+    def _pins(self, board, start):
+        end = min(start + self.page_size, self.pins_per_board)
+        bookmark = str(end) if end < self.pins_per_board else "-end-"
+        return [self._pin(board, i) for i in range(start, end)], bookmark
+
+    def handle(self, request, send_body):
+        self._count("requests")
+        parsed = urlparse(request.path)
+        parts = [p for p in parsed.path.split('/') if p]
+        if parts[:1] == ['i.pinimg.com'] and len(parts) == 6 and parts[1] in VARIANT_SCALE:
+            self._send_image(request, parts[1], parts[5].rsplit('.', 1)[0], send_body)
+        elif parts[:1] == ['bench'] and len(parts) == 2 and parts[1].startswith('board-'):
+            self._send_board(request, parts[1], send_body)
+        elif parts[:1] == ['static'] and len(parts) == 2 and parts[1] in STATIC_ASSETS:
+            self._count("asset_requests")
+            content_type, size = STATIC_ASSETS[parts[1]]
+            # Comment lines, so the script parses
+            body = (b'// padding\n' * (size // 11 + 1))[:size]
+            self._send(request, body, content_type, send_body)
+        elif parts[:3] == ['resource', 'BoardFeedResource', 'get']:
+            options = json.loads(parse_qs(parsed.query)['data'][0])["options"]
+            bookmark = (options.get("bookmarks") or [None])[0]
+            # No bookmark means the page after the one embedded in the HTML
+            start = int(bookmark) if bookmark and bookmark.isdigit() else self.page_size
+            pins, next_bookmark = self._pins(options["board_id"], start)
+            body = {"resource_response": {"data": pins, "bookmark": next_bookmark}}
+            self._send(request, json.dumps(body).encode(), 'application/json', send_body)
+        else:
+            self._send(request, b'Not found', 'text/plain', send_body, status=404)
+
+    def _send_board(self, request, board, send_body):
+        pins, bookmark = self._pins(board, 0)
+        props = {"props": {"initialReduxState": {
+            "boards": {board: {"id": board, "type": "board", "url": f"/bench/{board}/"}},
+            "pins": pins
+        }}}
+        html = BOARD_PAGE.format(
+            title=board,
+            third_party=f"http://localhost:{self.port}",
+            images="".join(PIN_IMAGE.format(src=pin["images"]["236x"]["url"]) for pin in pins),
+            props=json.dumps(props),
+            bookmark=json.dumps(bookmark),
+            board_id=json.dumps(board),
+            page_size=self.page_size
+        )
+        self._send(request, html.encode('utf-8'), 'text/html; charset=utf-8', send_body)
+
+    def _send_image(self, request, variant, digest, send_body):
+        self._count("image_requests")
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        with self._lock:
+            failed = self._random.random() < self.error_rate
+        if failed:
+            self._count("injected_errors")
+            request.send_response(self._random.choice((429, 503)))
+            request.send_header('Retry-After', '1')
+            request.send_header('Content-Length', '0')
+            request.end_headers()
+            return
+        size = max(1, int(self.image_kb * 1024 * VARIANT_SCALE[variant]))
+        body = (digest.encode() * (size // len(digest) + 1))[:size]
+        self._send(request, body, 'image/jpeg', send_body, etag=f'"{digest}-{variant}"')
+
+    def _send(self, request, body, content_type, send_body, status=200, etag=None):
+        request.send_response(status)
+        request.send_header('Content-Type', content_type)
+        request.send_header('Content-Length', str(len(body)))
+        if etag:
+            request.send_header('ETag', etag)
+        request.end_headers()
+        if not send_body:
+            return
+        chunk_size = 16 * 1024
+        try:
+            for start in range(0, len(body), chunk_size):
+                chunk = body[start:start + chunk_size]
+                request.wfile.write(chunk)
+                self._count("bytes_sent", len(chunk))
+                if self.bandwidth_kbps:
+                    time.sleep(len(chunk) / (self.bandwidth_kbps * 1024))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+class BenchmarkRecorder:
+    """Event listener that notes the first image byte, the browser time per URL and page traffic."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.first_byte = None
+        self.browser_seconds = {}
+        self.page_traffic = {"requests": 0, "blocked": 0, "bytes": 0}
+        self._page_started = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        from download_events import BytesReceived, PageStarted, PageFinished, PageTraffic
+        now = time.monotonic()
+        with self._lock:
+            if isinstance(event, BytesReceived) and self.first_byte is None:
+                self.first_byte = now - self.started
+            elif isinstance(event, PageStarted) and event.method == "browser":
+                self._page_started[event.url] = now
+            elif isinstance(event, PageFinished) and event.method == "browser":
+                started = self._page_started.pop(event.url, now)
+                self.browser_seconds[event.url] = now - started
+            elif isinstance(event, PageTraffic):
+                self.page_traffic["requests"] += event.requests
+                self.page_traffic["blocked"] += event.blocked
+                self.page_traffic["bytes"] += event.bytes
+
+def peak_rss_mb():
+    """Return the peak resident memory of this process in MB, or None where unsupported."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def run_scenario(urls, options):
+    """Download urls through batch_download in this process and return the measurements."""
+    from batch_downloader import batch_download
+
+    recorder = BenchmarkRecorder()
+    folder = tempfile.mkdtemp(prefix='pinterest-benchmark-')
+    try:
+        # batch_download prints its own summary; keep the benchmark output readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.monotonic()
+            summary = asyncio.run(batch_download(urls, folder, quiet=True, on_event=recorder, **options))
+            wall = time.monotonic() - started
+    except Exception as e:
+        message = str(e).strip().splitlines()[0] if str(e).strip() else ''
+        return {"error": f"{type(e).__name__}: {message}"}
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    pins = summary['found_count'] + summary['skipped_count']
+    browser = recorder.browser_seconds
+    traffic = recorder.page_traffic
+    return {
+        "pins_found": pins,
+        "images_downloaded": summary['downloaded_count'],
+        "failed": summary['failed_count'],
+        "bytes_downloaded": summary['bytes_downloaded'],
+        "wall_seconds": round(wall, 3),
+        "pins_per_second": round(pins / wall, 2) if wall else 0.0,
+        "mb_per_second": round(summary['bytes_downloaded'] / (1024 * 1024) / wall, 3) if wall else 0.0,
+        "time_to_first_byte": round(recorder.first_byte, 3) if recorder.first_byte is not None else None,
+        "time_to_first_image": round(summary['time_to_first_image'], 3)
+        if summary['time_to_first_image'] is not None else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "browser_seconds_per_url": {url: round(s, 3) for url, s in browser.items()},
+        "browser_seconds_mean": round(sum(browser.values()) / len(browser), 3) if browser else None,
+        "page_requests": traffic["requests"],
+        "page_requests_blocked": traffic["blocked"],
+        "page_mb_per_url": round(traffic["bytes"] / (1024 * 1024) / len(browser), 3) if browser else None,
+        "retries": summary['retry_count'],
+        "stage_timings": summary['stage_timings'],
+    }
+
+def run_benchmark(scenario_names, settings, downloader_options):
+    """Run each named scenario against a fresh fake server, each in its own process."""
+    results = []
+    # A fresh interpreter per scenario keeps the peak RSS figures independent
+    context = multiprocessing.get_context('spawn')
+    for name in scenario_names:
+        scenario = SCENARIOS[name]
+        server = FakePinterest(**{**settings, **scenario["server"]}).start()
+        options = {**scenario["downloader"], **downloader_options}
+        print(f"Running {name} ({server.boards} boards x {server.pins_per_board} pins)...")
+        try:
+            with context.Pool(1) as pool:
+                result = pool.apply(run_scenario, (server.board_urls(), options))
+        finally:
+            server.stop()
+        result = {"name": name, "options": options, **result, "server": dict(server.stats)}
+        results.append(result)
+        if "error" in result:
+            print(f"  failed: {result['error']}")
+        else:
+            print(f"  {result['pins_per_second']:.1f} pins/s, {result['mb_per_second']:.2f} MB/s, "
+                  f"first byte after {result['time_to_first_byte']}s, peak RSS {result['peak_rss_mb']} MB")
+    return results
+
+def measure_startup(module):
+    """Import module in a fresh interpreter and return (seconds, heavy modules it loaded)."""
+    heavy = STARTUP_MODULES[module]
+    code = (f"import sys, time\nstarted = time.perf_counter()\nimport {module}\n"
+            f"print(time.perf_counter() - started)\n"
+            f"print(' '.join(m for m in {heavy!r} if m in sys.modules))")
+    best = None
+    loaded = []
+    for _ in range(STARTUP_RUNS):
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.splitlines()
+        seconds = float(output[0])
+        best = seconds if best is None else min(best, seconds)
+        loaded = output[1].split() if len(output) > 1 else []
+    return best, loaded
+
+def check_startup():
+    """Check every entry point against the import budget; return True if all are within it."""
+    passed = True
+    for module in STARTUP_MODULES:
+        seconds, loaded = measure_startup(module)
+        problems = []
+        if seconds > STARTUP_BUDGET_SECONDS:
+            problems.append(f"over the {STARTUP_BUDGET_SECONDS}s budget")
+        if loaded:
+            problems.append(f"loads {', '.join(loaded)} at import")
+        passed = passed and not problems
+        print(f"  {module:<22} {seconds * 1000:6.1f} ms  {'; '.join(problems) or 'ok'}")
+    return passed
+
+def git_revision():
+    """Return the current git commit of the code being benchmarked, if known."""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except Exception:
+        return None
+
+def compare(results, baseline):
+    """Print the change of each compared field against a baseline result file."""
+    previous = {r["name"]: r for r in baseline.get("scenarios", [])}
+    print(f"\nCompared with {baseline.get('revision') or 'baseline'}:")
+    for result in results:
+        old = previous.get(result["name"])
+        if old is None or "error" in old or "error" in result:
+            continue
+        for field, higher_is_better in COMPARED_FIELDS.items():
+            before, after = old.get(field), result.get(field)
+            if not before or after is None:
+                continue
+            change = (after - before) / before * 100
+            better = (change > 0) == higher_is_better
+            verdict = "better" if better and abs(change) >= 1 else "worse" if abs(change) >= 1 else "same"
+            print(f"  {result['name']:<12} {field:<22} {before:>10} -> {after:<10} ({change:+.1f}%, {verdict})")
+
+# Numeric command-line options: flag -> (setting, type, fake server or downloader option)
+NUMERIC_OPTIONS = {
+    '--boards': ('boards', int, 'server'),
+    '--pins': ('pins_per_board', int, 'server'),
+    '--page-size': ('page_size', int, 'server'),
+    '--image-kb': ('image_kb', int, 'server'),
+    '--latency-ms': ('latency_ms', int, 'server'),
+    '--bandwidth-kbps': ('bandwidth_kbps', int, 'server'),
+    '--error-rate': ('error_rate', float, 'server'),
+    '--seed': ('seed', int, 'server'),
+    '--concurrency': ('concurrency', int, 'downloader'),
+    '--pages': ('page_pool_size', int, 'downloader'),
+}
+
+def main():
+    """Main function for the benchmark."""
+    if '--help' in sys.argv or '-h' in sys.argv:
+        print("Usage:")
+        print("  python benchmark.py [--scenarios http,http-errors,http-streaming,http-archive,browser,browser-lean] [--output results.json]")
+        print("  python benchmark.py --boards <N> --pins <N> --page-size <N> --image-kb <N>")
+        print("  python benchmark.py --latency-ms <N> --bandwidth-kbps <N> --error-rate <0-1> --seed <N>")
+        print("  python benchmark.py --concurrency <N> --pages <N> --compare <previous_results.json>")
+        print("  python benchmark.py --startup")
+        return
+
+    if '--startup' in sys.argv:
+        print("Import time of the entry points:")
+        if not check_startup():
+            sys.exit(1)
+        return
+
+    scenario_names = list(SCENARIOS)
+    settings = {"boards": 4, "pins_per_board": 200, "latency_ms": 20}
+    downloader_options = {}
+    output = None
+    baseline = None
+
+    i = 1
+    while i < len(sys.argv):
+        arg = sys.argv[i]
+        value = sys.argv[i + 1] if i + 1 < len(sys.argv) else None
+        if arg in NUMERIC_OPTIONS:
+            key, kind, target = NUMERIC_OPTIONS[arg]
+            try:
+                number = kind(value)
+            except (TypeError, ValueError):
+                print(f"Error: {arg} requires a number")
+                return
+            (settings if target == 'server' else downloader_options)[key] = number
+            i += 1
+        elif arg == '--scenarios':
+            scenario_names = [n.strip() for n in (value or '').split(',') if n.strip()]
+            unknown = [n for n in scenario_names if n not in SCENARIOS]
+            if not scenario_names or unknown:
+                print(f"Error: --scenarios takes a comma-separated list of: {', '.join(SCENARIOS)}")
+                return
+            i += 1
+        elif arg == '--output':
+            if value is None:
+                print("Error: --output requires a file path")
+                return
+            output = value
+            i += 1
+        elif arg == '--compare':
+            try:
+                with open(value, 'r', encoding='utf-8') as f:
+                    baseline = json.load(f)
+            except Exception as e:
+                print(f"Error reading baseline {value}: {e}")
+                return
+            i += 1
+        else:
+            print(f"Unknown option: {arg}")
+            return
+        i += 1
+
+    results = run_benchmark(scenario_names, settings, downloader_options)
+    report = {
+        "revision": git_revision(),
+        "python": sys.version.split()[0],
+        "platform": sys.platform,
+        "settings": settings,
+        "scenarios": results,
+    }
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {output}")
+    else:
+        print(json.dumps(report, indent=2))
+    if baseline is not None:
+        compare(results, baseline)
+
+if __name__ == "__main__":
+    main()
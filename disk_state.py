@@ -0,0 +1,138 @@
+"""
+Pinterest Image Downloader - On-disk state for large batches
+Keeps the per-image bookkeeping of a streaming run out of memory: an exact
+set/map in a scratch SQLite file, and an append-only JSON-lines spool of
+per-image results that is read back lazily.
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+
+# Writes to the scratch database are committed in batches of this size
+COMMIT_EVERY = 1000
+
+class DiskIndex:
+    """A set of strings, optionally mapped to values, stored in a scratch SQLite file.
+
+    Supports `key in index`, add(key), get(key), setdefault(key, value) and
+    index[key] = value, so it can stand in for the set and dict used in memory. Membership is exact;
+    memory use is bounded by SQLite's page cache. The file is temporary and
+    not crash-safe, and is deleted by close().
+    """
+
+    def __init__(self, path=None, cache_kb=2048):
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix='pinterest-index-', suffix='.sqlite3')
+            os.close(fd)
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=OFF")
+        self._db.execute("PRAGMA synchronous=OFF")
+        self._db.execute(f"PRAGMA cache_size=-{int(cache_kb)}")
+        self._db.execute("CREATE TABLE IF NOT EXISTS items (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID")
+
+    def _written(self):
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY:
+            self._db.commit()
+            self._pending = 0
+
+    def add(self, key):
+        """Add key; return True if it was not there yet."""
+        with self._lock:
+            cursor = self._db.execute("INSERT OR IGNORE INTO items (key) VALUES (?)", (key,))
+            self._written()
+            return cursor.rowcount == 1
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM items WHERE key = ?", (key,)).fetchone() is not None
+
+    def get(self, key, default=None):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM items WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None and row[0] is not None else default
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO items (key, value) VALUES (?, ?)", (key, value))
+            self._written()
+
+    def setdefault(self, key, value):
+        """Map key to value unless it has a value already; return the value it ends up with."""
+        with self._lock:
+            row = self._db.execute("SELECT value FROM items WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[0] is not None:
+                return row[0]
+            self._db.execute("INSERT OR REPLACE INTO items (key, value) VALUES (?, ?)", (key, value))
+            self._written()
+            return value
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._db is None:
+                return
+            self._db.close()
+            self._db = None
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+class ResultSpool:
+    """Append-only JSON-lines file with one record per finished or failed image.
+
+    Records are {"status": "downloaded" | "failed", "url": ..., "path": ...,
+    "error": ...}. They are read back lazily with records() or values(), so
+    a summary of any size costs constant memory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def add(self, status, url, path=None, error=None):
+        record = {"status": status, "url": url}
+        if path is not None:
+            record["path"] = path
+        if error is not None:
+            record["error"] = str(error)
+        line = json.dumps(record)
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line + "\n")
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def records(self, status=None):
+        """Yield the records written so far, optionally only those with a given status."""
+        self.flush()
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                if status is None or record["status"] == status:
+                    yield record
+
+    def values(self, status, field):
+        """Yield one field of every record with the given status, e.g. the paths of downloads."""
+        for record in self.records(status):
+            yield record.get(field)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
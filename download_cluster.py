@@ -0,0 +1,627 @@
+#!/usr/bin/env python3
+"""
+Pinterest Image Downloader - Distributed crawling
+A coordinator puts input URLs in a shared SQLite work queue; any number of
+workers, on this machine or others that can reach the file, lease input
+URLs to scrape and found pins to download, each with its own browser and
+download pools. Found pins go back to the queue, so they are spread over
+all workers. The queue is also the global dedup index and the merged
+summary. Leases are renewed while a worker is alive; a crashed worker's
+items are queued again once its leases expire.
+"""
+
+import asyncio
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+from pinterest_downloader import PinterestDownloader, BrowserPagePool
+from downloader_options import group_options
+from download_manifest import canonical_image_url
+from storage_layout import LAYOUTS
+from page_profile import PROFILES
+from download_events import DownloadFinished, DownloadFailed, ImageProcessed, ImageRejected, info
+
+# Work item statuses
+QUEUED = "queued"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+# Found image URLs are written to the queue in batches of this size
+DISCOVER_BATCH = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    url TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    found INTEGER,
+    error TEXT,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sources_claim ON sources (status, lease_until);
+CREATE TABLE IF NOT EXISTS images (
+    image_key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    pin_id TEXT,
+    source TEXT,
+    status TEXT NOT NULL,
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    file_path TEXT,
+    size INTEGER,
+    outcome TEXT,
+    error TEXT,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS images_claim ON images (status, lease_until);
+CREATE TABLE IF NOT EXISTS hashes (
+    sha256 TEXT PRIMARY KEY,
+    file_path TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    host TEXT,
+    pid INTEGER,
+    started_at TEXT NOT NULL,
+    heartbeat_at REAL,
+    finished_at TEXT
+);
+"""
+
+# Tables holding leased work, and the key column of each
+WORK_TABLES = {"sources": "url", "images": "image_key"}
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+class WorkQueue:
+    """Shared queue of input URLs and images, leased to workers, in a SQLite file.
+
+    Several processes may open the same file. A claim leases items for
+    lease_seconds; claims also reclaim items whose lease expired, and give
+    up on an item (status failed) once it was leased max_attempts times.
+    Lease expiry compares wall clocks, so machines sharing a queue should
+    keep theirs in sync.
+    """
+
+    def __init__(self, path, max_attempts=3):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # Autocommit, so claims can take the write lock with BEGIN IMMEDIATE
+        self._db = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params)
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    @contextmanager
+    def _transaction(self):
+        """Run several statements as one write, holding SQLite's write lock from the start."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    # Adding work
+
+    def add_sources(self, urls):
+        """Queue input URLs that are not in the queue yet; return how many were added."""
+        with self._transaction() as db:
+            before = db.total_changes
+            db.executemany("INSERT OR IGNORE INTO sources (url, status, updated_at) VALUES (?, ?, ?)",
+                           ((url, QUEUED, _now()) for url in urls))
+            return db.total_changes - before
+
+    def add_images(self, images, source=None):
+        """Queue (url, pin_id) pairs whose image is not in the queue yet; return how many were added.
+
+        Size variants of one image share a key, so only the first is kept.
+        """
+        rows = [(canonical_image_url(url), url, pin_id, source, QUEUED, _now()) for url, pin_id in images]
+        with self._transaction() as db:
+            before = db.total_changes
+            db.executemany("INSERT OR IGNORE INTO images (image_key, url, pin_id, source, status, updated_at) "
+                           "VALUES (?, ?, ?, ?, ?, ?)", rows)
+            return db.total_changes - before
+
+    # Leases
+
+    def _claim(self, table, worker_id, limit, lease_seconds):
+        key = WORK_TABLES[table]
+        now = time.time()
+        with self._transaction() as db:
+            db.execute(f"UPDATE {table} SET status = ?, error = ?, updated_at = ? "
+                       "WHERE status = ? AND lease_until < ? AND attempts >= ?",
+                       (FAILED, f"lease expired {self.max_attempts} times", _now(), LEASED, now, self.max_attempts))
+            rows = db.execute(f"SELECT * FROM {table} WHERE status = ? OR (status = ? AND lease_until < ?) "
+                              "ORDER BY rowid LIMIT ?", (QUEUED, LEASED, now, limit)).fetchall()
+            db.executemany(f"UPDATE {table} SET status = ?, worker = ?, lease_until = ?, "
+                           f"attempts = attempts + 1, updated_at = ? WHERE {key} = ?",
+                           [(LEASED, worker_id, now + lease_seconds, _now(), row[key]) for row in rows])
+        return [dict(row) for row in rows]
+
+    def claim_sources(self, worker_id, limit=1, lease_seconds=60):
+        """Lease up to limit input URLs to scrape."""
+        return self._claim("sources", worker_id, limit, lease_seconds)
+
+    def claim_images(self, worker_id, limit=32, lease_seconds=60):
+        """Lease up to limit images to download."""
+        return self._claim("images", worker_id, limit, lease_seconds)
+
+    def heartbeat(self, worker_id, lease_seconds=60):
+        """Extend every lease a live worker holds."""
+        until = time.time() + lease_seconds
+        with self._transaction() as db:
+            for table in WORK_TABLES:
+                db.execute(f"UPDATE {table} SET lease_until = ? WHERE worker = ? AND status = ?",
+                           (until, worker_id, LEASED))
+            db.execute("UPDATE workers SET heartbeat_at = ? WHERE worker_id = ?", (time.time(), worker_id))
+
+    def release(self, worker_id):
+        """Queue the items a stopping worker still holds again, for others to take."""
+        with self._transaction() as db:
+            for table in WORK_TABLES:
+                db.execute(f"UPDATE {table} SET status = ?, worker = NULL, lease_until = NULL, "
+                           "attempts = MAX(attempts - 1, 0) WHERE worker = ? AND status = ?",
+                           (QUEUED, worker_id, LEASED))
+
+    # Results
+
+    def complete_source(self, url, found):
+        self._execute("UPDATE sources SET status = ?, found = ?, lease_until = NULL, updated_at = ? WHERE url = ?",
+                      (DONE, found, _now(), url))
+
+    def fail_source(self, url, error):
+        self._execute("UPDATE sources SET status = ?, error = ?, lease_until = NULL, updated_at = ? WHERE url = ?",
+                      (FAILED, str(error), _now(), url))
+
+    def complete_image(self, url, file_path, size, outcome):
+        self._execute("UPDATE images SET status = ?, file_path = ?, size = ?, outcome = ?, error = NULL, "
+                      "lease_until = NULL, updated_at = ? WHERE image_key = ?",
+                      (DONE, file_path, size, outcome, _now(), canonical_image_url(url)))
+
+    def fail_image(self, url, error):
+        # Another worker may have finished the image after this one's lease expired
+        self._execute("UPDATE images SET status = ?, error = ?, lease_until = NULL, updated_at = ? "
+                      "WHERE image_key = ? AND status != ?",
+                      (FAILED, str(error), _now(), canonical_image_url(url), DONE))
+
+    def reject_image(self, url, reason):
+        """Mark an image whose file post-processing found unusable (and deleted) as failed."""
+        self._execute("UPDATE images SET status = ?, file_path = NULL, error = ?, updated_at = ? WHERE image_key = ?",
+                      (FAILED, str(reason), _now(), canonical_image_url(url)))
+
+    def move_image(self, url, file_path):
+        self._execute("UPDATE images SET file_path = ?, updated_at = ? WHERE image_key = ?",
+                      (file_path, _now(), canonical_image_url(url)))
+
+    def find_by_hash(self, sha256):
+        rows = self._query("SELECT file_path FROM hashes WHERE sha256 = ?", (sha256,))
+        return rows[0][0] if rows else None
+
+    def record_hash(self, sha256, file_path):
+        """Claim content for file_path and return the path that holds it.
+
+        The path recorded first, by any worker, wins; the claim and the
+        lookup are one transaction, so two workers with the same content
+        never both keep it.
+        """
+        with self._transaction() as db:
+            db.execute("INSERT OR IGNORE INTO hashes (sha256, file_path) VALUES (?, ?)", (sha256, file_path))
+            return db.execute("SELECT file_path FROM hashes WHERE sha256 = ?", (sha256,)).fetchone()[0]
+
+    def replace_hash(self, sha256, file_path):
+        """Point content at file_path, e.g. after the file recorded for it was deleted."""
+        self._execute("INSERT OR REPLACE INTO hashes (sha256, file_path) VALUES (?, ?)", (sha256, file_path))
+
+    # Workers and progress
+
+    def register_worker(self, worker_id):
+        self._execute("INSERT OR REPLACE INTO workers (worker_id, host, pid, started_at, heartbeat_at) "
+                      "VALUES (?, ?, ?, ?, ?)", (worker_id, socket.gethostname(), os.getpid(), _now(), time.time()))
+
+    def worker_finished(self, worker_id):
+        self._execute("UPDATE workers SET finished_at = ? WHERE worker_id = ?", (_now(), worker_id))
+
+    def outstanding(self):
+        """Return the number of (input URLs, images) still queued or leased."""
+        counts = []
+        for table in WORK_TABLES:
+            counts.append(self._query(f"SELECT COUNT(*) FROM {table} WHERE status IN (?, ?)", (QUEUED, LEASED))[0][0])
+        return tuple(counts)
+
+    def summary(self, failed_limit=10):
+        """Merge the results of every worker into one summary."""
+        summary = {}
+        for table in WORK_TABLES:
+            rows = self._query(f"SELECT status, COUNT(*) FROM {table} GROUP BY status")
+            summary[table] = {row[0]: row[1] for row in rows}
+        rows = self._query("SELECT outcome, COUNT(*) FROM images WHERE status = ? GROUP BY outcome", (DONE,))
+        summary["outcomes"] = {row[0]: row[1] for row in rows}
+        summary["bytes_downloaded"] = self._query("SELECT COALESCE(SUM(size), 0) FROM images WHERE status = ?",
+                                                  (DONE,))[0][0]
+        workers = {}
+        for row in self._query("SELECT worker, status, COUNT(*), COALESCE(SUM(size), 0) FROM images "
+                               "WHERE status IN (?, ?) AND worker IS NOT NULL GROUP BY worker, status",
+                               (DONE, FAILED)):
+            stats = workers.setdefault(row[0], {DONE: 0, FAILED: 0, "bytes": 0})
+            stats[row[1]] = row[2]
+            stats["bytes"] += row[3]
+        for row in self._query("SELECT worker_id, host, heartbeat_at, finished_at FROM workers"):
+            stats = workers.setdefault(row["worker_id"], {DONE: 0, FAILED: 0, "bytes": 0})
+            stats.update(host=row["host"], finished=row["finished_at"] is not None,
+                         last_seen=round(time.time() - (row["heartbeat_at"] or 0), 1))
+        summary["workers"] = workers
+        summary["failed_urls"] = [row[0] for row in self._query(
+            "SELECT url FROM images WHERE status = ? ORDER BY rowid LIMIT ?", (FAILED, failed_limit))]
+        return summary
+
+class SharedHashIndex:
+    """Content hash index kept in the work queue, so duplicates are found across all workers.
+
+    Quacks like the dict PinterestDownloader keeps its hashes in;
+    setdefault() is the atomic claim across workers.
+    """
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    def get(self, sha256, default=None):
+        path = self.queue.find_by_hash(sha256)
+        return default if path is None else path
+
+    def setdefault(self, sha256, file_path):
+        return self.queue.record_hash(sha256, file_path)
+
+    def __setitem__(self, sha256, file_path):
+        self.queue.replace_hash(sha256, file_path)
+
+class ClusterWorker:
+    """Scrape and download work from a shared queue until none is left.
+
+    The worker leases input URLs to scrape (with up to page_pool_size
+    browser pages) and puts the pins it finds back in the queue, while its
+    download pool leases and downloads images in batches. Each image's
+    result is written to the queue as soon as it is known. With
+    wait_for_work the worker keeps polling for new work instead of exiting
+    once the queue is drained.
+
+    Workers sharing a machine can share the output folder. Other options
+    are PinterestDownloader settings by their flat names (see
+    downloader_options.group_options); its per-folder manifest is off,
+    because the queue records what is done.
+    """
+
+    def __init__(self, queue_path, output_folder=None, worker_id=None, lease_seconds=60,
+                 batch_size=None, poll_interval=1.0, wait_for_work=False, **options):
+        self.queue = WorkQueue(queue_path)
+        self.output_folder = output_folder
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.lease_seconds = lease_seconds
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.wait_for_work = wait_for_work
+        self.options = dict(options, use_manifest=False)
+        self.downloader = None
+        self._in_flight = set()
+        self._in_flight_lock = threading.Lock()
+
+    async def run(self):
+        """Work until the queue is drained and return this worker's own summary."""
+        self.queue.register_worker(self.worker_id)
+        downloader = PinterestDownloader(download_folder=self.output_folder,
+                                         hash_index=SharedHashIndex(self.queue), **group_options(self.options))
+        downloader.add_listener(self._record)
+        self.downloader = downloader
+        downloader.emit(info(f"Worker {self.worker_id} taking work from {self.queue.path}"))
+        heartbeat = asyncio.create_task(self._heartbeat())
+        try:
+            async with BrowserPagePool(size=downloader.page_pool_size, headless=downloader.headless,
+                                       on_event=downloader.emit, profile=downloader.page_profile) as pool:
+                async def produce(submit):
+                    scraper_count = max(pool.size, downloader.http_workers) if downloader.http_first else pool.size
+                    scrapers = [asyncio.create_task(self._scrape_sources(pool)) for _ in range(scraper_count)]
+                    try:
+                        await self._feed_images(submit, scrapers)
+                    finally:
+                        for scraper in scrapers:
+                            scraper.cancel()
+                        await asyncio.gather(*scrapers, return_exceptions=True)
+
+                return await downloader.download_stream(produce)
+        finally:
+            heartbeat.cancel()
+            self.queue.release(self.worker_id)
+            self.queue.worker_finished(self.worker_id)
+            downloader.close()
+            self.queue.close()
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            self.queue.heartbeat(self.worker_id, self.lease_seconds)
+
+    def _record(self, event):
+        """Write the result of a downloaded or failed image to the queue."""
+        if isinstance(event, ImageRejected):
+            self.queue.reject_image(event.url, event.reason)
+            return
+        if isinstance(event, ImageProcessed):
+            self.queue.move_image(event.url, event.path)
+            return
+        if isinstance(event, DownloadFinished):
+            self.queue.complete_image(event.url, event.path or event.duplicate_of, event.size, event.outcome)
+        elif isinstance(event, DownloadFailed):
+            self.queue.fail_image(event.url, event.error)
+        else:
+            return
+        with self._in_flight_lock:
+            self._in_flight.discard(canonical_image_url(event.url))
+
+    def _has_work(self, scrapers):
+        sources, images = self.queue.outstanding()
+        return sources or images or not all(scraper.done() for scraper in scrapers) or self.wait_for_work
+
+    async def _feed_images(self, submit, scrapers):
+        """Lease images in batches and pass them to the download pool."""
+        batch_size = self.batch_size or self.downloader.concurrency
+        while True:
+            batch = self.queue.claim_images(self.worker_id, batch_size, self.lease_seconds)
+            for row in batch:
+                with self._in_flight_lock:
+                    if row["image_key"] in self._in_flight:
+                        # Our own lease ran out while the image waited; it is still on its way
+                        continue
+                    self._in_flight.add(row["image_key"])
+                await submit(row["url"], row["pin_id"], row["source"])
+            if batch:
+                continue
+            if not self._has_work(scrapers):
+                return
+            await asyncio.sleep(self.poll_interval)
+
+    async def _scrape_sources(self, pool):
+        """Lease input URLs one at a time and queue the images found on them."""
+        downloader = self.downloader
+        while True:
+            claimed = self.queue.claim_sources(self.worker_id, 1, self.lease_seconds)
+            if not claimed:
+                if self.queue.outstanding()[0] or self.wait_for_work:
+                    # Other workers' leases may still expire and come back to the queue
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                return
+
+            url = claimed[0]["url"]
+            found = []
+            counts = {"added": 0, "found": 0}
+
+            def flush():
+                counts["added"] += self.queue.add_images(found, source=url)
+                counts["found"] += len(found)
+                found.clear()
+
+            async def discover(img_url, pin_id=None, source=None):
+                found.append((img_url, pin_id))
+                if len(found) >= DISCOVER_BATCH:
+                    flush()
+
+            try:
+                await downloader.scrape_urls([url], discover, page_pool=pool)
+                flush()
+            except Exception as e:
+                self.queue.fail_source(url, e)
+                downloader.emit(info(f"Failed to scrape {url}: {e}"))
+                continue
+            self.queue.complete_source(url, counts["found"])
+            downloader.emit(info(f"Queued {counts['added']} new of {counts['found']} images from {url}"))
+
+class Coordinator:
+    """Seed the shared queue with input URLs and follow the workers' progress."""
+
+    def __init__(self, queue_path):
+        self.queue_path = queue_path
+        self.queue = WorkQueue(queue_path)
+
+    def close(self):
+        self.queue.close()
+
+    def add_urls(self, urls):
+        """Queue input URLs; ones already in the queue (from an earlier run) are kept as they are."""
+        return self.queue.add_sources(urls)
+
+    def spawn_workers(self, count, worker_args=()):
+        """Start count worker processes on this machine, passing worker_args to each."""
+        script = os.path.abspath(__file__)
+        return [subprocess.Popen([sys.executable, script, 'worker', '--queue', self.queue_path,
+                                  '--worker-id', f"{socket.gethostname()}-local-{n + 1}", *worker_args])
+                for n in range(count)]
+
+    def wait(self, interval=5.0, on_progress=None, processes=()):
+        """Wait until no work is queued or leased (or the local workers exited) and return the summary."""
+        while True:
+            sources, images = self.queue.outstanding()
+            if on_progress is not None:
+                on_progress(sources, images)
+            if not sources and not images:
+                break
+            if processes and all(p.poll() is not None for p in processes):
+                break
+            time.sleep(interval)
+        for p in processes:
+            p.wait()
+        return self.queue.summary()
+
+def print_summary(summary):
+    sources, images = summary["sources"], summary["images"]
+    print("\n" + "=" * 50)
+    print("CLUSTER SUMMARY")
+    print("=" * 50)
+    print(f"Input URLs: {sources.get(DONE, 0)} done, {sources.get(FAILED, 0)} failed, "
+          f"{sources.get(QUEUED, 0) + sources.get(LEASED, 0)} left")
+    print(f"Images: {images.get(DONE, 0)} done, {images.get(FAILED, 0)} failed, "
+          f"{images.get(QUEUED, 0) + images.get(LEASED, 0)} left")
+    if summary["outcomes"]:
+        print("Outcomes: " + ", ".join(f"{outcome}: {n}" for outcome, n in summary["outcomes"].items()))
+    print(f"Downloaded: {summary['bytes_downloaded'] / (1024 * 1024):.1f} MB")
+    if summary["workers"]:
+        print("Workers:")
+        for worker_id, stats in summary["workers"].items():
+            state = "finished" if stats.get("finished") else f"last seen {stats.get('last_seen', '?')}s ago"
+            print(f"  {worker_id:<30} {stats[DONE]:>6} done, {stats[FAILED]:>4} failed, "
+                  f"{stats['bytes'] / (1024 * 1024):.1f} MB ({state})")
+    if summary["failed_urls"]:
+        print("Failed URLs:")
+        for url in summary["failed_urls"]:
+            print(f"  - {url}")
+
+# Numeric worker options and the ClusterWorker / PinterestDownloader setting each one controls
+INT_OPTIONS = {
+    '--pages': 'page_pool_size',
+    '--concurrency': 'concurrency',
+    '--lease': 'lease_seconds',
+    '--batch': 'batch_size',
+    '--max-retries': 'max_retries',
+    '--rate-limit': 'rate_limit',
+}
+
+# Worker flags without a value and the setting each one turns on or off
+FLAG_OPTIONS = {
+    '--show-browser': ('headless', False),
+    '--browser-only': ('http_first', False),
+    '--stream': ('streaming', True),
+    '--wait-for-work': ('wait_for_work', True),
+}
+
+def main():
+    """Run a coordinator or a worker."""
+    from batch_downloader import iter_urls_from_file
+
+    args = sys.argv[1:]
+    command = args.pop(0) if args else None
+    if command not in ('coordinator', 'worker', 'status'):
+        print("Usage:")
+        print("  python download_cluster.py coordinator --queue <crawl.sqlite3> [--file <urls_file.txt>] [url ...] [--wait]")
+        print("  python download_cluster.py coordinator --queue <crawl.sqlite3> --file <urls_file.txt> --local-workers <N> --output <folder> [worker options]")
+        print("  python download_cluster.py worker --queue <crawl.sqlite3> --output <folder> [--worker-id <id>] [--lease <seconds>] [--batch <N>]")
+        print("  python download_cluster.py worker ... [--pages <N>] [--concurrency <N>] [--show-browser] [--browser-only] [--stream] [--wait-for-work]")
+        print("  python download_cluster.py worker ... [--layout <flat|hash|board|date>] [--page-profile <full|lean>]")
+        print("  python download_cluster.py status --queue <crawl.sqlite3>")
+        return
+
+    queue_path = None
+    output_folder = None
+    worker_id = None
+    urls = []
+    options = {}
+    worker_args = []
+    local_workers = 0
+    wait = False
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg in ('--queue', '--output', '--worker-id', '--file', '--layout', '--page-profile'):
+            if i + 1 >= len(args):
+                print(f"Error: {arg} requires a value")
+                return
+            value = args[i + 1]
+            i += 1
+            if arg == '--queue':
+                queue_path = value
+            elif arg == '--output':
+                output_folder = value
+                worker_args += [arg, os.path.abspath(value)]
+            elif arg == '--worker-id':
+                worker_id = value
+            elif arg == '--layout':
+                if value not in LAYOUTS:
+                    print(f"Error: --layout requires one of: {', '.join(LAYOUTS)}")
+                    return
+                options['layout'] = value
+                worker_args += [arg, value]
+            elif arg == '--page-profile':
+                if value not in PROFILES:
+                    print(f"Error: --page-profile requires one of: {', '.join(PROFILES)}")
+                    return
+                options['page_profile'] = value
+                worker_args += [arg, value]
+            else:
+                urls.extend(iter_urls_from_file(value))
+        elif arg in INT_OPTIONS or arg == '--local-workers':
+            if i + 1 < len(args) and args[i + 1].isdigit():
+                if arg == '--local-workers':
+                    local_workers = int(args[i + 1])
+                else:
+                    options[INT_OPTIONS[arg]] = int(args[i + 1])
+                    worker_args += [arg, args[i + 1]]
+                i += 1
+            else:
+                print(f"Error: {arg} requires a number")
+                return
+        elif arg in FLAG_OPTIONS:
+            key, value = FLAG_OPTIONS[arg]
+            options[key] = value
+            worker_args.append(arg)
+        elif arg == '--wait':
+            wait = True
+        elif 'pinterest.com' in arg:
+            urls.append(arg)
+        i += 1
+
+    if queue_path is None:
+        print("Error: --queue is required")
+        return
+
+    if command == 'worker':
+        worker = ClusterWorker(queue_path, output_folder, worker_id=worker_id, **options)
+        summary = asyncio.run(worker.run())
+        print(f"\nWorker {worker.worker_id}: {summary['downloaded_count']} downloaded, "
+              f"{summary['failed_count']} failed, {summary['bytes_downloaded'] / (1024 * 1024):.1f} MB")
+        return
+
+    coordinator = Coordinator(queue_path)
+    try:
+        if command == 'status':
+            print_summary(coordinator.queue.summary())
+            return
+        added = coordinator.add_urls(urls)
+        print(f"Queued {added} new input URL(s) ({len(urls) - added} already in the queue)")
+        processes = coordinator.spawn_workers(local_workers, worker_args) if local_workers else []
+        if processes or wait:
+            def show(sources, images):
+                print(f"Waiting: {sources} input URL(s) and {images} image(s) queued or in progress")
+            print_summary(coordinator.wait(on_progress=show, processes=processes))
+    finally:
+        coordinator.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,729 @@
+#!/usr/bin/env python3
+"""
+Pinterest Image Downloader - Background service
+A long-lived downloader that keeps its browser pages and HTTP connections
+warm between jobs. Jobs (URL lists plus an output folder) are submitted
+over a local HTTP API and kept in a persistent SQLite queue with
+priorities, cancellation and per-job status; the batch downloader and the
+GUI can hand their work to it instead of starting Chromium themselves.
+"""
+
+import asyncio
+import json
+import os
+import re
+import secrets
+import signal
+import sqlite3
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from pinterest_downloader import PinterestDownloader, BrowserPagePool, create_session
+from downloader_options import group_options
+from page_profile import PROFILES, build_profile
+from download_events import (
+    DownloadStarted, DownloadFinished, DownloadFailed, BytesReceived, UrlsFound, Message
+)
+
+DEFAULT_PORT = 8733
+DEFAULT_URL = f"http://127.0.0.1:{DEFAULT_PORT}"
+DEFAULT_QUEUE_PATH = os.path.join(os.path.expanduser("~"), ".pinterest_downloader", "jobs.sqlite3")
+
+# Folder of the per-service access tokens, readable only by the user who started the service
+TOKEN_FOLDER = os.path.join(os.path.expanduser("~"), ".pinterest_downloader")
+
+# Request header carrying the access token
+TOKEN_HEADER = 'X-Downloader-Token'
+
+# Host names the API answers to when it listens on a loopback address
+LOOPBACK_HOSTS = ('127.0.0.1', 'localhost', '::1')
+
+# Job statuses
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATUSES = (DONE, FAILED, CANCELLED)
+
+# PinterestDownloader settings a job may choose. The browser pages and the
+# HTTP session belong to the service, so page_pool_size, headless and the
+# like are set when it starts instead. Options naming files outside the
+# download folder (metrics_file, results_file) are not accepted either.
+JOB_OPTIONS = (
+    'concurrency', 'per_host_limit', 'queue_size', 'max_scrolls', 'max_pins',
+    'scroll_quiet_ms', 'scroll_time_budget', 'intercept_network', 'http_first',
+    'http_workers', 'use_manifest', 'resume', 'dedup', 'perceptual_dedup',
+    'perceptual_threshold', 'revalidate', 'probe_resolutions', 'max_resolution',
+    'max_bytes', 'max_retries', 'rate_limit', 'adaptive_concurrency',
+    'streaming', 'layout', 'write_buffer',
+)
+
+# Downloaded paths and failed URLs kept in a finished job's stored summary
+SUMMARY_LIST_LIMIT = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    urls TEXT NOT NULL,
+    output_folder TEXT NOT NULL,
+    options TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    error TEXT,
+    summary TEXT,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, job_id);
+"""
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+def token_path(port):
+    """Return the file holding the access token of the service on port."""
+    return os.path.join(TOKEN_FOLDER, f"service-{port}.token")
+
+def read_token(port):
+    """Return the access token of the local service on port, or None if it is not running."""
+    try:
+        with open(token_path(port), encoding='utf-8') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+def _write_token(path, token):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Created private to the user, so other local users cannot read it
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(token)
+
+class DaemonError(Exception):
+    """The service refused a request or could not be reached."""
+
+def compact_summary(summary):
+    """Return a downloader summary as JSON-safe data, with its file lists cut short."""
+    compact = dict(summary)
+    for key in ('downloaded_files', 'failed_urls'):
+        values = compact.get(key) or []
+        compact[key] = [value for _, value in zip(range(SUMMARY_LIST_LIMIT), values)]
+    return compact
+
+class JobQueue:
+    """Persistent queue of download jobs in a SQLite file.
+
+    Jobs are claimed highest priority first, then oldest first. Safe to
+    share between the HTTP threads and the event loop.
+    """
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH):
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            cursor = self._db.execute(sql, params)
+            self._db.commit()
+            return cursor
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _job(row, with_urls=True):
+        job = dict(row)
+        urls = json.loads(job.pop('urls'))
+        job['url_count'] = len(urls)
+        if with_urls:
+            job['urls'] = urls
+        job['options'] = json.loads(job['options'])
+        job['summary'] = json.loads(job['summary']) if job['summary'] else None
+        return job
+
+    def submit(self, urls, output_folder, options=None, priority=0):
+        """Queue a job and return its ID."""
+        cursor = self._execute(
+            "INSERT INTO jobs (urls, output_folder, options, priority, status, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (json.dumps(list(urls)), output_folder, json.dumps(options or {}), int(priority), QUEUED, _now())
+        )
+        return cursor.lastrowid
+
+    def claim_next(self):
+        """Mark the next queued job running and return it, or None if there is none."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY priority DESC, job_id LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE jobs SET status = ?, started_at = ? WHERE job_id = ?",
+                             (RUNNING, _now(), row['job_id']))
+            self._db.commit()
+        job = self._job(row)
+        job['status'] = RUNNING
+        return job
+
+    def get(self, job_id, with_urls=False):
+        rows = self._query("SELECT * FROM jobs WHERE job_id = ?", (job_id,))
+        return self._job(rows[0], with_urls) if rows else None
+
+    def list(self, status=None, limit=100):
+        """Return the most recent jobs, newest first, without their URL lists."""
+        if status is None:
+            rows = self._query("SELECT * FROM jobs ORDER BY job_id DESC LIMIT ?", (limit,))
+        else:
+            rows = self._query("SELECT * FROM jobs WHERE status = ? ORDER BY job_id DESC LIMIT ?",
+                               (status, limit))
+        return [self._job(row, with_urls=False) for row in rows]
+
+    def counts(self):
+        """Return the number of jobs per status."""
+        return {row[0]: row[1] for row in self._query("SELECT status, COUNT(*) FROM jobs GROUP BY status")}
+
+    def finish(self, job_id, status, summary=None, error=None):
+        self._execute("UPDATE jobs SET status = ?, summary = ?, error = ?, finished_at = ? WHERE job_id = ?",
+                      (status, json.dumps(summary, default=str) if summary is not None else None,
+                       error, _now(), job_id))
+
+    def cancel_queued(self, job_id):
+        """Cancel a job that has not started; return True if it was still queued."""
+        cursor = self._execute("UPDATE jobs SET status = ?, finished_at = ? WHERE job_id = ? AND status = ?",
+                               (CANCELLED, _now(), job_id, QUEUED))
+        return cursor.rowcount == 1
+
+    def requeue(self, job_id):
+        self._execute("UPDATE jobs SET status = ?, started_at = NULL WHERE job_id = ?", (QUEUED, job_id))
+
+    def requeue_running(self):
+        """Put jobs left running by a service that stopped back in the queue; return how many."""
+        return self._execute("UPDATE jobs SET status = ?, started_at = NULL WHERE status = ?",
+                             (QUEUED, RUNNING)).rowcount
+
+class JobProgress:
+    """Listener that keeps a running job's counters for status requests."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.found = 0
+        self.total = 0
+        self.downloaded = 0
+        self.failed = 0
+        self.bytes_received = 0
+        self.last_message = None
+        self.started_at = time.monotonic()
+
+    def __call__(self, event):
+        with self._lock:
+            if isinstance(event, DownloadStarted):
+                self.total = max(self.total, event.total)
+            elif isinstance(event, DownloadFinished):
+                self.downloaded += 1
+            elif isinstance(event, DownloadFailed):
+                self.failed += 1
+            elif isinstance(event, BytesReceived):
+                self.bytes_received += event.bytes
+            elif isinstance(event, UrlsFound):
+                self.found += event.count
+            elif isinstance(event, Message):
+                self.last_message = event.text.strip()
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "found": self.found,
+                "total": self.total,
+                "done": self.downloaded + self.failed,
+                "downloaded": self.downloaded,
+                "failed": self.failed,
+                "bytes_received": self.bytes_received,
+                "elapsed_seconds": round(time.monotonic() - self.started_at, 3),
+                "last_message": self.last_message,
+            }
+
+class DownloadDaemon:
+    """Run queued download jobs on one warm browser pool and HTTP session.
+
+    Jobs run job_workers at a time (one by default, so two jobs never share
+    a download folder's manifest). The API listens on host:port only; it is
+    meant for the local machine, not the network. Jobs still running when
+    the service stops are queued again when it next starts, and resume
+    where they stopped through the download folder's manifest.
+
+    Every request but GET /health must carry the service's access token in
+    the X-Downloader-Token header. The token is created at start and
+    written to a file only the user can read (see token_path), so a web
+    page the user visits cannot submit jobs or stop the service. POST
+    bodies must be application/json, and on a loopback address requests
+    naming another Host (DNS rebinding) are refused.
+
+    page_profile ('full', 'lean' or a PageLoadProfile) applies to the
+    service's browser pages and so to every job; a profile's storage state
+    and HTTP cache make the pages warm from the first job after a restart.
+    """
+
+    def __init__(self, port=DEFAULT_PORT, host='127.0.0.1', queue_path=DEFAULT_QUEUE_PATH,
+                 page_pool_size=1, headless=True, job_workers=1, concurrency=8, per_host_limit=4,
+                 page_profile=None):
+        self.port = port
+        self.host = host
+        self.queue = JobQueue(queue_path)
+        self.page_pool_size = page_pool_size
+        self.headless = headless
+        self.job_workers = max(1, int(job_workers))
+        self.concurrency = concurrency
+        self.per_host_limit = per_host_limit
+        if isinstance(page_profile, str):
+            page_profile = build_profile(page_profile)
+        self.page_profile = page_profile
+        self.pool = None
+        self.session = None
+        self.browser_ready = False
+        self.progress = {}
+        self._tasks = {}
+        self._loop = None
+        self._wakeup = None
+        self._stopping = None
+        self._server = None
+        self.token = secrets.token_urlsafe(32)
+        self._token_path = None
+
+    def log(self, text):
+        print(f"[{datetime.now():%H:%M:%S}] {text}")
+
+    async def serve(self):
+        """Start the API and run jobs until stop() is called."""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._stopping = asyncio.Event()
+        requeued = self.queue.requeue_running()
+        if requeued:
+            self.log(f"Requeued {requeued} job(s) interrupted by the last shutdown")
+
+        self.session = create_session(self.concurrency, self.per_host_limit)
+        self.pool = BrowserPagePool(size=self.page_pool_size, headless=self.headless,
+                                    on_event=lambda event: self.log(event.text), profile=self.page_profile)
+        try:
+            await self.pool.start()
+            self.browser_ready = True
+        except Exception as e:
+            # HTTP-only jobs still work; the pool retries the launch when a job needs a page
+            self.log(f"Could not start the browser yet: {str(e).splitlines()[0]}")
+
+        workers = []
+        try:
+            # A port already in use must still release the browser, session and queue below
+            self._start_api()
+            self.log(f"Pinterest downloader service listening on http://{self.host}:{self.port}")
+            workers = [asyncio.create_task(self._job_worker()) for _ in range(self.job_workers)]
+            await self._stopping.wait()
+        finally:
+            self.log("Shutting down...")
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            if self._server is not None:
+                self._server.shutdown()
+                self._server.server_close()
+            if self._token_path is not None:
+                try:
+                    os.remove(self._token_path)
+                except OSError:
+                    pass
+            await self.pool.stop()
+            self.session.close()
+            self.queue.close()
+
+    def stop(self):
+        """Ask serve() to finish; safe to call from any thread."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+
+    def notify(self):
+        """Wake the job workers after a job was queued; safe to call from any thread."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job; return False if it had already finished."""
+        if self.queue.cancel_queued(job_id):
+            self.log(f"Job {job_id} cancelled before it started")
+            return True
+        task = self._tasks.get(job_id)
+        if task is None:
+            return False
+        self._loop.call_soon_threadsafe(task.cancel)
+        return True
+
+    def status(self, job_id):
+        job = self.queue.get(job_id)
+        if job is not None and job_id in self.progress:
+            job['progress'] = self.progress[job_id].to_dict()
+        return job
+
+    async def _job_worker(self):
+        while True:
+            job = self.queue.claim_next()
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    # The timeout also picks up jobs queued by another process
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            job_id = job['job_id']
+            task = asyncio.create_task(self._run_job(job))
+            self._tasks[job_id] = task
+            try:
+                await asyncio.wait([task])
+            except asyncio.CancelledError:
+                # The service is stopping: the job goes back in the queue
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                self.queue.requeue(job_id)
+                raise
+            finally:
+                self._tasks.pop(job_id, None)
+                self.progress.pop(job_id, None)
+
+            if task.cancelled():
+                self.queue.finish(job_id, CANCELLED)
+                self.log(f"Job {job_id} cancelled")
+            elif task.exception() is not None:
+                self.queue.finish(job_id, FAILED, error=str(task.exception()))
+                self.log(f"Job {job_id} failed: {task.exception()}")
+            else:
+                summary = task.result()
+                self.queue.finish(job_id, DONE, summary=summary)
+                self.log(f"Job {job_id} done: {summary['downloaded_count']} downloaded, "
+                         f"{summary['failed_count']} failed")
+
+    async def _run_job(self, job):
+        job_id = job['job_id']
+        progress = JobProgress()
+        self.progress[job_id] = progress
+        self.log(f"Job {job_id} started: {job['url_count']} URL(s) -> {job['output_folder']}")
+        # Jobs queued by an older version may still carry options no longer accepted
+        options, _ = split_job_options(job['options'])
+        downloader = PinterestDownloader(download_folder=job['output_folder'], session=self.session,
+                                         quiet=True, on_event=progress, page_profile=self.page_profile,
+                                         **group_options(options))
+        try:
+            summary = await downloader.process_pinterest_urls(job['urls'], page_pool=self.pool)
+            return compact_summary(summary)
+        finally:
+            downloader.close()
+
+    def _start_api(self):
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _send(self, status, body):
+                data = json.dumps(body, default=str).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _allowed(self):
+                """Check the Host and token of a request; send the error and return False if refused."""
+                if daemon.host in LOOPBACK_HOSTS:
+                    host = urlparse('//' + (self.headers.get('Host') or '')).hostname
+                    if host not in LOOPBACK_HOSTS:
+                        self._send(403, {"error": "requests must be addressed to the local host"})
+                        return False
+                if self.command == 'GET' and self.path.split('?', 1)[0] == '/health':
+                    return True
+                if not secrets.compare_digest(self.headers.get(TOKEN_HEADER) or '', daemon.token):
+                    self._send(401, {"error": f"missing or wrong {TOKEN_HEADER} header"})
+                    return False
+                if self.command == 'POST':
+                    content_type = (self.headers.get('Content-Type') or '').split(';', 1)[0].strip().lower()
+                    if content_type != 'application/json':
+                        self._send(415, {"error": "the request body must be application/json"})
+                        return False
+                return True
+
+            def _job_id(self, pattern):
+                match = re.fullmatch(pattern, self.path.split('?', 1)[0])
+                return int(match.group(1)) if match else None
+
+            def do_GET(self):
+                if not self._allowed():
+                    return
+                path = self.path.split('?', 1)[0]
+                if path == '/health':
+                    self._send(200, {"status": "ok", "browser_ready": daemon.browser_ready,
+                                     "running": sorted(daemon._tasks), "jobs": daemon.queue.counts()})
+                elif path == '/jobs':
+                    self._send(200, {"jobs": daemon.queue.list()})
+                elif self._job_id(r'/jobs/(\d+)') is not None:
+                    job = daemon.status(self._job_id(r'/jobs/(\d+)'))
+                    if job is None:
+                        self._send(404, {"error": "no such job"})
+                    else:
+                        self._send(200, job)
+                else:
+                    self._send(404, {"error": "not found"})
+
+            def do_POST(self):
+                if not self._allowed():
+                    return
+                path = self.path.split('?', 1)[0]
+                if path == '/jobs':
+                    self._submit()
+                elif self._job_id(r'/jobs/(\d+)/cancel') is not None:
+                    job_id = self._job_id(r'/jobs/(\d+)/cancel')
+                    if daemon.queue.get(job_id) is None:
+                        self._send(404, {"error": "no such job"})
+                    elif daemon.cancel(job_id):
+                        self._send(202, {"job_id": job_id, "status": "cancelling"})
+                    else:
+                        self._send(409, {"error": "job already finished"})
+                elif path == '/shutdown':
+                    self._send(202, {"status": "stopping"})
+                    daemon.stop()
+                else:
+                    self._send(404, {"error": "not found"})
+
+            def _submit(self):
+                try:
+                    length = int(self.headers.get('Content-Length') or 0)
+                    request = json.loads(self.rfile.read(length) or b'{}')
+                    urls = request.get('urls')
+                    if not urls or not isinstance(urls, list) or not all(isinstance(u, str) for u in urls):
+                        raise ValueError("urls must be a non-empty list of strings")
+                    output_folder = request.get('output_folder') or os.path.join(os.getcwd(), "downloads")
+                    if not os.path.isabs(output_folder):
+                        raise ValueError("output_folder must be an absolute path")
+                    options = request.get('options') or {}
+                    unknown = sorted(set(options) - set(JOB_OPTIONS))
+                    if unknown:
+                        raise ValueError(f"unsupported job options: {', '.join(unknown)}")
+                    priority = int(request.get('priority') or 0)
+                except (ValueError, TypeError, AttributeError) as e:
+                    self._send(400, {"error": str(e)})
+                    return
+                job_id = daemon.queue.submit(urls, output_folder, options, priority)
+                daemon.log(f"Job {job_id} queued (priority {priority})")
+                daemon.notify()
+                self._send(201, {"job_id": job_id, "status": QUEUED})
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        self._token_path = token_path(self.port)
+        _write_token(self._token_path, self.token)
+        thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        thread.start()
+
+class DaemonClient:
+    """Submit jobs to a running service and follow them; uses only the standard library.
+
+    token defaults to the one the service on the URL's port wrote for this user.
+    """
+
+    def __init__(self, url=DEFAULT_URL, timeout=10, token=None):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.token = token
+
+    def _request(self, method, path, body=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        # Read on every request, so a restarted service's new token is picked up
+        token = self.token or read_token(urlparse(self.url).port or 80)
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers[TOKEN_HEADER] = token
+        request = urllib.request.Request(self.url + path, data=data, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get('error', e.reason)
+            except Exception:
+                message = e.reason
+            raise DaemonError(f"{e.code}: {message}")
+        except (urllib.error.URLError, OSError) as e:
+            raise DaemonError(f"Cannot reach the downloader service at {self.url}: {e}")
+
+    def is_running(self):
+        try:
+            return self._request('GET', '/health')['status'] == "ok"
+        except DaemonError:
+            return False
+
+    def submit(self, urls, output_folder=None, priority=0, **options):
+        """Queue a job and return its ID. output_folder defaults to ./downloads here."""
+        output_folder = os.path.abspath(output_folder or os.path.join(os.getcwd(), "downloads"))
+        body = {"urls": list(urls), "output_folder": output_folder, "options": options, "priority": priority}
+        return self._request('POST', '/jobs', body)['job_id']
+
+    def status(self, job_id):
+        return self._request('GET', f'/jobs/{job_id}')
+
+    def jobs(self):
+        return self._request('GET', '/jobs')['jobs']
+
+    def cancel(self, job_id):
+        return self._request('POST', f'/jobs/{job_id}/cancel')
+
+    def shutdown(self):
+        return self._request('POST', '/shutdown')
+
+    def wait(self, job_id, interval=1.0, on_status=None):
+        """Poll a job until it finishes and return its final status.
+
+        on_status(status) is called after every poll.
+        """
+        while True:
+            status = self.status(job_id)
+            if on_status is not None:
+                on_status(status)
+            if status['status'] in FINISHED_STATUSES:
+                return status
+            time.sleep(interval)
+
+def split_job_options(options):
+    """Split downloader options into those a job may set and those the service owns."""
+    job_options = {key: value for key, value in options.items() if key in JOB_OPTIONS}
+    ignored = sorted(key for key in options if key not in JOB_OPTIONS)
+    return job_options, ignored
+
+def print_jobs(jobs):
+    if not jobs:
+        print("No jobs.")
+    for job in jobs:
+        print(f"{job['job_id']:>5}  {job['status']:<9}  priority {job['priority']:<3}  "
+              f"{job['url_count']} URL(s) -> {job['output_folder']}  (queued {job['created_at']})")
+
+# Numeric command-line options of the service and the DownloadDaemon setting each one controls
+INT_OPTIONS = {
+    '--port': 'port',
+    '--pages': 'page_pool_size',
+    '--job-workers': 'job_workers',
+    '--concurrency': 'concurrency',
+    '--per-host': 'per_host_limit',
+}
+
+def main():
+    """Run the service, or talk to a running one."""
+    args = sys.argv[1:]
+    command = args.pop(0) if args and not args[0].startswith('--') else 'serve'
+
+    if command not in ('serve', 'jobs', 'status', 'cancel', 'stop'):
+        print("Usage:")
+        print("  python download_daemon.py [serve] [--port <N>] [--queue <jobs.sqlite3>] [--pages <N>] [--show-browser]")
+        print("  python download_daemon.py [serve] [--job-workers <N>] [--concurrency <N>] [--per-host <N>]")
+        print("  python download_daemon.py [serve] [--page-profile <full|lean>] [--browser-state <state.json>] [--browser-cache <folder>]")
+        print("  python download_daemon.py jobs [--url <service URL>]")
+        print("  python download_daemon.py status <job id> [--url <service URL>]")
+        print("  python download_daemon.py cancel <job id> [--url <service URL>]")
+        print("  python download_daemon.py stop [--url <service URL>]")
+        return
+
+    settings = {}
+    profile_options = {}
+    url = DEFAULT_URL
+    job_id = None
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg in INT_OPTIONS:
+            if i + 1 < len(args) and args[i + 1].isdigit():
+                settings[INT_OPTIONS[arg]] = int(args[i + 1])
+                i += 1
+            else:
+                print(f"Error: {arg} requires a number")
+                return
+        elif arg in ('--queue', '--url', '--page-profile', '--browser-state', '--browser-cache'):
+            if i + 1 < len(args):
+                if arg == '--queue':
+                    settings['queue_path'] = args[i + 1]
+                elif arg == '--url':
+                    url = args[i + 1]
+                elif arg == '--page-profile':
+                    if args[i + 1] not in PROFILES:
+                        print(f"Error: --page-profile requires one of: {', '.join(PROFILES)}")
+                        return
+                    profile_options['page_profile'] = args[i + 1]
+                else:
+                    key = 'storage_state' if arg == '--browser-state' else 'cache_dir'
+                    profile_options[key] = os.path.abspath(args[i + 1])
+                i += 1
+            else:
+                print(f"Error: {arg} requires a value")
+                return
+        elif arg == '--show-browser':
+            settings['headless'] = False
+        elif arg.isdigit():
+            job_id = int(arg)
+        i += 1
+
+    if command == 'serve':
+        if profile_options:
+            # --browser-state or --browser-cache alone keeps the default full profile, as in the CLI
+            settings['page_profile'] = build_profile(profile_options.pop('page_profile', 'full'), **profile_options)
+        daemon = DownloadDaemon(**settings)
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            try:
+                loop.add_signal_handler(signal.SIGTERM, daemon.stop)
+            except (NotImplementedError, RuntimeError):
+                pass  # Not available on Windows; Ctrl+C still works
+            await daemon.serve()
+
+        try:
+            asyncio.run(run())
+        except KeyboardInterrupt:
+            print("Stopped.")
+        return
+
+    client = DaemonClient(url)
+    try:
+        if command == 'jobs':
+            print_jobs(client.jobs())
+        elif command == 'stop':
+            client.shutdown()
+            print("Service is stopping.")
+        elif job_id is None:
+            print(f"Error: {command} requires a job id")
+        elif command == 'status':
+            print(json.dumps(client.status(job_id), indent=2))
+        else:
+            client.cancel(job_id)
+            print(f"Cancelling job {job_id}.")
+    except DaemonError as e:
+        print(f"Error: {e}")
+
+if __name__ == "__main__":
+    main()
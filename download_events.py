@@ -0,0 +1,120 @@
+"""
+Pinterest Image Downloader - Progress events
+The downloader reports what it is doing as typed events passed to listener
+callables instead of printing. ConsoleReporter turns them back into the
+familiar status lines.
+"""
+
+import os
+import threading
+from collections import namedtuple
+from urllib.parse import urlparse
+
+# A human-readable status line; level is "info", "warning" or "error"
+Message = namedtuple('Message', 'text level')
+
+# An input URL is being resolved; method is "http" or "browser"
+PageStarted = namedtuple('PageStarted', 'url method')
+
+# A page, scroll pass or HTTP result page produced count new image URLs
+UrlsFound = namedtuple('UrlsFound', 'source count method')
+
+# An input URL is exhausted: total images found, with scroll passes and seconds spent
+PageFinished = namedtuple('PageFinished', 'url method total scrolls seconds')
+
+# What a browser page loaded for an input URL: requests made, requests the
+# page profile blocked, and bytes received (by Content-Length)
+PageTraffic = namedtuple('PageTraffic', 'url requests blocked bytes')
+
+# A worker picked up an image; index of total images queued so far
+DownloadStarted = namedtuple('DownloadStarted', 'url index total')
+
+# More bytes of an image arrived
+BytesReceived = namedtuple('BytesReceived', 'url bytes')
+
+# An image is done. outcome is "downloaded", "resumed", "duplicate" or
+# "unchanged"; path is None when a duplicate was deleted, duplicate_of is the
+# existing copy and resumed_from the offset a resumed transfer started at
+DownloadFinished = namedtuple('DownloadFinished', 'url path size seconds outcome duplicate_of resumed_from')
+
+# An image failed for good after retries attempts
+DownloadFailed = namedtuple('DownloadFailed', 'url error retries')
+
+# A transient failure will be retried after delay seconds
+RetryScheduled = namedtuple('RetryScheduled', 'url attempt max_retries delay error')
+
+# The circuit breaker paused all downloads for seconds
+DownloadsPaused = namedtuple('DownloadsPaused', 'seconds')
+
+# A downloaded file went through post-processing; path is where it ended up
+# (it changes when the file was transcoded) and thumbnail is None without one
+ImageProcessed = namedtuple('ImageProcessed', 'url path seconds thumbnail')
+
+# Post-processing found a downloaded file unusable (truncated, an HTML page...) and deleted it
+ImageRejected = namedtuple('ImageRejected', 'url path reason')
+
+# One timed step: stage is "navigate", "scroll", "extract", "download" or "postprocess"
+StageTiming = namedtuple('StageTiming', 'stage seconds url')
+
+STAGES = ('navigate', 'scroll', 'extract', 'download', 'postprocess')
+
+def info(text):
+    return Message(text, "info")
+
+def warning(text):
+    return Message(text, "warning")
+
+def error(text):
+    return Message(text, "error")
+
+def event_name(event):
+    """Return the type name of an event, e.g. "DownloadFinished"."""
+    return type(event).__name__
+
+class ConsoleReporter:
+    """Listener that prints events as status lines, like the downloader used to."""
+
+    def __init__(self, stream=None):
+        # None prints to whatever sys.stdout is at the time
+        self.stream = stream
+        # Keeps lines printed from different download threads from running together
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        line = self.format(event)
+        if line is not None:
+            with self._lock:
+                print(line, file=self.stream)
+
+    def format(self, event):
+        """Return the status line for an event, or None for events not shown on the console."""
+        if isinstance(event, Message):
+            return event.text
+        if isinstance(event, PageStarted):
+            return f"Resolving over HTTP: {event.url}" if event.method == "http" else f"Visiting: {event.url}"
+        if isinstance(event, PageFinished):
+            if event.method == "http":
+                return f"Found {event.total} images over HTTP"
+            return f"Found {event.total} images on this page ({event.scrolls} scrolls, {event.seconds:.1f}s)"
+        if isinstance(event, DownloadStarted):
+            return f"Downloading {event.index}/{event.total}: {event.url}"
+        if isinstance(event, DownloadFinished):
+            filename = os.path.basename(event.path or urlparse(event.url).path)
+            if event.outcome == "unchanged":
+                return f"Unchanged: {filename}"
+            if event.outcome == "duplicate":
+                return f"Duplicate of {os.path.basename(event.duplicate_of)}: {filename}"
+            if event.outcome == "resumed":
+                return f"Downloaded: {filename} (resumed at {event.resumed_from} bytes)"
+            return f"Downloaded: {filename}"
+        if isinstance(event, DownloadFailed):
+            if event.retries:
+                return f"Failed to download {event.url} after {event.retries} retries: {event.error}"
+            return f"Failed to download {event.url}: {event.error}"
+        if isinstance(event, ImageRejected):
+            return f"Rejected {os.path.basename(event.path)}: {event.reason}"
+        if isinstance(event, RetryScheduled):
+            return f"Retrying in {event.delay:.1f}s ({event.attempt}/{event.max_retries}): {event.error}"
+        if isinstance(event, DownloadsPaused):
+            return f"Too many failed downloads, pausing for {event.seconds:.0f}s"
+        return None
@@ -0,0 +1,251 @@
+"""
+Pinterest Image Downloader - Download manifest
+A small SQLite database kept in each download folder that remembers every
+image seen there, so later runs can skip finished images, retry failed ones
+and resume an interrupted batch.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+MANIFEST_FILENAME = ".pinterest_manifest.sqlite3"
+
+# Image statuses
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+# i.pinimg.com/<size>/ab/cd/ef/<hash>.<ext>: the size folder and extension vary
+# between variants of the same image, the hash path does not
+PINIMG_PATH_PATTERN = re.compile(
+    r'pinimg\.com/[^/]+/([0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]+)\.\w+',
+    re.IGNORECASE
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    image_key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    pin_id TEXT,
+    source TEXT,
+    status TEXT NOT NULL,
+    file_path TEXT,
+    size INTEGER,
+    sha256 TEXT,
+    phash TEXT,
+    variant TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    downloaded_at TEXT,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS images_status ON images (status);
+CREATE INDEX IF NOT EXISTS images_sha256 ON images (sha256);
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at TEXT NOT NULL,
+    finished_at TEXT
+);
+CREATE TABLE IF NOT EXISTS run_sources (
+    run_id INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    finished_at TEXT NOT NULL,
+    PRIMARY KEY (run_id, url)
+);
+"""
+
+def canonical_image_url(url):
+    """Return the key shared by every size variant of the same image."""
+    match = PINIMG_PATH_PATTERN.search(url)
+    if match:
+        return "pinimg.com/" + match.group(1).lower()
+    return url.split('?', 1)[0].split('#', 1)[0]
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+class DownloadManifest:
+    """Persistent record of the images and input URLs handled in a download folder.
+
+    Safe to share between the download threads; every write is committed
+    immediately so an interrupted run loses nothing.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+        self.run_id = None
+        self.resumed = False
+
+    def _migrate(self):
+        """Add columns introduced after a manifest was first created."""
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(images)")}
+        if not columns:
+            return
+        for column in ("phash", "variant", "source", "downloaded_at"):
+            if column not in columns:
+                self._db.execute(f"ALTER TABLE images ADD COLUMN {column} TEXT")
+
+    @classmethod
+    def for_folder(cls, folder):
+        """Open (or create) the manifest of a download folder."""
+        return cls(os.path.join(folder, MANIFEST_FILENAME))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            cursor = self._db.execute(sql, params)
+            self._db.commit()
+            return cursor
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    # Runs and input URLs
+
+    def start_run(self, resume=True):
+        """Start a run, or continue the last one if it never finished and resume is set."""
+        last = self._query("SELECT run_id, finished_at FROM runs ORDER BY run_id DESC LIMIT 1")
+        if resume and last and last[0]["finished_at"] is None:
+            self.run_id = last[0]["run_id"]
+            self.resumed = True
+        else:
+            self.run_id = self._execute("INSERT INTO runs (started_at) VALUES (?)", (_now(),)).lastrowid
+            self.resumed = False
+        return self.run_id
+
+    def finish_run(self):
+        self._execute("UPDATE runs SET finished_at = ? WHERE run_id = ?", (_now(), self.run_id))
+
+    def is_source_done(self, url):
+        """True if url was fully extracted earlier in the current run."""
+        rows = self._query("SELECT 1 FROM run_sources WHERE run_id = ? AND url = ?", (self.run_id, url))
+        return bool(rows)
+
+    def mark_source_done(self, url):
+        self._execute("INSERT OR REPLACE INTO run_sources (run_id, url, finished_at) VALUES (?, ?, ?)",
+                      (self.run_id, url, _now()))
+
+    # Images
+
+    def get(self, url):
+        """Return the manifest row of an image (any size variant), or None."""
+        rows = self._query("SELECT * FROM images WHERE image_key = ?", (canonical_image_url(url),))
+        return rows[0] if rows else None
+
+    def is_done(self, url):
+        """True if the image was downloaded and its file is still on disk."""
+        row = self.get(url)
+        return row is not None and row["status"] == DONE and bool(row["file_path"]) \
+            and os.path.exists(row["file_path"])
+
+    def iter_unfinished_images(self, batch_size=1000):
+        """Yield (url, pin_id, source) of every pending or failed image, reading batch_size rows at a time."""
+        last_key = ""
+        while True:
+            rows = self._query("SELECT image_key, url, pin_id, source FROM images WHERE status != ? "
+                               "AND image_key > ? ORDER BY image_key LIMIT ?", (DONE, last_key, batch_size))
+            for row in rows:
+                yield row["url"], row["pin_id"], row["source"]
+            if len(rows) < batch_size:
+                return
+            last_key = rows[-1]["image_key"]
+
+    def record_pending(self, url, pin_id=None, source=None):
+        """Remember a discovered image, and the input URL it was found on, until it is downloaded."""
+        self._execute(
+            "INSERT INTO images (image_key, url, pin_id, source, status, updated_at) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (image_key) DO UPDATE SET url = excluded.url, "
+            "pin_id = COALESCE(excluded.pin_id, images.pin_id), "
+            "source = COALESCE(images.source, excluded.source), status = excluded.status, "
+            "updated_at = excluded.updated_at WHERE images.status != 'done'",
+            (canonical_image_url(url), url, pin_id, source, PENDING, _now())
+        )
+
+    def record_done(self, url, file_path, size, sha256, etag=None, last_modified=None, pin_id=None,
+                    phash=None, variant=None):
+        self._execute(
+            "INSERT INTO images (image_key, url, pin_id, status, file_path, size, sha256, phash, variant, "
+            "etag, last_modified, attempts, error, downloaded_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1, NULL, ?, ?) "
+            "ON CONFLICT (image_key) DO UPDATE SET url = excluded.url, "
+            "pin_id = COALESCE(excluded.pin_id, images.pin_id), status = excluded.status, "
+            "file_path = excluded.file_path, size = excluded.size, sha256 = excluded.sha256, "
+            "phash = excluded.phash, variant = excluded.variant, etag = excluded.etag, "
+            "last_modified = excluded.last_modified, attempts = images.attempts + 1, error = NULL, "
+            "downloaded_at = excluded.downloaded_at, updated_at = excluded.updated_at",
+            (canonical_image_url(url), url, pin_id, DONE, file_path, size, sha256, phash, variant,
+             etag, last_modified, _now(), _now())
+        )
+
+    def record_failed(self, url, error, pin_id=None, etag=None, last_modified=None):
+        """Record a failed download, keeping the validators needed to resume its partial file."""
+        self._execute(
+            "INSERT INTO images (image_key, url, pin_id, status, etag, last_modified, attempts, error, "
+            "updated_at) VALUES (?, ?, ?, ?, ?, ?, 1, ?, ?) "
+            "ON CONFLICT (image_key) DO UPDATE SET pin_id = COALESCE(excluded.pin_id, images.pin_id), "
+            "status = CASE WHEN images.status = 'done' THEN images.status ELSE excluded.status END, "
+            "etag = CASE WHEN images.status = 'done' THEN images.etag "
+            "ELSE COALESCE(excluded.etag, images.etag) END, "
+            "last_modified = CASE WHEN images.status = 'done' THEN images.last_modified "
+            "ELSE COALESCE(excluded.last_modified, images.last_modified) END, "
+            "attempts = images.attempts + 1, error = excluded.error, updated_at = excluded.updated_at",
+            (canonical_image_url(url), url, pin_id, FAILED, etag, last_modified, str(error), _now())
+        )
+
+    def record_rejected(self, url, error):
+        """Mark a downloaded file that turned out to be unusable (and was deleted) as failed."""
+        self._execute("UPDATE images SET status = ?, file_path = NULL, sha256 = NULL, phash = NULL, "
+                      "etag = NULL, last_modified = NULL, error = ?, updated_at = ? WHERE image_key = ?",
+                      (FAILED, str(error), _now(), canonical_image_url(url)))
+
+    def record_moved(self, url, file_path):
+        """Record the new path of a downloaded file, e.g. after it was converted; downloaded_at is kept."""
+        self._execute("UPDATE images SET file_path = ?, updated_at = ? WHERE image_key = ?",
+                      (file_path, _now(), canonical_image_url(url)))
+
+    def files_by_path(self):
+        """Return the rows of downloaded images grouped by the absolute path of their file.
+
+        Duplicates share the file of the image they duplicate, so one path
+        may have several rows.
+        """
+        files = {}
+        for row in self._query("SELECT * FROM images WHERE status = ? AND file_path IS NOT NULL", (DONE,)):
+            files.setdefault(os.path.abspath(row["file_path"]), []).append(row)
+        return files
+
+    def find_by_hash(self, sha256):
+        """Return the path of a downloaded file with this SHA-256 that is still on disk."""
+        rows = self._query("SELECT file_path FROM images WHERE sha256 = ? AND status = ?", (sha256, DONE))
+        for row in rows:
+            if row["file_path"] and os.path.exists(row["file_path"]):
+                return row["file_path"]
+        return None
+
+    def perceptual_hashes(self):
+        """Return (phash, file path) of every downloaded image that has a perceptual hash."""
+        rows = self._query("SELECT phash, file_path FROM images WHERE phash IS NOT NULL AND status = ?",
+                           (DONE,))
+        return [(row["phash"], row["file_path"]) for row in rows]
+
+    def counts(self):
+        """Return the number of images per status."""
+        rows = self._query("SELECT status, COUNT(*) AS n FROM images GROUP BY status")
+        return {row["status"]: row["n"] for row in rows}
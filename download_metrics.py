@@ -0,0 +1,215 @@
+"""
+Pinterest Image Downloader - Metrics
+Listeners that aggregate download events into counters and latency
+histograms, write them as JSON lines, or serve them in the Prometheus text
+format so a slow batch shows where its time goes.
+"""
+
+import json
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from download_events import (
+    PageStarted, UrlsFound, DownloadFinished, DownloadFailed, BytesReceived,
+    RetryScheduled, DownloadsPaused, ImageRejected, PageTraffic, StageTiming, STAGES, event_name
+)
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+class Histogram:
+    """Cumulative latency histogram with fixed buckets, as Prometheus expects."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Estimate a quantile as the upper bound of the bucket it falls in."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "max": round(self.max, 6),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": {str(bound): n for bound, n in zip(self.buckets + ("+Inf",), self.counts)}
+        }
+
+class MetricsCollector:
+    """Listener that counts events and records stage latencies.
+
+    Safe to call from the download threads and the event loop at once.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {
+            "pages_started": 0,
+            "urls_found": 0,
+            "downloads_finished": 0,
+            "downloads_failed": 0,
+            "bytes_received": 0,
+            "retries": 0,
+            "pauses": 0,
+            "images_rejected": 0,
+            "page_requests": 0,
+            "page_requests_blocked": 0,
+            "page_bytes": 0,
+        }
+        self.outcomes = {}
+        self.histograms = {stage: Histogram() for stage in STAGES}
+
+    def __call__(self, event):
+        with self._lock:
+            if isinstance(event, StageTiming):
+                self.histograms.setdefault(event.stage, Histogram()).observe(event.seconds)
+            elif isinstance(event, BytesReceived):
+                self.counters["bytes_received"] += event.bytes
+            elif isinstance(event, DownloadFinished):
+                self.counters["downloads_finished"] += 1
+                self.outcomes[event.outcome] = self.outcomes.get(event.outcome, 0) + 1
+            elif isinstance(event, DownloadFailed):
+                self.counters["downloads_failed"] += 1
+            elif isinstance(event, UrlsFound):
+                self.counters["urls_found"] += event.count
+            elif isinstance(event, PageStarted):
+                self.counters["pages_started"] += 1
+            elif isinstance(event, RetryScheduled):
+                self.counters["retries"] += 1
+            elif isinstance(event, DownloadsPaused):
+                self.counters["pauses"] += 1
+            elif isinstance(event, ImageRejected):
+                self.counters["images_rejected"] += 1
+            elif isinstance(event, PageTraffic):
+                self.counters["page_requests"] += event.requests
+                self.counters["page_requests_blocked"] += event.blocked
+                self.counters["page_bytes"] += event.bytes
+
+    def snapshot(self):
+        """Return the counters and per-stage histograms as a JSON-serializable dict."""
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "outcomes": dict(self.outcomes),
+                "stages": {stage: h.to_dict() for stage, h in self.histograms.items()}
+            }
+
+    def stage_summary(self):
+        """Return count, total, p50, p95 and max seconds per stage."""
+        stages = self.snapshot()["stages"]
+        return {stage: {k: h[k] for k in ("count", "sum", "p50", "p95", "max")} for stage, h in stages.items()}
+
+    def prometheus_text(self):
+        """Render the metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, value in self.counters.items():
+                metric = f"pinterest_downloader_{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric} {value}")
+            lines.append("# TYPE pinterest_downloader_outcomes_total counter")
+            for outcome, value in self.outcomes.items():
+                lines.append(f'pinterest_downloader_outcomes_total{{outcome="{outcome}"}} {value}')
+            metric = "pinterest_downloader_stage_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            for stage, h in self.histograms.items():
+                cumulative = 0
+                for bound, n in zip(h.buckets + ("+Inf",), h.counts):
+                    cumulative += n
+                    lines.append(f'{metric}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{stage="{stage}"}} {h.sum}')
+                lines.append(f'{metric}_count{{stage="{stage}"}} {h.count}')
+        return "\n".join(lines) + "\n"
+
+class JsonLinesWriter:
+    """Listener that appends every event to a JSON-lines file.
+
+    Each line holds the event type, a Unix timestamp and the event fields.
+    close() adds a final "Metrics" line with the collector's snapshot.
+    """
+
+    def __init__(self, path, collector=None):
+        self.path = path
+        self.collector = collector
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def __call__(self, event):
+        record = {"event": event_name(event), "time": round(time.time(), 3)}
+        record.update(event._asdict())
+        line = json.dumps(record, default=str)
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            if self._file is None:
+                return
+            if self.collector is not None:
+                record = {"event": "Metrics", "time": round(time.time(), 3)}
+                record.update(self.collector.snapshot())
+                self._file.write(json.dumps(record) + "\n")
+            self._file.close()
+            self._file = None
+
+class MetricsServer:
+    """Serve a collector's metrics at http://host:port/metrics from a background thread."""
+
+    def __init__(self, collector, port, host='127.0.0.1'):
+        self.collector = collector
+        self.port = port
+        self.host = host
+        self._server = None
+
+    def start(self):
+        collector = self.collector
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = collector.prometheus_text().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,105 @@
+"""
+Pinterest Image Downloader - Downloader options
+The settings of PinterestDownloader that belong together, grouped into
+small objects: which image variant is fetched, how failed fetches are
+retried, how files are stored and where metrics go. The command line, the
+background service and the cluster workers pass options by their flat
+names; group_options() sorts those into these objects.
+"""
+
+from image_resolution import RESOLUTIONS
+from storage_layout import LAYOUTS, DEDUP_MODES
+
+# Size of the buffer in front of each file being written
+DEFAULT_WRITE_BUFFER = 256 * 1024
+
+class ResolutionPolicy:
+    """Which variant of an image is downloaded.
+
+    With probe_resolutions, the largest variant allowed by max_resolution
+    is requested first; when the CDN does not have it or it is over
+    max_bytes, the smaller ones (1200x, 736x, 564x) are probed with HEAD
+    and the first one that exists and is at most max_bytes is downloaded.
+    """
+
+    def __init__(self, probe_resolutions=True, max_resolution='originals', max_bytes=None):
+        if max_resolution not in RESOLUTIONS:
+            raise ValueError(f"max_resolution must be one of {', '.join(RESOLUTIONS)}")
+        self.probe_resolutions = probe_resolutions
+        self.max_resolution = max_resolution
+        self.max_bytes = max_bytes
+
+class RetryPolicy:
+    """How throttled and failed fetches are retried.
+
+    Throttled (429/503), 5xx and network failures are retried up to
+    max_retries times with exponential backoff, or after the delay a
+    Retry-After header asks for. rate_limit caps the requests per second
+    to each image host; with adaptive_concurrency the connections per host
+    are halved when the CDN throttles and grow back (up to the downloader's
+    per_host_limit) while it accepts them.
+    """
+
+    def __init__(self, max_retries=4, rate_limit=None, adaptive_concurrency=True):
+        self.max_retries = max(0, int(max_retries))
+        self.rate_limit = rate_limit
+        self.adaptive_concurrency = adaptive_concurrency
+
+class StorageOptions:
+    """How downloaded images are written.
+
+    A file whose SHA-256 matches one already downloaded is deleted
+    ('skip') or replaced by a hardlink ('hardlink'); dedup='off' keeps
+    every copy. With perceptual_dedup, images whose dHash differs in at
+    most perceptual_threshold bits also count as duplicates (needs Pillow).
+    layout is one of storage_layout.LAYOUTS and write_buffer the bytes
+    buffered in front of each file. A sink (see output_sinks) writes the
+    images into an archive instead of loose files and is closed with the
+    downloader. Archived images are not resumed with Range requests, a
+    duplicate is never archived twice (hardlink behaves like skip), and
+    perceptual dedup, which needs files, is not available.
+    """
+
+    def __init__(self, dedup='skip', perceptual_dedup=False, perceptual_threshold=0, layout='flat',
+                 write_buffer=DEFAULT_WRITE_BUFFER, sink=None):
+        if dedup not in DEDUP_MODES:
+            raise ValueError(f"dedup must be one of {', '.join(DEDUP_MODES)}")
+        if layout not in LAYOUTS:
+            raise ValueError(f"layout must be one of {', '.join(LAYOUTS)}")
+        if sink is not None and perceptual_dedup:
+            raise ValueError("perceptual_dedup needs files and cannot write to an archive sink")
+        self.dedup = dedup
+        self.perceptual_dedup = perceptual_dedup
+        self.perceptual_threshold = perceptual_threshold
+        self.layout = layout
+        self.write_buffer = max(4096, int(write_buffer))
+        self.sink = sink
+
+class MetricsOutput:
+    """Where collected metrics go besides downloader.metrics.
+
+    They are appended to metrics_file as JSON lines and served for
+    Prometheus at http://127.0.0.1:<metrics_port>/metrics when those are set.
+    """
+
+    def __init__(self, metrics_file=None, metrics_port=None):
+        self.metrics_file = metrics_file
+        self.metrics_port = metrics_port
+
+# PinterestDownloader argument of each group and the flat option names it takes
+OPTION_GROUPS = {
+    'resolution': (ResolutionPolicy, ('probe_resolutions', 'max_resolution', 'max_bytes')),
+    'retry': (RetryPolicy, ('max_retries', 'rate_limit', 'adaptive_concurrency')),
+    'storage': (StorageOptions, ('dedup', 'perceptual_dedup', 'perceptual_threshold', 'layout',
+                                 'write_buffer', 'sink')),
+    'metrics_output': (MetricsOutput, ('metrics_file', 'metrics_port')),
+}
+
+def group_options(options):
+    """Return PinterestDownloader keyword arguments for flat options, with grouped names moved into their objects."""
+    options = dict(options)
+    for argument, (group, names) in OPTION_GROUPS.items():
+        settings = {name: options.pop(name) for name in names if name in options}
+        if settings:
+            options[argument] = group(**settings)
+    return options
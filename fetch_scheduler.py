@@ -0,0 +1,280 @@
+"""
+Pinterest Image Downloader - Fetch scheduling
+Keeps image downloads within what the CDN accepts: per-host token-bucket rate
+limits, retries with exponential backoff that honor Retry-After, a circuit
+breaker that pauses every worker while errors spike, and an AIMD controller
+that tunes per-host concurrency.
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from download_events import ConsoleReporter, RetryScheduled, DownloadsPaused
+
+# Responses that mean "try again later" rather than "this image is gone"
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+
+def transient_network_errors():
+    """Return the network error types worth retrying.
+
+    requests is imported on first use rather than with this module, so
+    code paths that never make a request do not pay for it.
+    """
+    import requests
+    return (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+# Circuit breaker states
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+class TransientFetchError(Exception):
+    """A request that failed in a way worth retrying (throttling, 5xx, network error)."""
+
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def throttled(self):
+        return self.status in (429, 503)
+
+def parse_retry_after(value):
+    """Return the delay in seconds asked for by a Retry-After header, or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+def check_response(response):
+    """Raise TransientFetchError if the response asks us to retry."""
+    if response.status_code in RETRY_STATUSES:
+        raise TransientFetchError(f"{response.status_code} {response.reason} for url: {response.url}",
+                                  status=response.status_code,
+                                  retry_after=parse_retry_after(response.headers.get('Retry-After')))
+
+class TokenBucket:
+    """Allow `rate` requests per second on average, in bursts of up to `burst`.
+
+    A rate of None or 0 never waits, but the bucket can still be paused, e.g.
+    for the time a Retry-After header asks for.
+    """
+
+    def __init__(self, rate=None, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate or 1.0)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            if not self.rate:
+                return
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class AdaptiveLimit:
+    """Concurrency limit tuned by additive increase / multiplicative decrease.
+
+    Every success raises the limit by 1/limit (about +1 per round of
+    requests), every throttled response halves it, at most once per
+    decrease_interval so one burst of 429s counts as a single signal.
+    """
+
+    def __init__(self, max_limit, min_limit=1, adaptive=True, decrease_interval=1.0):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.adaptive = adaptive
+        self.decrease_interval = decrease_interval
+        self.limit = float(max_limit)
+        self.active = 0
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.active < int(self.limit))
+            self.active += 1
+
+    async def release(self):
+        async with self._condition:
+            self.active -= 1
+            self._condition.notify_all()
+
+    def increase(self):
+        if self.adaptive:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def decrease(self):
+        now = time.monotonic()
+        if self.adaptive and now - self._last_decrease >= self.decrease_interval:
+            self.limit = max(self.min_limit, self.limit / 2)
+            self._last_decrease = now
+
+class CircuitBreaker:
+    """Pause all requests while too many of the recent ones fail.
+
+    The breaker opens when at least failure_ratio of the last `window`
+    outcomes (and no fewer than min_calls) were failures. After cooldown
+    seconds a single probe request is let through: success closes the
+    breaker, failure opens it again for twice as long (up to max_cooldown).
+    """
+
+    def __init__(self, failure_ratio=0.5, window=20, min_calls=10, cooldown=5.0, max_cooldown=60.0,
+                 on_event=None):
+        self.failure_ratio = failure_ratio
+        self.min_calls = min_calls
+        self.base_cooldown = cooldown
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.on_event = on_event or ConsoleReporter()
+        self.state = CLOSED
+        self.open_until = 0.0
+        self.trips = 0
+        self._outcomes = deque(maxlen=window)
+        self._probing = False
+
+    def _open(self, seconds):
+        self.state = OPEN
+        self.open_until = time.monotonic() + seconds
+        self.trips += 1
+        self._outcomes.clear()
+        self.on_event(DownloadsPaused(seconds))
+
+    async def wait(self):
+        """Block until a request may be sent."""
+        while True:
+            if self.state == CLOSED:
+                return
+            now = time.monotonic()
+            if self.state == OPEN and now >= self.open_until:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            await asyncio.sleep(max(0.05, self.open_until - now) if self.state == OPEN else 0.05)
+
+    def abandon(self):
+        """Forget a request that ended without a verdict on the host's health."""
+        if self.state == HALF_OPEN:
+            self._probing = False
+
+    def record(self, ok, retry_after=None):
+        if self.state == HALF_OPEN:
+            self._probing = False
+            if ok:
+                self.state = CLOSED
+                self.cooldown = self.base_cooldown
+            else:
+                self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+                self._open(max(self.cooldown, retry_after or 0))
+            return
+        if self.state == OPEN:
+            return
+        self._outcomes.append(ok)
+        failures = self._outcomes.count(False)
+        if len(self._outcomes) >= self.min_calls and failures >= self.failure_ratio * len(self._outcomes):
+            self._open(max(self.cooldown, retry_after or 0))
+
+class FetchScheduler:
+    """Run blocking fetches under rate limits, retries and the circuit breaker.
+
+    Must be created and used inside one event loop. fetch callables raise
+    TransientFetchError for failures worth retrying; anything they return
+    counts as a final result. Retries and pauses are reported to on_event
+    (printed by default).
+    """
+
+    def __init__(self, per_host_limit, rate_limit=None, max_retries=4, backoff_base=0.5,
+                 backoff_max=30.0, max_retry_after=300.0, adaptive_concurrency=True, breaker=None,
+                 on_event=None):
+        self.per_host_limit = per_host_limit
+        self.rate_limit = rate_limit
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_retry_after = max_retry_after
+        self.adaptive_concurrency = adaptive_concurrency
+        self.on_event = on_event or ConsoleReporter()
+        self.breaker = breaker or CircuitBreaker(on_event=self.on_event)
+        self.retry_count = 0
+        self.throttled_count = 0
+        self._buckets = {}
+        self._limits = {}
+
+    def _host_state(self, host):
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.rate_limit)
+            self._limits[host] = AdaptiveLimit(self.per_host_limit, adaptive=self.adaptive_concurrency)
+        return self._buckets[host], self._limits[host]
+
+    def backoff(self, attempt):
+        """Exponential backoff with full jitter for the given retry number (1, 2, ...)."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def run(self, host, fetch, url=None):
+        """Await fetch() for a request to host (for url), retrying transient failures.
+
+        Raises the last TransientFetchError once max_retries is exhausted.
+        """
+        bucket, limit = self._host_state(host)
+        attempt = 0
+        while True:
+            await self.breaker.wait()
+            await bucket.acquire()
+            await limit.acquire()
+            try:
+                result = await fetch()
+            except TransientFetchError as e:
+                error = e
+            except BaseException:
+                self.breaker.abandon()
+                raise
+            else:
+                limit.increase()
+                self.breaker.record(True)
+                return result
+            finally:
+                await limit.release()
+
+            retry_after = min(error.retry_after, self.max_retry_after) if error.retry_after is not None else None
+            if error.throttled:
+                self.throttled_count += 1
+                limit.decrease()
+                if retry_after:
+                    # The whole host asked us to back off, not just this request
+                    bucket.pause(retry_after)
+            self.breaker.record(False, retry_after)
+            attempt += 1
+            if attempt > self.max_retries:
+                raise error
+            self.retry_count += 1
+            delay = retry_after if retry_after is not None else self.backoff(attempt)
+            self.on_event(RetryScheduled(url, attempt, self.max_retries, delay, str(error)))
+            await asyncio.sleep(delay)
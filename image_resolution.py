@@ -0,0 +1,139 @@
+"""
+Pinterest Image Downloader - Resolution selection
+Picks the largest image variant that actually exists and fits the size
+policy. The largest allowed variant is requested directly; only when the
+CDN does not have it (or it is too big) are the smaller candidates probed
+with cheap HEAD requests.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+
+from download_manifest import canonical_image_url
+
+# Number of per-image decisions kept, so the cache stays small on huge batches
+CACHE_SIZE = 10000
+
+# Pinterest CDN variants from largest to smallest
+RESOLUTIONS = ('originals', '1200x', '736x', '564x')
+
+# Statuses meaning the CDN has no such variant, so a smaller one is tried
+MISSING_STATUSES = (403, 404, 410)
+
+class VariantUnavailable(Exception):
+    """Raised when a requested variant does not exist or is over the byte limit."""
+
+# https://i.pinimg.com/<variant>/ab/cd/ef/<hash>.<ext>
+PINIMG_VARIANT_PATTERN = re.compile(
+    r'^(?P<prefix>.*pinimg\.com/)(?P<variant>[^/]+)/(?P<path>[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]+)'
+    r'\.(?P<ext>\w+)(?P<query>[?#].*)?$',
+    re.IGNORECASE
+)
+
+def image_variant(url):
+    """Return the variant folder of a pinimg URL ("originals", "736x", ...), or None."""
+    match = PINIMG_VARIANT_PATTERN.match(url)
+    return match.group('variant') if match else None
+
+def resolution_candidates(url, max_resolution='originals'):
+    """Return the URLs to try for an image, largest allowed variant first.
+
+    Sized variants are always JPEG on Pinterest's CDN, while originals keep
+    the uploaded format, so only the originals candidate keeps the extension.
+    URLs that are not pinimg variants are returned unchanged.
+    """
+    match = PINIMG_VARIANT_PATTERN.match(url)
+    if not match:
+        return [url]
+    allowed = RESOLUTIONS[RESOLUTIONS.index(max_resolution):] if max_resolution in RESOLUTIONS \
+        else RESOLUTIONS
+    query = match.group('query') or ''
+    candidates = []
+    for variant in allowed:
+        ext = match.group('ext') if variant == 'originals' else 'jpg'
+        candidates.append(f"{match.group('prefix')}{variant}/{match.group('path')}.{ext}{query}")
+    return candidates
+
+class ResolutionResolver:
+    """Choose the variant to download for each image.
+
+    first_choice() names the variant to GET without asking the CDN: the one
+    cached or recorded in the manifest for the image, else the largest
+    allowed. Only if that GET finds no usable image are the remaining
+    candidates probed by resolve(), largest first with HEAD; the first one
+    that exists and is not bigger than max_bytes wins. record() caches the
+    variant that was downloaded.
+    """
+
+    def __init__(self, session, max_resolution='originals', max_bytes=None, manifest=None, timeout=15):
+        if max_resolution not in RESOLUTIONS:
+            raise ValueError(f"max_resolution must be one of {', '.join(RESOLUTIONS)}")
+        self.session = session
+        self.max_resolution = max_resolution
+        self.max_bytes = max_bytes
+        self.manifest = manifest
+        self.timeout = timeout
+        self.probe_count = 0
+        self.variant_counts = {}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def first_choice(self, url):
+        """Return the URL to request first for an image, without any request."""
+        if image_variant(url) is None:
+            return url
+        candidates = resolution_candidates(url, self.max_resolution)
+        with self._lock:
+            cached = self._cache.get(canonical_image_url(url))
+        if cached is None and self.manifest is not None:
+            row = self.manifest.get(url)
+            if row is not None and row["variant"] and row["status"] == "done":
+                cached = next((c for c in candidates if image_variant(c) == row["variant"]), None)
+        return cached or candidates[0]
+
+    def resolve(self, url, tried=()):
+        """Probe the candidates not in tried and return the first usable one, or None."""
+        if image_variant(url) is None:
+            return None
+        for candidate in resolution_candidates(url, self.max_resolution):
+            if candidate not in tried and self._acceptable(candidate):
+                return candidate
+        return None
+
+    def record(self, url, candidate):
+        """Remember that candidate was downloaded for url."""
+        variant = image_variant(candidate)
+        if variant is None:
+            return
+        with self._lock:
+            self._cache[canonical_image_url(url)] = candidate
+            if len(self._cache) > CACHE_SIZE:
+                self._cache.popitem(last=False)
+            self.variant_counts[variant] = self.variant_counts.get(variant, 0) + 1
+
+    def too_large(self, length):
+        """True if a response of length bytes (a header value or None) breaks max_bytes."""
+        return bool(self.max_bytes and length and str(length).isdigit() and int(length) > self.max_bytes)
+
+    def _acceptable(self, candidate):
+        """HEAD a candidate: it must exist and respect max_bytes when the size is known.
+
+        Throttling, 5xx and network errors raise TransientFetchError rather
+        than ruling the candidate out.
+        """
+        # Imported here so that the CLI can read RESOLUTIONS without loading asyncio
+        from fetch_scheduler import TransientFetchError, transient_network_errors, check_response
+
+        with self._lock:
+            self.probe_count += 1
+        try:
+            response = self.session.head(candidate, timeout=self.timeout, allow_redirects=True)
+        except transient_network_errors() as e:
+            raise TransientFetchError(str(e)) from e
+        except Exception:
+            return False
+        check_response(response)
+        if response.status_code >= 400:
+            return False
+        return not self.too_large(response.headers.get('Content-Length'))
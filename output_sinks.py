@@ -0,0 +1,201 @@
+"""
+Pinterest Image Downloader - Output sinks
+Writes downloaded images straight into an archive instead of loose files:
+one ZIP or TAR file, or WebDataset-style tar shards for training sets. A
+transfer is collected in a spooled buffer (kept in memory up to spool_size)
+and appended to the archive in one piece once it is complete, so
+concurrent downloads never interleave and nothing has to be read back
+from the download folder to archive it.
+"""
+
+import io
+import json
+import os
+import re
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+
+ARCHIVE_FORMATS = ('zip', 'tar', 'webdataset')
+
+# Largest transfer kept in memory before its buffer spills to a temporary file
+DEFAULT_SPOOL_SIZE = 16 * 1024 * 1024
+
+# Size at which a WebDataset shard is closed and the next one started
+DEFAULT_SHARD_SIZE = 512 * 1024 * 1024
+
+# Archive written to the download folder by build_sink
+ARCHIVE_FILENAMES = {'zip': "pinterest_images.zip", 'tar': "pinterest_images.tar"}
+
+# Bytes copied at a time from a buffer into the archive
+COPY_BUFFER = 1024 * 1024
+
+class ArchiveSink:
+    """Base class of the sinks: a lock, unique member names and spooled buffers.
+
+    add(name, buffer, size, info) appends a finished transfer and returns
+    (path of the archive file, member name). info has the url, pin_id,
+    source and sha256 of the image.
+    """
+
+    def __init__(self, path, spool_size=DEFAULT_SPOOL_SIZE):
+        self.path = path
+        self.spool_size = spool_size
+        self.count = 0
+        self._names = set()
+        self._lock = threading.Lock()
+
+    def open_buffer(self):
+        """Return a writable buffer for one transfer."""
+        return tempfile.SpooledTemporaryFile(max_size=self.spool_size)
+
+    def _unique_name(self, name, sha256):
+        """Return name, or name with part of the content hash, so no member is written twice."""
+        name = name.replace(os.sep, '/')
+        if name in self._names:
+            base_name, ext = os.path.splitext(name)
+            name = f"{base_name}-{sha256[:8]}{ext}"
+            counter = 1
+            while name in self._names:
+                name = f"{base_name}-{sha256[:8]}_{counter}{ext}"
+                counter += 1
+        self._names.add(name)
+        return name
+
+    def add(self, name, buffer, size, info):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class ZipSink(ArchiveSink):
+    """Append images to a ZIP file, stored uncompressed (images do not compress)."""
+
+    def __init__(self, path, spool_size=DEFAULT_SPOOL_SIZE):
+        super().__init__(path, spool_size)
+        self._zip = zipfile.ZipFile(path, 'a' if os.path.exists(path) else 'w',
+                                    compression=zipfile.ZIP_STORED, allowZip64=True)
+        self._names.update(self._zip.namelist())
+
+    def add(self, name, buffer, size, info):
+        with self._lock:
+            name = self._unique_name(name, info["sha256"])
+            with self._zip.open(name, 'w', force_zip64=size >= zipfile.ZIP64_LIMIT) as member:
+                shutil.copyfileobj(buffer, member, COPY_BUFFER)
+            self.count += 1
+        return self.path, name
+
+    def close(self):
+        with self._lock:
+            if self._zip is not None:
+                self._zip.close()
+                self._zip = None
+
+class TarSink(ArchiveSink):
+    """Append images to an uncompressed TAR file."""
+
+    def __init__(self, path, spool_size=DEFAULT_SPOOL_SIZE):
+        super().__init__(path, spool_size)
+        self._tar = tarfile.open(path, 'a' if os.path.exists(path) else 'w', format=tarfile.PAX_FORMAT)
+        self._names.update(self._tar.getnames())
+
+    def add(self, name, buffer, size, info):
+        with self._lock:
+            name = self._unique_name(name, info["sha256"])
+            self._tar.addfile(_tar_info(name, size), buffer)
+            self.count += 1
+        return self.path, name
+
+    def close(self):
+        with self._lock:
+            if self._tar is not None:
+                self._tar.close()
+                self._tar = None
+
+def _tar_info(name, size):
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mtime = int(time.time())
+    info.mode = 0o644
+    return info
+
+class ShardedTarSink(ArchiveSink):
+    """Write WebDataset-style tar shards to a folder.
+
+    Each image is one sample: "<key>.<ext>" with the bytes and "<key>.json"
+    with its URL, pin, source and SHA-256. A shard is closed once it
+    reaches shard_size bytes and the next one is started; a later run adds
+    new shards after the existing ones. Every sample gets a line in
+    prefix-index.jsonl with its shard and byte offset, so readers can find
+    a sample without scanning the shards.
+    """
+
+    def __init__(self, folder, shard_size=DEFAULT_SHARD_SIZE, prefix="shard", spool_size=DEFAULT_SPOOL_SIZE):
+        super().__init__(folder, spool_size)
+        os.makedirs(folder, exist_ok=True)
+        self.shard_size = shard_size
+        self.prefix = prefix
+        self.shard_count = 0
+        pattern = re.compile(re.escape(prefix) + r'-(\d+)\.tar$')
+        numbers = [int(m.group(1)) for m in map(pattern.match, os.listdir(folder)) if m]
+        self._next_shard = max(numbers) + 1 if numbers else 0
+        self._shard = None
+        self._shard_path = None
+        self._shard_samples = 0
+        self.index_path = os.path.join(folder, f"{prefix}-index.jsonl")
+        self._index = open(self.index_path, 'a', encoding='utf-8')
+
+    def _open_shard(self):
+        self._shard_path = os.path.join(self.path, f"{self.prefix}-{self._next_shard:06d}.tar")
+        self._next_shard += 1
+        self._shard = tarfile.open(self._shard_path, 'w', format=tarfile.USTAR_FORMAT)
+        self._shard_samples = 0
+        self.shard_count += 1
+
+    def _close_shard(self):
+        if self._shard is not None:
+            self._shard.close()
+            self._shard = None
+
+    def add(self, name, buffer, size, info):
+        ext = os.path.splitext(name)[1].lstrip('.').lower() or 'jpg'
+        metadata = json.dumps({**info, "filename": os.path.basename(name)}).encode('utf-8')
+        with self._lock:
+            # WebDataset groups a sample's files by the name before the first dot
+            key = self._unique_name(info["sha256"][:16], info["sha256"])
+            if self._shard is not None and self._shard_samples \
+                    and self._shard.offset + size + len(metadata) > self.shard_size:
+                self._close_shard()
+            if self._shard is None:
+                self._open_shard()
+            offset = self._shard.offset
+            member = f"{key}.{ext}"
+            self._shard.addfile(_tar_info(member, size), buffer)
+            self._shard.addfile(_tar_info(f"{key}.json", len(metadata)), io.BytesIO(metadata))
+            self._shard_samples += 1
+            self.count += 1
+            self._index.write(json.dumps({
+                "key": key, "shard": os.path.basename(self._shard_path), "offset": offset,
+                "size": size, "url": info["url"], "sha256": info["sha256"],
+            }) + "\n")
+            shard_path = self._shard_path
+        return shard_path, member
+
+    def close(self):
+        with self._lock:
+            self._close_shard()
+            if not self._index.closed:
+                self._index.close()
+
+def build_sink(kind, folder, shard_size=DEFAULT_SHARD_SIZE):
+    """Return the sink for an archive format, writing into folder."""
+    if kind not in ARCHIVE_FORMATS:
+        raise ValueError(f"archive format must be one of {', '.join(ARCHIVE_FORMATS)}")
+    os.makedirs(folder, exist_ok=True)
+    if kind == 'webdataset':
+        return ShardedTarSink(folder, shard_size=shard_size)
+    path = os.path.join(folder, ARCHIVE_FILENAMES[kind])
+    return ZipSink(path) if kind == 'zip' else TarSink(path)
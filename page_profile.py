@@ -0,0 +1,142 @@
+"""
+Pinterest Image Downloader - Page-load profiles
+Decides how much of Pinterest a browser page loads. A profile blocks
+resource types and third-party hosts the scraper does not need (fonts,
+video, analytics, ads), chooses what navigation waits for, and keeps the
+browser's storage state and HTTP cache between runs so each page does not
+start from a cold browser.
+"""
+
+import os
+import weakref
+from urllib.parse import urlparse
+
+# Resource types blocked by the lean profile: nothing the scraper reads
+BLOCKED_RESOURCE_TYPES = ('font', 'media', 'texttrack', 'manifest', 'beacon', 'ping')
+
+# Hosts always treated as first-party, besides the host of the page itself
+FIRST_PARTY_SUFFIXES = ('pinterest.com', 'pinimg.com')
+
+# Pin images on a board, search or pin page; navigation waits for the first one
+PIN_SELECTOR = 'img[src*="pinimg.com"]'
+
+# Values of wait_until that Playwright accepts
+WAIT_CONDITIONS = ('commit', 'domcontentloaded', 'load', 'networkidle')
+
+# Error reported for blocked requests, so they are told apart from real failures
+BLOCKED_ERROR = 'blockedbyclient'
+
+def _request_frame(request):
+    try:
+        return request.frame
+    except Exception:
+        # Service worker requests belong to no frame
+        return None
+
+def _is_first_party(host, page_hosts):
+    if not host or host in page_hosts:
+        return True
+    # Country domains such as pinterest.co.uk or pinterest.de
+    if host.startswith('pinterest.') or '.pinterest.' in host:
+        return True
+    return any(host == suffix or host.endswith('.' + suffix) for suffix in FIRST_PARTY_SUFFIXES)
+
+class PageLoadProfile:
+    """How browser pages load Pinterest.
+
+    Requests of a type in block_resource_types are aborted, and with
+    block_images so are images: their URLs are still seen by the scraper,
+    which reads the request and the img tags rather than the pixels. With
+    block_third_party, subresources and iframes from hosts other than
+    Pinterest, its CDN and the host the page itself was opened on are
+    aborted too.
+
+    Navigation waits for wait_until and then, when set, for
+    wait_for_selector (at most selector_timeout ms; the scroll loop waits
+    for content anyway). storage_state is a JSON file of cookies and local
+    storage loaded into every page's context and saved when the pool
+    stops. cache_dir is a browser profile folder kept between runs: the
+    pages then share one persistent context whose HTTP cache, cookies and
+    storage survive restarts.
+    """
+
+    def __init__(self, block_resource_types=BLOCKED_RESOURCE_TYPES, block_images=False, block_third_party=True,
+                 wait_until='domcontentloaded', wait_for_selector=PIN_SELECTOR, selector_timeout=10000,
+                 storage_state=None, cache_dir=None):
+        if wait_until not in WAIT_CONDITIONS:
+            raise ValueError(f"wait_until must be one of {', '.join(WAIT_CONDITIONS)}")
+        self.block_resource_types = set(block_resource_types)
+        if block_images:
+            self.block_resource_types.add('image')
+        self.block_third_party = block_third_party
+        self.wait_until = wait_until
+        self.wait_for_selector = wait_for_selector
+        self.selector_timeout = selector_timeout
+        self.storage_state = storage_state
+        self.cache_dir = cache_dir
+        # Hosts each page's main frame navigated to; iframes (ads, trackers) never add to them
+        self._page_hosts = weakref.WeakKeyDictionary()
+
+    @property
+    def blocks_requests(self):
+        return bool(self.block_resource_types) or self.block_third_party
+
+    def should_block(self, request):
+        """Return True if request is not needed to scrape the page."""
+        frame = _request_frame(request)
+        page = frame.page if frame is not None else None
+        host = urlparse(request.url).hostname
+        if request.is_navigation_request() and frame is not None and frame.parent_frame is None:
+            # The page's own address (and where it redirects) is first-party for that page only
+            self._page_hosts.setdefault(page, set()).add(host)
+            return False
+        if request.resource_type in self.block_resource_types:
+            return True
+        page_hosts = self._page_hosts.get(page, ()) if page is not None else ()
+        return self.block_third_party and not _is_first_party(host, page_hosts)
+
+    async def route(self, route):
+        """Playwright route handler: abort what should_block() rejects, let the rest through."""
+        if self.should_block(route.request):
+            await route.abort(BLOCKED_ERROR)
+        else:
+            await route.continue_()
+
+    def context_options(self):
+        """Return the extra browser.new_context() options, e.g. the saved storage state."""
+        if self.storage_state and os.path.exists(self.storage_state):
+            return {"storage_state": self.storage_state}
+        return {}
+
+    async def save_state(self, context):
+        """Write the storage state of a context to storage_state, if set."""
+        if self.storage_state:
+            folder = os.path.dirname(os.path.abspath(self.storage_state))
+            os.makedirs(folder, exist_ok=True)
+            await context.storage_state(path=self.storage_state)
+
+    async def navigate(self, page, url, timeout=30000):
+        """Open url in page and wait until it is worth reading."""
+        # A reused page starts over, so the previous URL's host is not first-party any more
+        self._page_hosts.pop(page, None)
+        await page.goto(url, wait_until=self.wait_until, timeout=timeout)
+        if self.wait_for_selector:
+            try:
+                await page.wait_for_selector(self.wait_for_selector, timeout=self.selector_timeout)
+            except Exception:
+                # No pin yet (an empty board, a slow page); the scroll loop still waits for growth
+                pass
+
+# How the downloader loaded pages before profiles existed: everything, until the network is idle
+FULL_PROFILE_OPTIONS = {"block_resource_types": (), "block_third_party": False,
+                        "wait_until": 'networkidle', "wait_for_selector": None}
+
+PROFILES = ('full', 'lean')
+
+def build_profile(name='lean', **options):
+    """Return the named profile, with options overriding its settings."""
+    if name not in PROFILES:
+        raise ValueError(f"page profile must be one of {', '.join(PROFILES)}")
+    settings = dict(FULL_PROFILE_OPTIONS) if name == 'full' else {}
+    settings.update(options)
+    return PageLoadProfile(**settings)
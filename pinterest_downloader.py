@@ -1,66 +1,704 @@
 import os
 import asyncio
-import requests
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse, urljoin
-from playwright.async_api import async_playwright
+from pinterest_http import PinterestHTTPExtractor, find_pin_images
+from download_manifest import DownloadManifest, canonical_image_url, DONE, PENDING, FAILED
+from image_resolution import ResolutionResolver, VariantUnavailable, image_variant, MISSING_STATUSES
+from fetch_scheduler import FetchScheduler, TransientFetchError, transient_network_errors, check_response
+from download_events import (
+    ConsoleReporter, PageStarted, UrlsFound, PageFinished, PageTraffic, DownloadStarted, BytesReceived,
+    DownloadFinished, DownloadFailed, StageTiming, info, warning, error
+)
+from download_metrics import MetricsCollector, JsonLinesWriter, MetricsServer
+from disk_state import DiskIndex, ResultSpool
+from post_processing import PostProcessor, METADATA_FILENAME
+from storage_layout import layout_folder, allocate_path
+from downloader_options import ResolutionPolicy, RetryPolicy, StorageOptions, MetricsOutput
+from page_profile import build_profile, BLOCKED_ERROR
 from datetime import datetime
 import json
+import hashlib
+
+# Headers sent with every image request
+DOWNLOAD_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'DNT': '1',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+    'Referer': 'https://www.pinterest.com/'
+}
+
+# How often the page is checked for new content while scrolling
+SCROLL_POLL_MS = 250
+
+# Bytes received between two BytesReceived events for the same image
+PROGRESS_STEP = 256 * 1024
+
+# Per-image results of a streaming run, written to the download folder
+RESULTS_FILENAME = ".pinterest_results.jsonl"
+
+# Bytes read from the socket at a time; small, so an interrupted transfer keeps what arrived
+READ_CHUNK = 64 * 1024
+
+# Subfolder of the download folder that holds incomplete transfers
+PARTIAL_FOLDER = ".partial"
+
+# Returns every candidate image URL on the page in one round-trip: the src and
+# srcset entries of img tags and of Pinterest's pin close-up elements
+COLLECT_IMAGE_SOURCES_JS = """
+() => {
+    const urls = [];
+    for (const el of document.querySelectorAll('img, [data-test-id="pin-closeup-image"]')) {
+        const src = el.getAttribute('src');
+        if (src) urls.push(src);
+        const srcset = el.getAttribute('srcset');
+        if (srcset) {
+            for (const candidate of srcset.split(',')) {
+                const candidateUrl = candidate.trim().split(/\\s+/)[0];
+                if (candidateUrl) urls.push(candidateUrl);
+            }
+        }
+    }
+    return urls;
+}
+"""
+
+BROWSER_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+def perceptual_hash(filepath):
+    """Return the 64-bit difference hash (dHash) of an image as 16 hex digits.
+    
+    Resized or re-encoded copies of the same picture get identical or nearly
+    identical hashes. Requires Pillow.
+    """
+    from PIL import Image
+    
+    with Image.open(filepath) as image:
+        pixels = list(image.convert('L').resize((9, 8)).getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (left > right)
+    return f"{bits:016x}"
+
+class ResponseHarvester:
+    """Collect pin image URLs from the network responses of a page.
+    
+    Image requests are matched by URL (so images a page profile blocks are
+    still found); Pinterest's JSON resource responses (/resource/...) are
+    parsed for pin image maps. Found URLs are buffered,
+    together with their pin ID when the JSON carried one, until drain() is
+    called.
+    """
+    
+    def __init__(self, downloader):
+        self.downloader = downloader
+        self.count = 0
+        self._pending = {}
+        self._seen = set()
+        self._tasks = set()
+    
+    def on_request(self, request):
+        """Playwright "request" event handler."""
+        if request.resource_type == "image":
+            self.add(request.url)
+    
+    def on_response(self, response):
+        """Playwright "response" event handler."""
+        if "/resource/" in response.url and "json" in response.headers.get("content-type", ""):
+            task = asyncio.ensure_future(self._read_json(response))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def _read_json(self, response):
+        try:
+            data = await response.json()
+        except Exception:
+            # The body may be gone once the page navigates away
+            return
+        for url, pin_id in find_pin_images(data):
+            self.add(url, pin_id)
+    
+    def add(self, url, pin_id=None):
+        if self.downloader.is_valid_pinterest_image(url):
+            url = self.downloader.get_high_res_url(url)
+            if url not in self._seen:
+                self._seen.add(url)
+                self._pending[url] = pin_id
+                self.count += 1
+            elif pin_id and url in self._pending:
+                self._pending[url] = pin_id
+    
+    def drain(self):
+        """Return and forget the {url: pin ID} found since the last drain."""
+        urls, self._pending = self._pending, {}
+        return urls
+    
+    async def flush(self):
+        """Wait for JSON responses that are still being parsed."""
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+class TrafficMeter:
+    """Count the requests, blocked requests and response bytes of a page."""
+    
+    def __init__(self, page):
+        self.page = page
+        self.requests = 0
+        self.blocked = 0
+        self.bytes = 0
+    
+    def attach(self):
+        self.page.on("request", self._on_request)
+        self.page.on("requestfailed", self._on_failed)
+        self.page.on("response", self._on_response)
+    
+    def detach(self):
+        self.page.remove_listener("request", self._on_request)
+        self.page.remove_listener("requestfailed", self._on_failed)
+        self.page.remove_listener("response", self._on_response)
+    
+    def _on_request(self, request):
+        self.requests += 1
+    
+    def _on_failed(self, request):
+        if BLOCKED_ERROR in (request.failure or "").lower().replace('_', ''):
+            self.blocked += 1
+    
+    def _on_response(self, response):
+        length = response.headers.get("content-length")
+        if length and length.isdigit():
+            self.bytes += int(length)
+
+def create_session(concurrency=8, per_host_limit=4):
+    """Return an HTTP session with pooled keep-alive connections for image downloads."""
+    # Imported here so that importing this module (the CLI, the GUI) stays fast
+    import requests
+    from requests.adapters import HTTPAdapter
+    
+    session = requests.Session()
+    session.headers.update(DOWNLOAD_HEADERS)
+    # One connection pool per host, never more than per_host_limit sockets each
+    adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=per_host_limit, pool_block=True)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+class BrowserPagePool:
+    """A pool of Playwright pages, each living in its own isolated browser context.
+    
+    Pages are checked out with acquire() and returned with release(). A page
+    that crashed or was closed is replaced by a fresh one on release, and the
+    browser itself is relaunched if it disconnected. The browser is launched
+    by start() or, lazily, by the first acquire(), so a pool that is never
+    used costs nothing. Relaunches are reported to on_event (printed by
+    default).
+    
+    profile (see page_profile) blocks the requests pages do not need and
+    loads and saves their storage state. A profile with a cache_dir runs
+    the pages in one persistent context instead, so the browser's HTTP
+    cache outlives the pool.
+    """
+    
+    def __init__(self, size=1, headless=True, max_page_retries=1, on_event=None, profile=None):
+        self.size = max(1, int(size))
+        self.headless = headless
+        self.max_page_retries = max_page_retries
+        self.on_event = on_event or ConsoleReporter()
+        self.profile = profile
+        self.browser = None
+        self._persistent = None
+        self._pages = set()
+        self._playwright = None
+        self._idle = None
+        self._crashed = set()
+        self._start_lock = asyncio.Lock()
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+    
+    async def start(self):
+        """Launch the browser and open the pool's pages, unless already started."""
+        async with self._start_lock:
+            if self._idle is not None:
+                return
+            # Playwright is only loaded once a URL actually needs the browser
+            from playwright.async_api import async_playwright
+            self._playwright = await async_playwright().start()
+            try:
+                await self._launch_browser()
+                idle = asyncio.Queue()
+                for _ in range(self.size):
+                    idle.put_nowait(await self._new_page())
+            except BaseException:
+                # Leave the pool unstarted, so the next acquire() tries a clean launch
+                await self._close_browser()
+                raise
+            self._idle = idle
+    
+    async def stop(self):
+        """Save the storage state, close the browser and stop Playwright."""
+        if self.profile is not None and self.profile.storage_state:
+            open_pages = [page for page in self._pages if not page.is_closed()]
+            context = self._persistent or (open_pages[0].context if open_pages else None)
+            if context is not None:
+                try:
+                    await self.profile.save_state(context)
+                except Exception as e:
+                    self.on_event(warning(f"Could not save the browser state: {e}"))
+        await self._close_browser()
+        self._idle = None
+    
+    async def _close_browser(self):
+        self._pages.clear()
+        if self._persistent is not None:
+            try:
+                await self._persistent.close()
+            except Exception:
+                pass
+            self._persistent = None
+        if self.browser is not None:
+            try:
+                await self.browser.close()
+            except Exception:
+                pass
+            self.browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+    
+    async def _launch_browser(self):
+        if self.profile is not None and self.profile.cache_dir:
+            # Pages share one on-disk profile, so its HTTP cache is reused by the next run
+            self._persistent = await self._playwright.chromium.launch_persistent_context(
+                self.profile.cache_dir, headless=self.headless,
+                user_agent=BROWSER_USER_AGENT, viewport={"width": 1920, "height": 1080}
+            )
+            self._persistent.on("close", self._context_closed)
+            await self._prepare_context(self._persistent)
+        else:
+            self.browser = await self._playwright.chromium.launch(headless=self.headless)
+    
+    def _context_closed(self, context):
+        if context is self._persistent:
+            self._persistent = None
+    
+    def _is_running(self):
+        if self.profile is not None and self.profile.cache_dir:
+            return self._persistent is not None
+        return self.browser.is_connected()
+    
+    async def _prepare_context(self, context):
+        if self.profile is not None and self.profile.blocks_requests:
+            await context.route("**/*", self.profile.route)
+    
+    async def _new_page(self):
+        """Open a page in a new browser context, relaunching a dead browser first."""
+        if not self._is_running():
+            self.on_event(warning("Browser disconnected, relaunching..."))
+            await self._launch_browser()
+        if self._persistent is not None:
+            context = self._persistent
+        else:
+            context = await self.browser.new_context(
+                user_agent=BROWSER_USER_AGENT,
+                viewport={"width": 1920, "height": 1080},
+                **(self.profile.context_options() if self.profile is not None else {})
+            )
+            await self._prepare_context(context)
+        page = await context.new_page()
+        page.on("crash", self._crashed.add)
+        self._pages.add(page)
+        return page
+    
+    def is_healthy(self, page):
+        """Return False if the page crashed or was closed."""
+        return page not in self._crashed and not page.is_closed()
+    
+    async def acquire(self):
+        """Wait for an idle page and check it out, starting the pool if needed."""
+        await self.start()
+        return await self._idle.get()
+    
+    async def release(self, page):
+        """Return a page to the pool, replacing it if it is no longer usable."""
+        if not self.is_healthy(page):
+            self._crashed.discard(page)
+            self._pages.discard(page)
+            try:
+                # A shared persistent context stays open for the other pages
+                await (page.close() if self._persistent is not None else page.context.close())
+            except Exception:
+                pass
+            page = await self._new_page()
+        self._idle.put_nowait(page)
 
 class PinterestDownloader:
-    def __init__(self, download_folder=None):
-        """Initialize the Pinterest downloader."""
+    def __init__(self, download_folder=None, concurrency=8, per_host_limit=4, queue_size=None,
+                 page_pool_size=1, headless=True, max_scrolls=50, max_pins=None,
+                 scroll_quiet_ms=2000, scroll_time_budget=60, intercept_network=True,
+                 http_first=True, http_workers=4, use_manifest=True, resume=True, revalidate=False,
+                 resolution=None, retry=None, storage=None, metrics_output=None,
+                 on_event=None, quiet=False, streaming=False, results_file=None, session=None, hash_index=None,
+                 post_process=None, post_process_workers=None, page_profile=None):
+        """Initialize the Pinterest downloader.
+
+        concurrency images are downloaded at the same time, with at most
+        per_host_limit connections to one host and queue_size found URLs
+        waiting (default: 4 per worker). page_pool_size browser pages visit
+        input URLs in parallel, each scrolled until it stops growing for
+        scroll_quiet_ms or reaches max_scrolls, max_pins or
+        scroll_time_budget seconds. With http_first, URLs are first resolved
+        over plain HTTP (http_workers at a time) and the browser only visits
+        those that yield nothing.
+
+        use_manifest keeps a SQLite manifest in the download folder, so
+        finished images are skipped (or, with revalidate, re-requested
+        conditionally) and with resume an interrupted run continues.
+        resolution, retry, storage and metrics_output are a ResolutionPolicy,
+        RetryPolicy, StorageOptions and MetricsOutput (see
+        downloader_options); group_options() builds them from flat options.
+
+        Progress events (see download_events) go to on_event and to
+        add_listener() callbacks, and are printed unless quiet. With
+        streaming, found URLs, hashes and results are kept on disk (results
+        in results_file) so memory stays flat. session and hash_index share
+        an HTTP session and a dedup index with other downloaders.
+        post_process stages (see post_processing) run on every new file in
+        post_process_workers processes. page_profile ('full', 'lean' or a
+        PageLoadProfile) decides how much of each page the browser loads.
+        """
         if download_folder is None:
             # Default to downloads folder in current directory
             self.download_folder = os.path.join(os.getcwd(), "downloads")
         else:
-            self.download_folder = download_folder
+            # Manifest rows store absolute paths, so a later run from another directory still finds them
+            self.download_folder = os.path.abspath(download_folder)
+        # The folder is created by the first thing written to it, so listing images leaves no trace
         
-        # Create download folder if it doesn't exist
-        os.makedirs(self.download_folder, exist_ok=True)
+        self.concurrency = max(1, int(concurrency))
+        self.per_host_limit = max(1, min(int(per_host_limit), self.concurrency))
+        self.queue_size = queue_size if queue_size else self.concurrency * 4
+        self.page_pool_size = max(1, int(page_pool_size))
+        self.headless = headless
+        self.max_scrolls = max(0, int(max_scrolls))
+        self.max_pins = max_pins
+        self.scroll_quiet_ms = scroll_quiet_ms
+        self.scroll_time_budget = scroll_time_budget
+        self.intercept_network = intercept_network
+        self.http_first = http_first
+        self.http_workers = max(1, int(http_workers))
+        self.use_manifest = use_manifest
+        self.resume = resume
+        self.revalidate = revalidate
+        self.resolution = resolution or ResolutionPolicy()
+        self.retry = retry or RetryPolicy()
+        self.storage = storage or StorageOptions()
+        if self.storage.sink is not None and post_process:
+            raise ValueError("post_process needs files and cannot write to an archive sink")
+        if isinstance(page_profile, str):
+            page_profile = build_profile(page_profile)
+        self.page_profile = page_profile
+        self.resolver = None
+        self.session = session
+        self._owns_session = session is None
+        self.manifest = None
+        
+        self.streaming = streaming
+        self.results = None
+        if streaming:
+            if results_file is None:
+                os.makedirs(self.download_folder, exist_ok=True)
+            self.results = ResultSpool(results_file or os.path.join(self.download_folder, RESULTS_FILENAME))
         
         self.downloaded_images = []
         self.failed_downloads = []
+        self.downloaded_count = 0
+        self.failed_count = 0
+        self.bytes_downloaded = 0
+        self.download_elapsed = 0.0
+        self.found_count = 0
+        self.skipped_count = 0
+        self.duplicate_count = 0
+        self.unchanged_count = 0
+        self.resumed_count = 0
+        self.retry_count = 0
+        self.throttled_count = 0
+        self.breaker_trips = 0
+        if hash_index is not None:
+            self._hash_index = hash_index
+        else:
+            self._hash_index = DiskIndex() if streaming else {}
+        self._perceptual_index = None
+        self._dedup_lock = threading.Lock()
+        self.started_count = 0
+        self.time_to_first_image = None
+        self._stats_lock = threading.Lock()
+        
+        self.metrics = MetricsCollector()
+        self.listeners = [self.metrics]
+        if not quiet:
+            self.listeners.append(ConsoleReporter())
+        if on_event is not None:
+            self.listeners.append(on_event)
+        metrics_output = metrics_output or MetricsOutput()
+        self.metrics_writer = None
+        if metrics_output.metrics_file:
+            self.metrics_writer = JsonLinesWriter(metrics_output.metrics_file, self.metrics)
+            self.listeners.append(self.metrics_writer)
+        self.metrics_server = None
+        if metrics_output.metrics_port is not None:
+            self.metrics_server = MetricsServer(self.metrics, metrics_output.metrics_port).start()
+        
+        self.post_processor = None
+        if post_process:
+            self.post_processor = PostProcessor(post_process, workers=post_process_workers, on_event=self.emit,
+                                                metadata_file=os.path.join(self.download_folder, METADATA_FILENAME))
+    
+    def add_listener(self, callback):
+        """Call callback(event) for every progress event from now on."""
+        self.listeners.append(callback)
+    
+    def emit(self, event):
+        """Pass an event to every listener."""
+        for listener in self.listeners:
+            listener(event)
+    
+    def get_session(self):
+        """Return the pooled HTTP session shared by all download workers."""
+        if self.session is None:
+            self.session = create_session(self.concurrency, self.per_host_limit)
+        return self.session
+    
+    def get_resolver(self):
+        """Return the resolution resolver shared by the download workers."""
+        if self.resolver is None:
+            self.resolver = ResolutionResolver(self.get_session(), max_resolution=self.resolution.max_resolution,
+                                               max_bytes=self.resolution.max_bytes, manifest=self.get_manifest())
+        return self.resolver
+    
+    def fetch_image(self, url, pin_id=None, raise_transient=False, source=None):
+        """Download the best available variant of an image allowed by the size policy.
+        
+        With raise_transient, failures worth retrying raise TransientFetchError
+        instead of counting as failed downloads. source is the input URL the
+        image was found on.
+        """
+        if not self.resolution.probe_resolutions:
+            return self.download_image(url, pin_id=pin_id, raise_transient=raise_transient, source=source)
+        resolver = self.get_resolver()
+        first = resolver.first_choice(url)
+        try:
+            # Usually there: the GET itself is the probe, and HEAD requests are only spent when it is not
+            result = self.download_image(first, pin_id=pin_id, raise_transient=raise_transient,
+                                         source=source, fallback=True)
+        except VariantUnavailable:
+            pass
+        else:
+            if result is not None:
+                resolver.record(url, first)
+            return result
+        try:
+            chosen = resolver.resolve(url, tried=(first,))
+        except TransientFetchError as e:
+            if raise_transient:
+                if self.manifest is not None:
+                    self.manifest.record_failed(url, e, pin_id=pin_id)
+                raise
+            chosen, reason = None, e
+        else:
+            reason = "no variant available within the size policy"
+        if chosen is None:
+            self.emit(DownloadFailed(url, str(reason), 0))
+            self._add_failed(url, reason)
+            if self.manifest is not None:
+                self.manifest.record_failed(url, reason, pin_id=pin_id)
+            return None
+        result = self.download_image(chosen, pin_id=pin_id, raise_transient=raise_transient, source=source)
+        if result is not None:
+            resolver.record(url, chosen)
+        return result
+    
+    def get_manifest(self):
+        """Return the download folder's manifest, or None when disabled."""
+        if self.manifest is None and self.use_manifest:
+            os.makedirs(self.download_folder, exist_ok=True)
+            self.manifest = DownloadManifest.for_folder(self.download_folder)
+        return self.manifest
+    
+    def close(self):
+        """Release pooled HTTP connections, the manifest and the metrics outputs."""
+        if self.session is not None:
+            if self._owns_session:
+                self.session.close()
+            self.session = None
+        if self.manifest is not None:
+            self.manifest.close()
+            self.manifest = None
+        if self.results is not None:
+            self.results.close()
+        if isinstance(self._hash_index, DiskIndex):
+            self._hash_index.close()
+        if self.post_processor is not None:
+            self.post_processor.close()
+        if self.storage.sink is not None:
+            self.storage.sink.close()
+        if self.metrics_writer is not None:
+            self.metrics_writer.close()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+            self.metrics_server = None
     
     async def extract_images_from_pinterest_url(self, page, url):
         """Extract image URLs from a Pinterest page."""
-        print(f"Visiting: {url}")
+        image_urls = []
+        async for batch in self.iter_images_from_pinterest_url(page, url):
+            image_urls.extend(batch)
+        return image_urls
+    
+    async def iter_images_from_pinterest_url(self, page, url):
+        """Yield batches of newly found image URLs as a Pinterest page is scrolled.
+        
+        Each batch is a dict mapping image URL to pin ID (None when unknown),
+        so iterating over it gives the URLs.
+        
+        A batch is yielded after the initial load and after every scroll pass,
+        so downloads can start before the page is fully scrolled. The consumer
+        controls the pace: the page is not scrolled further until it asks for
+        the next batch.
+        
+        Scrolling stops as soon as the page stops growing for scroll_quiet_ms,
+        or when max_pins, max_scrolls or the scroll_time_budget is reached.
+        With intercept_network, image requests and JSON resource responses are mined
+        for pin images too, which also catches pins the grid already dropped.
+        """
+        try:
+            async for batch in self._scroll_page_images(page, url):
+                yield batch
+        except Exception as e:
+            self.emit(error(f"Error extracting images from {url}: {str(e)}"))
+    
+    async def _scroll_page_images(self, page, url):
+        """Implementation of iter_images_from_pinterest_url that lets errors propagate."""
+        self.emit(PageStarted(url, "browser"))
+        found = set()
+        harvester = None
+        if self.intercept_network:
+            harvester = ResponseHarvester(self)
+            page.on("request", harvester.on_request)
+            page.on("response", harvester.on_response)
+        traffic = TrafficMeter(page)
+        traffic.attach()
         
         try:
-            await page.goto(url, wait_until="networkidle", timeout=30000)
-            await page.wait_for_timeout(3000)  # Wait for images to load
+            navigate_started = time.monotonic()
+            if self.page_profile is not None:
+                await self.page_profile.navigate(page, url)
+            else:
+                await page.goto(url, wait_until="networkidle", timeout=30000)
+            started = time.monotonic()
+            self.emit(StageTiming("navigate", started - navigate_started, url))
+            deadline = started + self.scroll_time_budget if self.scroll_time_budget else None
+            # Wait for the first images instead of a fixed delay
+            size = await self._page_size(page, harvester)
+            if not size[1] and not size[2]:
+                await self._wait_for_page_growth(page, size, deadline, harvester)
             
-            # Scroll down to load more images
-            for _ in range(3):
+            scrolls = 0
+            while True:
+                extract_started = time.monotonic()
+                new_urls = await self._collect_page_images(page)
+                if harvester is not None:
+                    new_urls.update(harvester.drain())
+                new_urls = self._new_batch(new_urls, found)
+                self.emit(StageTiming("extract", time.monotonic() - extract_started, url))
+                if new_urls:
+                    self.emit(UrlsFound(url, len(new_urls), "browser"))
+                    yield new_urls
+                
+                if self.max_pins and len(found) >= self.max_pins:
+                    break
+                if scrolls >= self.max_scrolls:
+                    break
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+                
+                scroll_started = time.monotonic()
+                before = await self._page_size(page, harvester)
                 await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                await page.wait_for_timeout(2000)
-            
-            # Extract image URLs using multiple selectors
-            image_urls = set()
-            
-            # Method 1: Look for img tags with Pinterest image patterns
-            img_elements = await page.query_selector_all('img')
-            for img in img_elements:
-                src = await img.get_attribute('src')
-                if src and self.is_valid_pinterest_image(src):
-                    # Get high-resolution version
-                    high_res_url = self.get_high_res_url(src)
-                    image_urls.add(high_res_url)
+                scrolls += 1
+                grew = await self._wait_for_page_growth(page, before, deadline, harvester)
+                self.emit(StageTiming("scroll", time.monotonic() - scroll_started, url))
+                if not grew:
+                    break
             
-            # Method 2: Look for data attributes that might contain image URLs
-            data_elements = await page.query_selector_all('[data-test-id="pin-closeup-image"]')
-            for element in data_elements:
-                src = await element.get_attribute('src')
-                if src and self.is_valid_pinterest_image(src):
-                    high_res_url = self.get_high_res_url(src)
-                    image_urls.add(high_res_url)
+            # Responses still being parsed may hold the last pins of the page
+            if harvester is not None and not (self.max_pins and len(found) >= self.max_pins):
+                await harvester.flush()
+                new_urls = self._new_batch(harvester.drain(), found)
+                if new_urls:
+                    self.emit(UrlsFound(url, len(new_urls), "browser"))
+                    yield new_urls
             
-            print(f"Found {len(image_urls)} images on this page")
-            return list(image_urls)
+            self.emit(PageFinished(url, "browser", len(found), scrolls, time.monotonic() - started))
             
-        except Exception as e:
-            print(f"Error extracting images from {url}: {str(e)}")
-            return []
+        finally:
+            traffic.detach()
+            self.emit(PageTraffic(url, traffic.requests, traffic.blocked, traffic.bytes))
+            if harvester is not None:
+                page.remove_listener("request", harvester.on_request)
+                page.remove_listener("response", harvester.on_response)
+    
+    def _new_batch(self, candidates, found):
+        """Return the candidates not yet in found, capped by max_pins, and add them to found."""
+        batch = {u: pin_id for u, pin_id in candidates.items() if u not in found}
+        if self.max_pins:
+            batch = dict(list(batch.items())[:max(0, self.max_pins - len(found))])
+        found.update(batch)
+        return batch
+    
+    async def _page_size(self, page, harvester=None):
+        """Return the page height, image count and harvested URL count used to detect growth."""
+        height, images = await page.evaluate("[document.body.scrollHeight, document.images.length]")
+        return (height, images, harvester.count if harvester is not None else 0)
+    
+    async def _wait_for_page_growth(self, page, before, deadline=None, harvester=None):
+        """Poll until the page grows past before; False after a quiet period or the deadline."""
+        quiet_until = time.monotonic() + self.scroll_quiet_ms / 1000
+        while True:
+            await page.wait_for_timeout(SCROLL_POLL_MS)
+            after = await self._page_size(page, harvester)
+            if any(now > then for now, then in zip(after, before)):
+                return True
+            now = time.monotonic()
+            if now >= quiet_until or (deadline is not None and now >= deadline):
+                return False
+    
+    async def _collect_page_images(self, page):
+        """Collect the high-resolution image URLs currently present on the page.
+        
+        All candidate attributes are read in a single page.evaluate call
+        instead of one round-trip per element.
+        """
+        sources = await page.evaluate(COLLECT_IMAGE_SOURCES_JS)
+        image_urls = {}
+        for src in sources:
+            if src and self.is_valid_pinterest_image(src):
+                # Get high-resolution version
+                image_urls[self.get_high_res_url(src)] = None
+        return image_urls
     
     def is_valid_pinterest_image(self, url):
         """Check if URL is a valid Pinterest image."""
@@ -94,91 +732,624 @@ class PinterestDownloader:
         
         return url
     
-    def download_image(self, url, filename=None):
-        """Download an image from URL."""
+    def download_image(self, url, filename=None, pin_id=None, raise_transient=False, source=None, fallback=False):
+        """Download an image from URL.
+        
+        Bytes are written to a partial file that is renamed into place only
+        once the transfer is complete. An interrupted transfer is resumed with
+        a Range request the next time the URL is downloaded, and an image the
+        manifest already has is revalidated with If-None-Match /
+        If-Modified-Since, so an unchanged image costs a 304.
+        
+        With raise_transient, throttling, 5xx and network errors raise
+        TransientFetchError so the caller can retry; the partial file and its
+        validators are kept for the next attempt. With fallback, a variant
+        the CDN does not have or that is over max_bytes raises
+        VariantUnavailable instead of failing, so a smaller one can be tried.
+        """
+        row = self.manifest.get(url) if self.manifest is not None else None
+        existing_path = None
+        headers = {}
+        if row is not None and row["status"] == DONE and row["file_path"] \
+                and os.path.exists(row["file_path"]):
+            existing_path = row["file_path"]
+            if row["etag"]:
+                headers['If-None-Match'] = row["etag"]
+            if row["last_modified"]:
+                headers['If-Modified-Since'] = row["last_modified"]
+        
+        # An archive sink has no partial file to resume from
+        part_path = self._partial_path(url) if self.storage.sink is None else None
+        offset = 0
+        if existing_path is None and part_path is not None and os.path.exists(part_path) and row is not None:
+            # Resume only when the partial bytes can be tied to a strong validator
+            validator = row["etag"] if row["etag"] and not row["etag"].startswith('W/') \
+                else row["last_modified"]
+            size = os.path.getsize(part_path)
+            if validator and size:
+                offset = size
+                headers['Range'] = f'bytes={offset}-'
+                headers['If-Range'] = validator
+        
+        etag = last_modified = None
+        started = time.monotonic()
         try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.9',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'DNT': '1',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1',
-                'Referer': 'https://www.pinterest.com/'
-            }
+            # Closing the response hands the connection back to the shared pool
+            with self.get_session().get(url, headers=headers, stream=True, timeout=30) as response:
+                if response.status_code == 304:
+                    with self._stats_lock:
+                        self.unchanged_count += 1
+                    seconds = time.monotonic() - started
+                    self.emit(StageTiming("download", seconds, url))
+                    self.emit(DownloadFinished(url, existing_path, 0, seconds, "unchanged", None, None))
+                    return existing_path
+                if response.status_code == 416:
+                    # The partial file no longer matches the remote image; start over
+                    os.remove(part_path)
+                    return self.download_image(url, filename, pin_id, raise_transient, source, fallback=fallback)
+                check_response(response)
+                if fallback and response.status_code in MISSING_STATUSES:
+                    raise VariantUnavailable(f"{response.status_code} for {url}")
+                if fallback and response.status_code == 200 and self.resolver is not None \
+                        and self.resolver.too_large(response.headers.get('Content-Length')):
+                    raise VariantUnavailable(f"{url} is larger than {self.resolution.max_bytes} bytes")
+                response.raise_for_status()
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+                
+                digest = hashlib.sha256()
+                resumed = response.status_code == 206
+                if resumed:
+                    with open(part_path, 'rb') as f:
+                        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                            digest.update(chunk)
+                else:
+                    offset = 0
+                
+                size = 0
+                reported = 0
+                if self.storage.sink is not None:
+                    buffer = self.storage.sink.open_buffer()
+                else:
+                    buffer = open(part_path, 'ab' if resumed else 'wb', buffering=self.storage.write_buffer)
+                received = False
+                try:
+                    for chunk in response.iter_content(chunk_size=READ_CHUNK):
+                        buffer.write(chunk)
+                        digest.update(chunk)
+                        size += len(chunk)
+                        if size - reported >= PROGRESS_STEP:
+                            self.emit(BytesReceived(url, size - reported))
+                            reported = size
+                    received = True
+                finally:
+                    # A complete spool buffer is handed to the sink, which closes it
+                    if self.storage.sink is None or not received:
+                        buffer.close()
+                if size > reported:
+                    self.emit(BytesReceived(url, size - reported))
             
-            response = requests.get(url, headers=headers, stream=True, timeout=30)
-            response.raise_for_status()
-            
-            if filename is None:
-                # Generate filename from URL
-                parsed_url = urlparse(url)
-                filename = os.path.basename(parsed_url.path)
-                if not filename or '.' not in filename:
-                    filename = f"pinterest_image_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.jpg"
-            
-            # Ensure unique filename
-            base_name, ext = os.path.splitext(filename)
-            counter = 1
-            while os.path.exists(os.path.join(self.download_folder, filename)):
-                filename = f"{base_name}_{counter}{ext}"
-                counter += 1
-            
-            filepath = os.path.join(self.download_folder, filename)
-            
-            with open(filepath, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            
-            print(f"Downloaded: {filename}")
-            self.downloaded_images.append(filepath)
-            return filepath
+            sha256 = digest.hexdigest()
+            archive_path = None
+            if self.storage.sink is not None:
+                filepath, duplicate_of, archive_path = self._add_to_sink(
+                    buffer, filename or self._filename_for_url(url), size, sha256, url, pin_id, source)
+                phash = None
+            else:
+                if existing_path is not None:
+                    # New content for an image we already had: replace it in place
+                    filepath = existing_path
+                else:
+                    filepath = self._allocate_filepath(filename or self._filename_for_url(url), sha256, source)
+                os.replace(part_path, filepath)
+                filepath, duplicate_of, phash = self._deduplicate(filepath, sha256)
+            with self._stats_lock:
+                self.bytes_downloaded += size
+                if resumed:
+                    self.resumed_count += 1
+                if duplicate_of:
+                    self.duplicate_count += 1
+            # New files waiting for post-processing are counted once it accepts them
+            post_process = bool(filepath) and self.post_processor is not None and not duplicate_of
+            if filepath and not post_process:
+                self._add_downloaded(url, filepath)
+            seconds = time.monotonic() - started
+            outcome = "duplicate" if duplicate_of else "resumed" if resumed else "downloaded"
+            self.emit(StageTiming("download", seconds, url))
+            self.emit(DownloadFinished(url, filepath, offset + size, seconds, outcome, duplicate_of,
+                                       offset if resumed else None))
+            if self.manifest is not None:
+                self.manifest.record_done(url, archive_path or filepath or duplicate_of, offset + size, sha256,
+                                          etag=etag, last_modified=last_modified,
+                                          pin_id=pin_id, phash=phash, variant=image_variant(url))
+            if post_process:
+                self.post_processor.submit(filepath, url, lambda result: self._post_processed(url, filepath, result))
+            return filepath or duplicate_of
             
+        except VariantUnavailable:
+            raise
         except Exception as e:
-            print(f"Failed to download {url}: {str(e)}")
-            self.failed_downloads.append(url)
+            if self.manifest is not None:
+                self.manifest.record_failed(url, e, pin_id=pin_id, etag=etag, last_modified=last_modified)
+            if raise_transient and isinstance(e, TransientFetchError):
+                raise
+            if raise_transient and isinstance(e, transient_network_errors()):
+                raise TransientFetchError(str(e)) from e
+            self.emit(DownloadFailed(url, str(e), 0))
+            self._add_failed(url, e)
             return None
     
-    async def process_pinterest_urls(self, urls):
-        """Process multiple Pinterest URLs and download all images."""
-        async with async_playwright() as p:
-            # Launch browser
-            browser = await p.chromium.launch(headless=False)  # Set to True for headless mode
-            context = await browser.new_context(
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-                viewport={"width": 1920, "height": 1080}
-            )
-            page = await context.new_page()
-            
-            all_image_urls = []
-            
+    def _add_downloaded(self, url, filepath):
+        """Count a downloaded file and remember its path in memory or in the results spool."""
+        with self._stats_lock:
+            self.downloaded_count += 1
+            if self.results is None:
+                self.downloaded_images.append(filepath)
+        if self.results is not None:
+            self.results.add("downloaded", url, path=filepath)
+    
+    def _post_processed(self, url, filepath, result):
+        """Count a file once the post-processing stages are done with it."""
+        if "rejected" in result:
+            self._add_failed(url, result["rejected"])
+            if self.manifest is not None:
+                self.manifest.record_rejected(url, result["rejected"])
+            return
+        self._add_downloaded(url, result["path"])
+        if result["path"] != filepath and self.manifest is not None:
+            self.manifest.record_moved(url, result["path"])
+    
+    def _add_failed(self, url, error):
+        """Count a failed image and remember its URL in memory or in the results spool."""
+        with self._stats_lock:
+            self.failed_count += 1
+            if self.results is None:
+                self.failed_downloads.append(url)
+        if self.results is not None:
+            self.results.add("failed", url, error=error)
+    
+    def _partial_path(self, url):
+        """Return where the bytes of url are collected until the transfer completes."""
+        partial_folder = os.path.join(self.download_folder, PARTIAL_FOLDER)
+        os.makedirs(partial_folder, exist_ok=True)
+        key = hashlib.sha1(canonical_image_url(url).encode('utf-8')).hexdigest()
+        return os.path.join(partial_folder, key + '.part')
+    
+    def _filename_for_url(self, url):
+        """Generate a filename from URL."""
+        parsed_url = urlparse(url)
+        filename = os.path.basename(parsed_url.path)
+        if not filename or '.' not in filename:
+            filename = f"pinterest_image_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.jpg"
+        return filename
+    
+    def _allocate_filepath(self, filename, sha256, source=None):
+        """Claim a unique path for filename where the storage layout puts it."""
+        folder = os.path.join(self.download_folder, layout_folder(self.storage.layout, sha256, source))
+        # A colliding name gets part of the content hash instead of probing counters
+        return allocate_path(folder, filename, unique_hint=sha256[:8])
+    
+    def _add_to_sink(self, buffer, filename, size, sha256, url, pin_id, source):
+        """Append a finished transfer to the archive sink unless its content is already archived.
+        
+        Returns (archive path and member name of the new image or None,
+        where the existing copy is or None, archive file holding the image).
+        """
+        try:
+            if self.storage.dedup != 'off':
+                with self._dedup_lock:
+                    existing = self._hash_index.get(sha256)
+                    if existing is None and self.manifest is not None:
+                        existing = self.manifest.find_by_hash(sha256)
+                    if existing is None:
+                        # Claimed before writing, so a concurrent copy is seen as a duplicate
+                        existing = self._hash_index.setdefault(sha256, self.storage.sink.path)
+                        if existing == self.storage.sink.path:
+                            existing = None
+                    if existing is not None and os.path.exists(existing):
+                        return None, existing, existing
+                    self._hash_index[sha256] = self.storage.sink.path
+            buffer.seek(0)
+            name = os.path.join(layout_folder(self.storage.layout, sha256, source), filename)
+            archive_path, member = self.storage.sink.add(name, buffer, size,
+                                                 {"url": url, "pin_id": pin_id, "source": source, "sha256": sha256})
+            if self.storage.dedup != 'off':
+                with self._dedup_lock:
+                    self._hash_index[sha256] = archive_path
+            return os.path.join(archive_path, member), None, archive_path
+        finally:
+            buffer.close()
+    
+    def _deduplicate(self, filepath, sha256):
+        """Apply the dedup mode to a freshly written file.
+        
+        Returns (path of the new file or None if it was removed, path of the
+        existing copy or None, perceptual hash or None).
+        """
+        if self.storage.dedup == 'off':
+            return filepath, None, None
+        
+        phash = None
+        if self.storage.perceptual_dedup:
+            # Decoding is the slow part, so keep it outside the lock
+            try:
+                phash = perceptual_hash(filepath)
+            except Exception as e:
+                self.emit(warning(f"Cannot compute perceptual hash of {os.path.basename(filepath)}: {e}"))
+        
+        with self._dedup_lock:
+            existing = self._hash_index.get(sha256)
+            if existing is None and self.manifest is not None:
+                existing = self.manifest.find_by_hash(sha256)
+            if existing is None and phash is not None:
+                existing = self._find_similar_image(phash)
+            if existing is None:
+                # One step, so of two workers sharing the index with this content only one keeps it
+                existing = self._hash_index.setdefault(sha256, filepath)
+            if existing == filepath or not os.path.exists(existing):
+                if existing != filepath:
+                    # The recorded copy is gone; this file holds the content now
+                    self._hash_index[sha256] = filepath
+                if phash is not None:
+                    self._load_perceptual_index().append((int(phash, 16), filepath))
+                return filepath, None, phash
+        
+        os.remove(filepath)
+        if self.storage.dedup == 'hardlink':
+            try:
+                os.link(existing, filepath)
+                return filepath, existing, phash
+            except OSError:
+                pass
+        return None, existing, phash
+    
+    def _load_perceptual_index(self):
+        """Return the (perceptual hash, path) list, loading it from the manifest on first use."""
+        if self._perceptual_index is None:
+            known = self.manifest.perceptual_hashes() if self.manifest is not None else []
+            self._perceptual_index = [(int(h, 16), path) for h, path in known]
+        return self._perceptual_index
+    
+    def _find_similar_image(self, phash):
+        """Return a known file whose perceptual hash is within the threshold, or None."""
+        value = int(phash, 16)
+        for other, path in self._load_perceptual_index():
+            if bin(value ^ other).count('1') <= self.storage.perceptual_threshold and os.path.exists(path):
+                return path
+        return None
+    
+    async def download_images(self, urls):
+        """Download image URLs concurrently through a bounded worker pool."""
+        async def produce(submit):
             for url in urls:
-                images = await self.extract_images_from_pinterest_url(page, url)
-                all_image_urls.extend(images)
-            
-            await browser.close()
+                await submit(url)
+        
+        await self._run_download_pipeline(produce)
+    
+    async def _run_download_pipeline(self, produce):
+        """Run download workers fed by the produce coroutine.
+        
+        produce receives an async submit(url, pin_id=None, source=None)
+        callable; source is the input URL the image was found on. URLs go
+        through a bounded queue, so submit blocks while the workers are behind
+        and the producer is slowed down instead of buffering every URL in
+        memory. Duplicate URLs (including other size variants of the same
+        image), and images the manifest already has on disk, are dropped
+        before they reach the queue. In streaming mode the keys seen so far
+        live in a scratch file rather than in memory.
+        """
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        seen = DiskIndex() if self.streaming else set()
+        scheduler = FetchScheduler(self.per_host_limit, rate_limit=self.retry.rate_limit,
+                                   max_retries=self.retry.max_retries,
+                                   adaptive_concurrency=self.retry.adaptive_concurrency,
+                                   on_event=self.emit)
+        manifest = self.get_manifest()
+        # Created before the worker threads start, so they cannot race to create their own
+        self.get_session()
+        if self.resolution.probe_resolutions:
+            self.get_resolver()
+        start = time.monotonic()
+        
+        async def submit(url, pin_id=None, source=None):
+            # Size variants of one image share a key, so only the first is fetched
+            key = canonical_image_url(url)
+            if key in seen:
+                return
+            seen.add(key)
+            if manifest is not None:
+                if not self.revalidate and manifest.is_done(url):
+                    self.skipped_count += 1
+                    return
+                manifest.record_pending(url, pin_id, source)
+            self.found_count += 1
+            await queue.put((url, pin_id, source))
+        
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            workers = [
+                asyncio.create_task(self._download_worker(queue, executor, scheduler, start))
+                for _ in range(self.concurrency)
+            ]
+            cancelled = False
+            try:
+                await produce(submit)
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
+            finally:
+                if cancelled:
+                    # Stop at once instead of downloading what is still queued;
+                    # unfinished images stay pending in the manifest
+                    for worker in workers:
+                        worker.cancel()
+                    await asyncio.gather(*workers, return_exceptions=True)
+                else:
+                    # One sentinel per worker so every worker exits once the queue drains
+                    for _ in workers:
+                        await queue.put(None)
+                    await asyncio.gather(*workers)
+                if isinstance(seen, DiskIndex):
+                    seen.close()
+        if self.post_processor is not None:
+            # Files still in the process pool belong to this batch
+            pending = self.post_processor.pending()
+            if pending:
+                await asyncio.gather(*(asyncio.wrap_future(future) for future in pending))
+        self.download_elapsed += time.monotonic() - start
+        self.retry_count += scheduler.retry_count
+        self.throttled_count += scheduler.throttled_count
+        self.breaker_trips += scheduler.breaker.trips
+    
+    async def _download_worker(self, queue, executor, scheduler, start):
+        """Pull URLs off the queue and download them in the thread pool."""
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            url, pin_id, source = item
+            self.started_count += 1
+            self.emit(DownloadStarted(url, self.started_count, self.found_count))
+            try:
+                filepath = await scheduler.run(
+                    urlparse(url).netloc,
+                    lambda: loop.run_in_executor(executor, self.fetch_image, url, pin_id, True, source),
+                    url
+                )
+            except TransientFetchError as e:
+                self.emit(DownloadFailed(url, str(e), self.retry.max_retries))
+                self._add_failed(url, e)
+                filepath = None
+            if filepath and self.time_to_first_image is None:
+                self.time_to_first_image = time.monotonic() - start
+    
+    async def process_pinterest_urls(self, urls, page_pool=None):
+        """Process multiple Pinterest URLs and download all images.
+        
+        Pages are scraped and images downloaded at the same time: every scroll
+        pass feeds its new image URLs straight to the download workers. Input
+        URLs are spread over a pool of browser pages; pass an already started
+        BrowserPagePool to reuse it, otherwise one is created for this call.
+        
+        With the manifest enabled, pending and failed images from earlier runs
+        are retried first, and input URLs finished before an interruption are
+        not visited again when the run is resumed.
+        """
+        manifest = self.get_manifest()
+        if manifest is not None:
+            manifest.start_run(resume=self.resume)
+            if manifest.resumed:
+                self.emit(info("Resuming the interrupted run in this folder"))
+        
+        async def produce(submit):
+            if manifest is not None:
+                counts = manifest.counts()
+                unfinished = counts.get(PENDING, 0) + counts.get(FAILED, 0)
+                if unfinished:
+                    self.emit(info(f"Retrying {unfinished} unfinished images from earlier runs"))
+                for url, pin_id, source in manifest.iter_unfinished_images():
+                    await submit(url, pin_id, source)
             
-            # Remove duplicates
-            unique_images = list(set(all_image_urls))
-            print(f"\nTotal unique images found: {len(unique_images)}")
+            if page_pool is not None:
+                await self._scrape_urls(page_pool, urls, submit)
+                return
+            async with BrowserPagePool(size=self.page_pool_size, headless=self.headless,
+                                       on_event=self.emit, profile=self.page_profile) as pool:
+                await self._scrape_urls(pool, urls, submit)
+        
+        self.emit(info(f"Starting downloads with {self.concurrency} workers..."))
+        await self._run_download_pipeline(produce)
+        if manifest is not None:
+            manifest.finish_run()
+        self.emit(info(f"\nTotal unique images found: {self.found_count + self.skipped_count} "
+                       f"({self.skipped_count} already downloaded)"))
+        
+        return self.get_summary()
+    
+    async def download_stream(self, produce):
+        """Download the images fed by the produce coroutine and return the summary.
+        
+        produce receives an async submit(url, pin_id=None, source=None) callable, as in
+        _run_download_pipeline; use it to download image URLs that come from
+        somewhere other than this downloader's own scraping.
+        """
+        await self._run_download_pipeline(produce)
+        return self.get_summary()
+    
+    async def scrape_urls(self, urls, submit, page_pool):
+        """Pass the images of every input URL to submit(url, pin_id, source) without downloading them."""
+        await self._scrape_urls(page_pool, urls, submit)
+    
+    async def list_images(self, urls, on_image, page_pool=None):
+        """Resolve the input URLs without downloading, calling on_image(url, pin_id, source) per image.
+        
+        Size variants of one image are reported once. As when downloading,
+        the browser is only launched for URLs plain HTTP cannot resolve.
+        Returns the number of images found.
+        """
+        seen = DiskIndex() if self.streaming else set()
+        count = 0
+        
+        async def submit(url, pin_id=None, source=None):
+            nonlocal count
+            key = canonical_image_url(url)
+            if key in seen:
+                return
+            seen.add(key)
+            count += 1
+            on_image(url, pin_id, source)
+        
+        try:
+            if page_pool is not None:
+                await self._scrape_urls(page_pool, urls, submit)
+            else:
+                async with BrowserPagePool(size=self.page_pool_size, headless=self.headless,
+                                           on_event=self.emit, profile=self.page_profile) as pool:
+                    await self._scrape_urls(pool, urls, submit)
+        finally:
+            if isinstance(seen, DiskIndex):
+                seen.close()
+        return count
+    
+    async def _scrape_urls(self, pool, urls, submit):
+        """Visit the input URLs with every page of the pool working in parallel."""
+        pending = iter(urls)
+        retries = []
+        worker_count = max(pool.size, self.http_workers) if self.http_first else pool.size
+        workers = [self._page_worker(pool, pending, retries, submit) for _ in range(worker_count)]
+        await asyncio.gather(*workers)
+    
+    async def _page_worker(self, pool, pending, retries, submit):
+        """Resolve input URLs until none are left, checking out a page when HTTP is not enough."""
+        while True:
+            if retries:
+                url, attempt = retries.pop()
+            else:
+                url = next(pending, None)
+                attempt = 0
+                if url is None:
+                    return
+                if self.manifest is not None and self.manifest.is_source_done(url):
+                    self.emit(info(f"Skipping {url}: already finished in this run"))
+                    continue
+                if self.http_first and await self._scrape_url_over_http(url, submit):
+                    self._source_done(url)
+                    continue
             
-            # Download all images
-            print("Starting downloads...")
-            for i, img_url in enumerate(unique_images, 1):
-                print(f"Downloading {i}/{len(unique_images)}: {img_url}")
-                self.download_image(img_url)
+            page = None
+            completed = False
+            healthy = True
+            try:
+                # A browser that cannot launch fails this URL, not the whole run
+                page = await pool.acquire()
+                async for batch in self._scroll_page_images(page, url):
+                    for img_url, pin_id in batch.items():
+                        await submit(img_url, pin_id, url)
+                completed = True
+            except Exception as e:
+                self.emit(error(f"Error extracting images from {url}: {str(e)}"))
+            finally:
+                if page is not None:
+                    healthy = pool.is_healthy(page)
+                    await pool.release(page)
             
-            return self.get_summary()
+            if completed:
+                self._source_done(url)
+            elif not healthy and attempt < pool.max_page_retries:
+                self.emit(warning(f"Page crashed while visiting {url}, retrying on a fresh page"))
+                retries.append((url, attempt + 1))
+    
+    def _source_done(self, url):
+        """Record that every image of an input URL has been queued."""
+        if self.manifest is not None:
+            self.manifest.mark_source_done(url)
+    
+    async def _scrape_url_over_http(self, url, submit):
+        """Feed the images of url to submit without a browser.
+        
+        Returns False if nothing was found or paging failed part way, so the
+        browser visits the URL instead; images already submitted are not
+        downloaded twice.
+        """
+        self.emit(PageStarted(url, "http"))
+        started = time.monotonic()
+        pages = 0
+        extractor = PinterestHTTPExtractor(self.get_session(), max_pages=self.max_scrolls or 1,
+                                           time_budget=self.scroll_time_budget)
+        batches = extractor.iter_pin_images(url)
+        loop = asyncio.get_running_loop()
+        found = set()
+        failed = False
+        try:
+            while True:
+                # Each batch is one blocking HTTP round-trip, so fetch it off the event loop
+                extract_started = time.monotonic()
+                batch = await loop.run_in_executor(None, next, batches, None)
+                self.emit(StageTiming("extract", time.monotonic() - extract_started, url))
+                if batch is None:
+                    break
+                pages += 1
+                count = len(found)
+                for src, pin_id in batch:
+                    if self.max_pins and len(found) >= self.max_pins:
+                        break
+                    if self.is_valid_pinterest_image(src):
+                        high_res_url = self.get_high_res_url(src)
+                        if high_res_url not in found:
+                            found.add(high_res_url)
+                            await submit(high_res_url, pin_id, url)
+                if len(found) > count:
+                    self.emit(UrlsFound(url, len(found) - count, "http"))
+                if self.max_pins and len(found) >= self.max_pins:
+                    break
+        except Exception as e:
+            self.emit(warning(f"HTTP extraction failed for {url}: {str(e)}"))
+            failed = True
+        finally:
+            batches.close()
+        
+        if found and not failed:
+            self.emit(PageFinished(url, "http", len(found), pages, time.monotonic() - started))
+            return True
+        if found:
+            self.emit(info(f"HTTP extraction stopped after {len(found)} images, finishing with the browser"))
+        else:
+            self.emit(info("Nothing found over HTTP, falling back to the browser"))
+        return False
     
     def get_summary(self):
-        """Get download summary."""
+        """Get download summary.
+        
+        In streaming mode downloaded_files and failed_urls are iterators
+        that read results_file lazily; otherwise they are lists.
+        """
+        elapsed = self.download_elapsed
         return {
-            "downloaded_count": len(self.downloaded_images),
-            "failed_count": len(self.failed_downloads),
-            "downloaded_files": self.downloaded_images,
-            "failed_urls": self.failed_downloads,
-            "download_folder": self.download_folder
+            "downloaded_count": self.downloaded_count,
+            "failed_count": self.failed_count,
+            "downloaded_files": self.results.values("downloaded", "path") if self.results else self.downloaded_images,
+            "failed_urls": self.results.values("failed", "url") if self.results else self.failed_downloads,
+            "results_file": self.results.path if self.results else None,
+            "download_folder": self.download_folder,
+            "bytes_downloaded": self.bytes_downloaded,
+            "found_count": self.found_count,
+            "skipped_count": self.skipped_count,
+            "duplicate_count": self.duplicate_count,
+            "unchanged_count": self.unchanged_count,
+            "resumed_count": self.resumed_count,
+            "variant_counts": dict(self.resolver.variant_counts) if self.resolver else {},
+            "probe_count": self.resolver.probe_count if self.resolver else 0,
+            "retry_count": self.retry_count,
+            "throttled_count": self.throttled_count,
+            "breaker_trips": self.breaker_trips,
+            "post_processed_count": self.post_processor.processed_count if self.post_processor else 0,
+            "rejected_count": self.post_processor.rejected_count if self.post_processor else 0,
+            "archive": self.storage.sink.path if self.storage.sink else None,
+            "stage_timings": self.metrics.stage_summary(),
+            "elapsed_seconds": elapsed,
+            "time_to_first_image": self.time_to_first_image,
+            "images_per_second": self.downloaded_count / elapsed if elapsed else 0.0,
+            "mb_per_second": self.bytes_downloaded / (1024 * 1024) / elapsed if elapsed else 0.0
         }
 
 async def main():
@@ -217,6 +1388,8 @@ async def main():
     print(f"Successfully downloaded: {summary['downloaded_count']} images")
     print(f"Failed downloads: {summary['failed_count']}")
     print(f"Images saved to: {summary['download_folder']}")
+    print(f"Throughput: {summary['images_per_second']:.2f} images/s, "
+          f"{summary['mb_per_second']:.2f} MB/s")
     
     if summary['failed_count'] > 0:
         print("\nFailed URLs:")
@@ -5,22 +5,31 @@ A simple graphical interface for downloading Pinterest images.
 
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, scrolledtext
-import asyncio
+import queue
 import threading
-from pinterest_downloader import PinterestDownloader
+import time
+from download_events import DownloadStarted, DownloadFinished, DownloadFailed, BytesReceived
 import os
 
 class PinterestDownloaderGUI:
     def __init__(self, root):
         self.root = root
         self.root.title("Pinterest Image Downloader")
-        self.root.geometry("600x500")
+        self.root.geometry("680x560")
         
         # Variables
         self.download_folder = tk.StringVar(value=os.path.join(os.getcwd(), "downloads"))
         self.urls_text = tk.StringVar()
+        self.page_pool_size = tk.IntVar(value=1)
+        self.concurrency = tk.IntVar(value=8)
+        self.show_browser = tk.BooleanVar(value=False)
+        self.use_service = tk.BooleanVar(value=False)
         self.is_downloading = False
         
+        # Progress events arrive from the download thread through this queue
+        self.events = queue.Queue()
+        self.reset_progress()
+        
         self.setup_ui()
     
     def setup_ui(self):
@@ -60,9 +69,27 @@ class PinterestDownloaderGUI:
         self.url_text = scrolledtext.ScrolledText(url_frame, width=60, height=10)
         self.url_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         
+        # Performance options
+        options_frame = ttk.LabelFrame(main_frame, text="Options", padding="5")
+        options_frame.grid(row=3, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
+        
+        ttk.Label(options_frame, text="Parallel pages:").pack(side=tk.LEFT)
+        ttk.Spinbox(options_frame, from_=1, to=16, width=4,
+                    textvariable=self.page_pool_size).pack(side=tk.LEFT, padx=(5, 15))
+        
+        ttk.Label(options_frame, text="Parallel downloads:").pack(side=tk.LEFT)
+        ttk.Spinbox(options_frame, from_=1, to=64, width=4,
+                    textvariable=self.concurrency).pack(side=tk.LEFT, padx=(5, 15))
+        
+        ttk.Checkbutton(options_frame, text="Show browser",
+                        variable=self.show_browser).pack(side=tk.LEFT, padx=(0, 15))
+        
+        ttk.Checkbutton(options_frame, text="Use background service",
+                        variable=self.use_service).pack(side=tk.LEFT)
+        
         # Buttons frame
         button_frame = ttk.Frame(main_frame)
-        button_frame.grid(row=3, column=0, columnspan=2, pady=(0, 10))
+        button_frame.grid(row=4, column=0, columnspan=2, pady=(0, 10))
         
         self.download_button = ttk.Button(button_frame, text="Download Images", 
                                          command=self.start_download, style="Accent.TButton")
@@ -77,11 +104,62 @@ class PinterestDownloaderGUI:
         
         # Progress bar
         self.progress = ttk.Progressbar(main_frame, mode='indeterminate')
-        self.progress.grid(row=4, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
+        self.progress.grid(row=5, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
         
         # Status label
         self.status_label = ttk.Label(main_frame, text="Ready to download", foreground="green")
-        self.status_label.grid(row=5, column=0, columnspan=2)
+        self.status_label.grid(row=6, column=0, columnspan=2)
+    
+    def reset_progress(self):
+        """Forget the progress of the previous download."""
+        self.total_images = 0
+        self.done_images = 0
+        self.bytes_received = 0
+        self.started_at = time.monotonic()
+    
+    def poll_events(self):
+        """Apply queued progress events to the progress bar and status line."""
+        updated = False
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(event, DownloadStarted):
+                self.total_images = max(self.total_images, event.total)
+            elif isinstance(event, (DownloadFinished, DownloadFailed)):
+                self.done_images += 1
+            elif isinstance(event, BytesReceived):
+                self.bytes_received += event.bytes
+            else:
+                continue
+            updated = True
+        
+        if updated and self.is_downloading:
+            self.show_progress()
+        if self.is_downloading:
+            self.root.after(100, self.poll_events)
+    
+    def show_job_progress(self, progress):
+        """Show the progress of a job running in the background service."""
+        self.total_images = progress['total']
+        self.done_images = progress['done']
+        self.bytes_received = progress['bytes_received']
+        if self.is_downloading and self.total_images:
+            self.show_progress()
+    
+    def show_progress(self):
+        """Update the progress bar and status line from the current counts."""
+        if str(self.progress.cget('mode')) != 'determinate':
+            self.progress.stop()
+            self.progress.config(mode='determinate')
+        self.progress.config(maximum=max(self.total_images, 1), value=self.done_images)
+        elapsed = max(time.monotonic() - self.started_at, 0.001)
+        self.status_label.config(
+            text=f"{self.done_images}/{self.total_images} images - "
+                 f"{self.done_images / elapsed:.1f} images/s, "
+                 f"{self.bytes_received / (1024 * 1024) / elapsed:.2f} MB/s",
+            foreground="blue")
     
     def browse_folder(self):
         """Browse for download folder."""
@@ -123,6 +201,16 @@ class PinterestDownloaderGUI:
             messagebox.showwarning("No URLs", "Please enter at least one Pinterest URL.")
             return
         
+        try:
+            options = {
+                "concurrency": self.concurrency.get(),
+                "page_pool_size": self.page_pool_size.get(),
+                "headless": not self.show_browser.get()
+            }
+        except tk.TclError:
+            messagebox.showwarning("Invalid Options", "Parallel pages and downloads must be whole numbers.")
+            return
+        
         if not os.path.exists(self.download_folder.get()):
             try:
                 os.makedirs(self.download_folder.get(), exist_ok=True)
@@ -133,24 +221,37 @@ class PinterestDownloaderGUI:
         # Start download in separate thread
         self.is_downloading = True
         self.download_button.config(state='disabled', text='Downloading...')
+        # Indeterminate until the first image is queued, then the real count
+        self.reset_progress()
+        self.progress.config(mode='indeterminate', value=0)
         self.progress.start()
+        self.root.after(100, self.poll_events)
         self.status_label.config(text=f"Starting download of {len(urls)} URL(s)...", foreground="blue")
         
         # Run download in thread
-        thread = threading.Thread(target=self.run_download, args=(urls,))
+        target = self.run_service_job if self.use_service.get() else self.run_download
+        thread = threading.Thread(target=target, args=(urls, options))
         thread.daemon = True
         thread.start()
     
-    def run_download(self, urls):
+    def run_download(self, urls, options):
         """Run the download process."""
+        # The downloader and its dependencies load here, off the UI thread, so the window opens at once
+        import asyncio
+        from pinterest_downloader import PinterestDownloader
+        
         try:
             # Create new event loop for this thread
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
             
             # Create downloader and start download
-            downloader = PinterestDownloader(download_folder=self.download_folder.get())
-            summary = loop.run_until_complete(downloader.process_pinterest_urls(urls))
+            downloader = PinterestDownloader(download_folder=self.download_folder.get(),
+                                             on_event=self.events.put, **options)
+            try:
+                summary = loop.run_until_complete(downloader.process_pinterest_urls(urls))
+            finally:
+                downloader.close()
             
             # Update UI on main thread
             self.root.after(0, self.download_completed, summary)
@@ -160,15 +261,48 @@ class PinterestDownloaderGUI:
         finally:
             loop.close()
     
+    def run_service_job(self, urls, options):
+        """Hand the download to the background service and follow it."""
+        from download_daemon import DaemonClient, DaemonError, split_job_options
+        
+        client = DaemonClient()
+        if not client.is_running():
+            self.root.after(0, self.download_error,
+                            "The background service is not running.\n\n"
+                            "Start it with: python download_daemon.py")
+            return
+        # Browser pages and visibility are set when the service starts
+        job_options, _ = split_job_options(options)
+        try:
+            job_id = client.submit(urls, self.download_folder.get(), **job_options)
+            status = client.wait(job_id, interval=0.5, on_status=self.service_status)
+        except DaemonError as e:
+            self.root.after(0, self.download_error, str(e))
+            return
+        if status['status'] == 'done':
+            self.root.after(0, self.download_completed, status['summary'])
+        else:
+            self.root.after(0, self.download_error,
+                            f"Job {job_id} {status['status']}: {status['error'] or 'cancelled'}")
+    
+    def service_status(self, status):
+        """Pass a job status polled from the service to the UI thread."""
+        if status.get('progress'):
+            self.root.after(0, self.show_job_progress, status['progress'])
+    
     def download_completed(self, summary):
         """Handle download completion."""
+        self.poll_events()
         self.is_downloading = False
         self.download_button.config(state='normal', text='Download Images')
         self.progress.stop()
+        self.progress.config(mode='determinate', maximum=1, value=1)
         
         message = (f"Download completed!\\n\\n"
                   f"Successfully downloaded: {summary['downloaded_count']} images\\n"
                   f"Failed downloads: {summary['failed_count']}\\n"
+                  f"Throughput: {summary['images_per_second']:.2f} images/s, "
+                  f"{summary['mb_per_second']:.2f} MB/s\\n"
                   f"Images saved to: {summary['download_folder']}")
         
         self.status_label.config(text=f"Downloaded {summary['downloaded_count']} images", 
@@ -191,6 +325,7 @@ class PinterestDownloaderGUI:
         self.is_downloading = False
         self.download_button.config(state='normal', text='Download Images')
         self.progress.stop()
+        self.progress.config(mode='determinate', value=0)
         self.status_label.config(text="Download failed", foreground="red")
         
         messagebox.showerror("Download Error", f"An error occurred during download:\\n\\n{error_message}")
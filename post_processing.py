@@ -0,0 +1,273 @@
+"""
+Pinterest Image Downloader - Post-processing
+Checks and converts downloaded files in a pool of processes, so decoding
+never holds up the download threads or the event loop. A file passes
+through a list of stages: VerifyImage deletes truncated files and HTML
+error pages saved as images, Transcode converts formats or caps the size,
+Thumbnail writes a small preview and ImageMetadata reads dimensions and
+EXIF. Any picklable callable taking the result dict can be a stage.
+"""
+
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from download_events import ImageProcessed, ImageRejected, StageTiming, warning
+from storage_layout import allocate_path
+
+# Image metadata of a run, one JSON line per file, written to the download folder
+METADATA_FILENAME = ".pinterest_metadata.jsonl"
+
+# Subfolder of the download folder that holds thumbnails
+THUMBNAIL_FOLDER = ".thumbnails"
+
+# File extension written for each Pillow format
+FORMAT_EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp', 'GIF': '.gif'}
+
+# Longest EXIF value kept in the metadata, in characters
+MAX_EXIF_VALUE = 200
+
+class RejectImage(Exception):
+    """Raised by a stage when a file is not a usable image; the file is deleted."""
+
+class VerifyImage:
+    """Reject files that are not complete images.
+
+    Catches HTML or JSON error bodies served with a 200, files Pillow cannot
+    identify, and truncated images that only fail when fully decoded.
+    """
+
+    def __call__(self, result):
+        from PIL import Image
+
+        with open(result["path"], 'rb') as f:
+            head = f.read(512).lstrip().lower()
+        if head.startswith((b'<!doctype html', b'<html', b'<?xml', b'{')):
+            raise RejectImage("an HTML or JSON page, not an image")
+        try:
+            with Image.open(result["path"]) as image:
+                image.verify()
+            # verify() does not decode the pixels; load() does and notices truncation
+            with Image.open(result["path"]) as image:
+                image.load()
+        except Exception as e:
+            raise RejectImage(f"not a valid image ({e})")
+
+class Transcode:
+    """Convert formats (by default WebP to JPEG) and shrink images larger than max_side.
+
+    formats maps Pillow format names to the format to convert to. Animated
+    images are left alone. A converted file gets the new extension.
+    """
+
+    def __init__(self, formats=None, max_side=None, quality=90):
+        self.formats = {'WEBP': 'JPEG'} if formats is None else formats
+        self.max_side = max_side
+        self.quality = quality
+
+    def __call__(self, result):
+        from PIL import Image
+
+        path = result["path"]
+        with Image.open(path) as image:
+            if getattr(image, 'is_animated', False):
+                return
+            target = self.formats.get(image.format, image.format)
+            too_big = self.max_side and max(image.size) > self.max_side
+            if target == image.format and not too_big:
+                return
+            image.load()
+            exif = image.info.get('exif')
+            if too_big:
+                image.thumbnail((self.max_side, self.max_side), Image.LANCZOS)
+            if target == 'JPEG' and image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            options = {'quality': self.quality} if target in ('JPEG', 'WEBP') else {}
+            if exif and target in ('JPEG', 'WEBP'):
+                options['exif'] = exif
+            ext = FORMAT_EXTENSIONS.get(target, os.path.splitext(path)[1])
+            if path.lower().endswith(ext):
+                new_path = path
+            else:
+                base_name = os.path.splitext(os.path.basename(path))[0]
+                new_path = allocate_path(os.path.dirname(path), base_name + ext)
+            temp_path = new_path + '.tmp'
+            image.save(temp_path, target, **options)
+        os.replace(temp_path, new_path)
+        if new_path != path:
+            os.remove(path)
+        result["path"] = new_path
+        result["transcoded"] = target
+
+class Thumbnail:
+    """Write a JPEG preview at most size pixels on its longest side to a subfolder."""
+
+    def __init__(self, size=256, folder=THUMBNAIL_FOLDER, quality=85):
+        self.size = size
+        self.folder = folder
+        self.quality = quality
+
+    def __call__(self, result):
+        from PIL import Image
+
+        path = result["path"]
+        folder = os.path.join(os.path.dirname(path), self.folder)
+        os.makedirs(folder, exist_ok=True)
+        thumbnail = os.path.join(folder, os.path.splitext(os.path.basename(path))[0] + '.jpg')
+        with Image.open(path) as image:
+            image.thumbnail((self.size, self.size), Image.LANCZOS)
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            image.save(thumbnail, 'JPEG', quality=self.quality)
+        result["thumbnail"] = thumbnail
+
+class ImageMetadata:
+    """Record dimensions, format and (with exif) the readable EXIF tags."""
+
+    def __init__(self, exif=True):
+        self.exif = exif
+
+    def __call__(self, result):
+        from PIL import Image, ExifTags
+
+        with Image.open(result["path"]) as image:
+            metadata = {
+                "width": image.width,
+                "height": image.height,
+                "format": image.format,
+                "mode": image.mode,
+                "frames": getattr(image, 'n_frames', 1),
+                "bytes": os.path.getsize(result["path"]),
+            }
+            if self.exif:
+                exif = image.getexif()
+                tags = dict(exif)
+                tags.update(exif.get_ifd(ExifTags.IFD.Exif))
+                metadata["exif"] = {
+                    ExifTags.TAGS.get(tag, str(tag)): str(value)[:MAX_EXIF_VALUE]
+                    for tag, value in tags.items() if not isinstance(value, bytes)
+                }
+        result["metadata"] = metadata
+
+def build_stages(verify=True, transcode=False, max_side=None, thumbnails=None, metadata=False):
+    """Return the stage list for the common options, in the order they should run."""
+    stages = []
+    if verify:
+        stages.append(VerifyImage())
+    if transcode or max_side:
+        stages.append(Transcode(formats=None if transcode else {}, max_side=max_side))
+    if thumbnails:
+        stages.append(Thumbnail(thumbnails))
+    if metadata:
+        stages.append(ImageMetadata())
+    return stages
+
+def run_stages(path, url, stages):
+    """Run every stage on one file, in a pool process.
+
+    Returns the result dict; a rejected file is deleted and its result has
+    "rejected" set. Other stage errors are reported in "error" and leave
+    the file as it is.
+    """
+    result = {"path": path, "url": url}
+    started = time.monotonic()
+    try:
+        for stage in stages:
+            stage(result)
+    except RejectImage as e:
+        result["rejected"] = str(e)
+        try:
+            os.remove(result["path"])
+        except OSError:
+            pass
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = time.monotonic() - started
+    return result
+
+class PostProcessor:
+    """Run post-processing stages on downloaded files in a process pool.
+
+    submit() returns at once; on_done(result) is called from a pool thread
+    when a file is finished. Results are reported to on_event as
+    ImageProcessed / ImageRejected events, and those with metadata are
+    appended to metadata_file. The pool (workers processes, default: one
+    per CPU) is started by the first submit().
+    """
+
+    def __init__(self, stages, workers=None, on_event=None, metadata_file=None):
+        self.stages = list(stages)
+        self.workers = workers
+        self.on_event = on_event
+        self.metadata_file = metadata_file
+        self.processed_count = 0
+        self.rejected_count = 0
+        self._executor = None
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._metadata = None
+
+    def submit(self, path, url, on_done=None):
+        with self._lock:
+            if self._executor is None:
+                # Spawned, not forked: the downloader runs threads, and Windows has no fork anyway
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            future = self._executor.submit(run_stages, path, url, self.stages)
+            self._pending.add(future)
+        future.add_done_callback(lambda f: self._finished(f, path, url, on_done))
+        return future
+
+    def pending(self):
+        """Return the futures of files still being processed."""
+        with self._lock:
+            return list(self._pending)
+
+    def _finished(self, future, path, url, on_done):
+        with self._lock:
+            self._pending.discard(future)
+        try:
+            result = future.result()
+        except Exception as e:
+            # The pool itself failed (e.g. a worker process died); keep the file unprocessed
+            result = {"path": path, "url": url, "seconds": 0.0, "error": f"{type(e).__name__}: {e}"}
+        if "rejected" in result:
+            with self._lock:
+                self.rejected_count += 1
+            self._emit(ImageRejected(url, path, result["rejected"]))
+        else:
+            with self._lock:
+                self.processed_count += 1
+            if "error" in result:
+                self._emit(warning(f"Post-processing {os.path.basename(path)} failed: {result['error']}"))
+            self._emit(StageTiming("postprocess", result["seconds"], url))
+            self._emit(ImageProcessed(url, result["path"], result["seconds"], result.get("thumbnail")))
+            if "metadata" in result and self.metadata_file:
+                self._write_metadata(result)
+        if on_done is not None:
+            on_done(result)
+
+    def _emit(self, event):
+        if self.on_event is not None:
+            self.on_event(event)
+
+    def _write_metadata(self, result):
+        record = {key: result.get(key) for key in ("url", "path", "thumbnail", "metadata")}
+        line = json.dumps(record)
+        with self._lock:
+            if self._metadata is None:
+                self._metadata = open(self.metadata_file, 'a', encoding='utf-8')
+            self._metadata.write(line + "\n")
+
+    def close(self):
+        """Wait for the files still being processed, then stop the pool."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        with self._lock:
+            if self._metadata is not None:
+                self._metadata.close()
+                self._metadata = None
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Pinterest Image Downloader - Storage layouts
+Decides where in the download folder a file goes: all in one folder
+('flat'), sharded by content hash ('hash'), one folder per input board or
+search ('board'), or one per day ('date'). Paths are claimed with an
+exclusive create, so concurrent writers never get the same name. Run this
+module to move an existing folder into another layout.
+"""
+
+import hashlib
+import os
+import re
+import sys
+from datetime import datetime
+from urllib.parse import urlparse, parse_qs
+
+from download_manifest import DownloadManifest, MANIFEST_FILENAME
+
+LAYOUTS = ('flat', 'hash', 'board', 'date')
+
+# Ways of handling a downloaded file whose content is already in the folder
+DEDUP_MODES = ('off', 'skip', 'hardlink')
+
+# Folder for images whose input URL is unknown, in the board layout
+UNSORTED_FOLDER = "unsorted"
+
+def _slug(text):
+    return re.sub(r'[^\w\-.]+', '-', text).strip('-.')[:80]
+
+def board_folder(source):
+    """Return the relative folder for images found on an input URL, e.g. "user/board"."""
+    if not source:
+        return UNSORTED_FOLDER
+    parsed = urlparse(source)
+    parts = [part for part in parsed.path.split('/') if part]
+    if parts and parts[0] == 'search':
+        query = parse_qs(parsed.query).get('q', [''])[0]
+        return os.path.join('search', _slug(query) or 'all')
+    if parts and parts[0] == 'pin':
+        return 'pins'
+    parts = [_slug(part) for part in parts[:2]]
+    parts = [part for part in parts if part]
+    return os.path.join(*parts) if parts else UNSORTED_FOLDER
+
+def layout_folder(layout, sha256=None, source=None, when=None):
+    """Return the folder, relative to the download folder, a file belongs in under a layout.
+
+    'hash' uses the first four hex digits of the content hash (two levels
+    of 256 folders), 'board' the input URL and 'date' the download day.
+    """
+    if layout == 'flat':
+        return ''
+    if layout == 'hash':
+        if not sha256:
+            raise ValueError("the hash layout needs the file's SHA-256")
+        return os.path.join(sha256[:2], sha256[2:4])
+    if layout == 'board':
+        return board_folder(source)
+    if layout == 'date':
+        return (when or datetime.now()).strftime(os.path.join('%Y', '%m', '%d'))
+    raise ValueError(f"layout must be one of {', '.join(LAYOUTS)}")
+
+def allocate_path(folder, filename, unique_hint=None):
+    """Create an empty file named filename in folder and return its path.
+
+    The file is created exclusively, so no other thread or process can take
+    the name. On a collision the name gets unique_hint (e.g. part of the
+    content hash) appended, which almost always succeeds in one more try;
+    only then does it fall back to a counter.
+    """
+    os.makedirs(folder, exist_ok=True)
+    base_name, ext = os.path.splitext(filename)
+    candidates = [filename]
+    if unique_hint:
+        candidates.append(f"{base_name}-{unique_hint}{ext}")
+    for candidate in candidates:
+        path = os.path.join(folder, candidate)
+        try:
+            open(path, 'xb').close()
+            return path
+        except FileExistsError:
+            pass
+    base_name = os.path.splitext(candidates[-1])[0]
+    counter = 1
+    while True:
+        path = os.path.join(folder, f"{base_name}_{counter}{ext}")
+        try:
+            open(path, 'xb').close()
+            return path
+        except FileExistsError:
+            counter += 1
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def iter_image_files(folder):
+    """Yield the downloaded files in a folder and its subfolders, skipping hidden bookkeeping."""
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        for name in files:
+            if not name.startswith('.'):
+                yield os.path.join(root, name)
+
+def migrate_folder(folder, layout, dry_run=False, on_move=None):
+    """Move every file in a download folder to where layout puts it.
+
+    Works from any layout to any other. The folder's manifest provides the
+    content hash, input URL and download date of each file and is updated
+    with the new paths; a move keeps the download date, so migrating twice
+    gives the same folders. Files it does not know (or downloaded before it
+    kept that date) are hashed, dated by their modification time and, in
+    the board layout, go to "unsorted". Hardlinked
+    duplicates are moved like any other file. Returns the number of files
+    moved; with dry_run nothing is changed. on_move(old, new) is called for
+    every move.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"layout must be one of {', '.join(LAYOUTS)}")
+    manifest = None
+    if os.path.exists(os.path.join(folder, MANIFEST_FILENAME)):
+        manifest = DownloadManifest.for_folder(folder)
+    moved = 0
+    try:
+        rows = manifest.files_by_path() if manifest is not None else {}
+        for path in list(iter_image_files(folder)):
+            file_rows = rows.get(os.path.abspath(path), [])
+            row = file_rows[0] if file_rows else None
+            sha256 = row["sha256"] if row is not None and row["sha256"] else None
+            if layout == 'hash' and sha256 is None:
+                sha256 = _file_sha256(path)
+            when = None
+            if layout == 'date':
+                if row is not None and row["downloaded_at"]:
+                    when = datetime.fromisoformat(row["downloaded_at"])
+                else:
+                    when = datetime.fromtimestamp(os.path.getmtime(path))
+            source = row["source"] if row is not None else None
+            target_folder = os.path.join(folder, layout_folder(layout, sha256, source, when))
+            if os.path.abspath(os.path.dirname(path)) == os.path.abspath(target_folder):
+                continue
+            if dry_run:
+                new_path = os.path.join(target_folder, os.path.basename(path))
+            else:
+                new_path = allocate_path(target_folder, os.path.basename(path), sha256[:8] if sha256 else None)
+                os.replace(path, new_path)
+                for file_row in file_rows:
+                    manifest.record_moved(file_row["url"], new_path)
+            moved += 1
+            if on_move is not None:
+                on_move(path, new_path)
+        if not dry_run:
+            _remove_empty_folders(folder)
+    finally:
+        if manifest is not None:
+            manifest.close()
+    return moved
+
+def _remove_empty_folders(folder):
+    for root, dirs, files in os.walk(folder, topdown=False):
+        relative = os.path.relpath(root, folder)
+        if relative == '.' or any(part.startswith('.') for part in relative.split(os.sep)):
+            continue
+        if not os.listdir(root):
+            os.rmdir(root)
+
+def main():
+    """Move an existing download folder into another layout."""
+    args = sys.argv[1:]
+    if len(args) < 3 or args[1] != '--layout' or args[2] not in LAYOUTS:
+        print("Usage:")
+        print("  python storage_layout.py <download_folder> --layout <flat|hash|board|date> [--dry-run]")
+        return
+    folder, layout = args[0], args[2]
+    dry_run = '--dry-run' in args
+    if not os.path.isdir(folder):
+        print(f"Error: {folder} is not a folder")
+        return
+
+    def show(old, new):
+        print(f"{os.path.relpath(old, folder)} -> {os.path.relpath(new, folder)}")
+
+    moved = migrate_folder(folder, layout, dry_run=dry_run, on_move=show)
+    print(f"{'Would move' if dry_run else 'Moved'} {moved} file(s) into the {layout} layout")
+
+if __name__ == "__main__":
+    main()
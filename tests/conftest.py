@@ -0,0 +1,117 @@
+"""
+Shared fixtures: local HTTP stub servers standing in for Pinterest and its CDN.
+"""
+
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+
+# The modules live at the top of the repository, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+class StubServer:
+    """A ThreadingHTTPServer on a free local port that answers every request with handle(request).
+
+    handle receives the BaseHTTPRequestHandler and writes the response
+    itself. Every request is logged as (method, path, headers) in requests.
+    """
+
+    def __init__(self, handle):
+        self.handle = handle
+        self.requests = []
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                stub._log(self)
+                stub.handle(self)
+
+            def do_HEAD(self):
+                stub._log(self)
+                stub.handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def _log(self, request):
+        with self._lock:
+            self.requests.append((request.command, request.path, dict(request.headers)))
+
+    def paths(self, prefix=""):
+        with self._lock:
+            return [path for _, path, _ in self.requests if path.startswith(prefix)]
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+def send(request, status=200, body=b"", content_type="application/octet-stream", headers=None):
+    """Write a complete response to request."""
+    request.send_response(status)
+    request.send_header("Content-Type", content_type)
+    request.send_header("Content-Length", str(len(body)))
+    for name, value in (headers or {}).items():
+        request.send_header(name, value)
+    request.end_headers()
+    if request.command != "HEAD":
+        request.wfile.write(body)
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return f.read()
+
+@pytest.fixture
+def stub_server():
+    """Return a factory that starts a StubServer for a handler; all are stopped after the test."""
+    servers = []
+
+    def start(handle):
+        server = StubServer(handle)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+def serve_pinterest(request):
+    """Answer like pinterest.com from the recorded responses in tests/fixtures."""
+    parsed = urlparse(request.path)
+    if parsed.path == "/cats/fluffy-cats/":
+        send(request, body=read_fixture("board.html"), content_type="text/html; charset=utf-8")
+    elif parsed.path == "/pin/1006/":
+        send(request, body=read_fixture("pin.html"), content_type="text/html; charset=utf-8")
+    elif parsed.path == "/search/pins/":
+        send(request, body=read_fixture("search.html"), content_type="text/html; charset=utf-8")
+    elif parsed.path == "/resource/BoardFeedResource/get/":
+        options = json.loads(parse_qs(parsed.query)["data"][0])["options"]
+        name = "board_feed_2.json" if options.get("bookmarks") else "board_feed_1.json"
+        send(request, body=read_fixture(name), content_type="application/json")
+    elif parsed.path == "/resource/BaseSearchResource/get/":
+        send(request, body=read_fixture("search_1.json"), content_type="application/json")
+    else:
+        send(request, 404, b"Not Found", content_type="text/plain")
+
+@pytest.fixture
+def pinterest_stub(stub_server):
+    """A StubServer serving the recorded Pinterest board, pin and search responses."""
+    return stub_server(serve_pinterest)
@@ -0,0 +1,159 @@
+"""
+Tests for resumable transfers and revalidation against a stub CDN that honours Range, If-Range and ETags.
+"""
+
+import os
+import zipfile
+
+import pytest
+
+from downloader_options import StorageOptions
+from output_sinks import build_sink
+from pinterest_downloader import PinterestDownloader, PARTIAL_FOLDER
+from conftest import send
+
+IMAGE_SIZE = 200 * 1024
+
+class FakeCDN:
+    """Serve one image with an ETag, answering conditional and ranged requests like the CDN."""
+
+    def __init__(self):
+        self.set_image(os.urandom(IMAGE_SIZE), '"v1"')
+        # Bytes to send before dropping the connection on the next full response
+        self.cut_after = None
+
+    def set_image(self, body, etag):
+        self.body = body
+        self.etag = etag
+
+    def __call__(self, request):
+        if request.headers.get("If-None-Match") == self.etag:
+            send(request, 304, headers={"ETag": self.etag})
+            return
+        ranged = request.headers.get("Range")
+        if ranged and request.headers.get("If-Range", self.etag) == self.etag:
+            start = int(ranged.split("=")[1].rstrip("-"))
+            send(request, 206, self.body[start:], "image/jpeg", {
+                "ETag": self.etag,
+                "Content-Range": f"bytes {start}-{len(self.body) - 1}/{len(self.body)}"
+            })
+            return
+        if self.cut_after is None:
+            send(request, 200, self.body, "image/jpeg", {"ETag": self.etag})
+            return
+        # Promise the whole image, then hang up part way through
+        request.send_response(200)
+        request.send_header("Content-Type", "image/jpeg")
+        request.send_header("Content-Length", str(len(self.body)))
+        request.send_header("ETag", self.etag)
+        request.end_headers()
+        request.wfile.write(self.body[:self.cut_after])
+        request.close_connection = True
+        self.cut_after = None
+
+@pytest.fixture
+def cdn(stub_server):
+    fake = FakeCDN()
+    fake.server = stub_server(fake)
+    fake.url = fake.server.url + "/originals/aa/bb/cc/aabbcc0011223344.jpg"
+    return fake
+
+@pytest.fixture
+def downloader(tmp_path):
+    # A write buffer larger than the whole image must not hold back resumable bytes
+    downloader = PinterestDownloader(download_folder=str(tmp_path), quiet=True,
+                                     storage=StorageOptions(write_buffer=4 * 1024 * 1024))
+    downloader.get_manifest()
+    yield downloader
+    downloader.close()
+
+def partial_files(downloader):
+    folder = os.path.join(downloader.download_folder, PARTIAL_FOLDER)
+    return [os.path.join(folder, name) for name in os.listdir(folder)] if os.path.isdir(folder) else []
+
+def images(downloader):
+    return [name for name in os.listdir(downloader.download_folder) if name.endswith(".jpg")]
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def test_interrupted_transfer_resumes_with_range(cdn, downloader):
+    cdn.cut_after = 100 * 1024
+
+    assert downloader.download_image(cdn.url) is None
+    assert images(downloader) == []
+    [partial] = partial_files(downloader)
+    received = os.path.getsize(partial)
+    assert received >= 64 * 1024
+
+    path = downloader.download_image(cdn.url)
+
+    assert read(path) == cdn.body
+    assert partial_files(downloader) == []
+    assert downloader.resumed_count == 1
+    first, retry = [headers for _, _, headers in cdn.server.requests]
+    assert "Range" not in first
+    assert retry["Range"] == f"bytes={received}-"
+    assert retry["If-Range"] == '"v1"'
+
+def test_unchanged_image_is_revalidated_with_304(cdn, downloader):
+    path = downloader.download_image(cdn.url)
+
+    assert downloader.download_image(cdn.url) == path
+    assert downloader.unchanged_count == 1
+    assert cdn.server.requests[-1][2]["If-None-Match"] == '"v1"'
+    assert read(path) == cdn.body
+
+def test_relative_folder_is_found_from_another_directory(cdn, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    first = PinterestDownloader(download_folder="images", quiet=True)
+    first.get_manifest()
+    path = first.download_image(cdn.url)
+    first.close()
+    os.mkdir("elsewhere")
+    monkeypatch.chdir("elsewhere")
+
+    second = PinterestDownloader(download_folder="../images", quiet=True)
+    second.get_manifest()
+
+    assert second.download_image(cdn.url) == path
+    assert second.unchanged_count == 1
+    second.close()
+
+def test_changed_etag_replaces_file_in_place(cdn, downloader):
+    path = downloader.download_image(cdn.url)
+    cdn.set_image(os.urandom(IMAGE_SIZE), '"v2"')
+
+    assert downloader.download_image(cdn.url) == path
+    assert read(path) == cdn.body
+    assert images(downloader) == [os.path.basename(path)]
+    assert downloader.unchanged_count == 0
+
+def test_if_range_mismatch_downloads_whole_new_image(cdn, downloader):
+    cdn.cut_after = 100 * 1024
+    downloader.download_image(cdn.url)
+    cdn.set_image(os.urandom(IMAGE_SIZE), '"v2"')
+
+    path = downloader.download_image(cdn.url)
+
+    assert cdn.server.requests[-1][2]["If-Range"] == '"v1"'
+    assert read(path) == cdn.body
+    assert downloader.resumed_count == 0
+    assert partial_files(downloader) == []
+
+def test_interrupted_archive_transfer_closes_its_buffer(cdn, tmp_path):
+    sink = build_sink("zip", str(tmp_path))
+    buffers = []
+    open_buffer = sink.open_buffer
+    sink.open_buffer = lambda: buffers.append(open_buffer()) or buffers[-1]
+    downloader = PinterestDownloader(download_folder=str(tmp_path), quiet=True, storage=StorageOptions(sink=sink))
+    cdn.cut_after = 100 * 1024
+
+    assert downloader.download_image(cdn.url) is None
+    assert downloader.download_image(cdn.url) is not None
+    downloader.close()
+
+    assert [buffer.closed for buffer in buffers] == [True, True]
+    with zipfile.ZipFile(sink.path) as archive:
+        assert [archive.read(name) for name in archive.namelist()] == [cdn.body]
@@ -0,0 +1,133 @@
+"""
+Tests for retries, throttling and the circuit breaker against a stub CDN that injects 429 and 5xx responses.
+"""
+
+import asyncio
+import time
+
+import requests
+
+from download_events import DownloadsPaused
+from fetch_scheduler import (CLOSED, OPEN, HALF_OPEN, AdaptiveLimit, CircuitBreaker, FetchScheduler,
+                             TransientFetchError, check_response)
+from downloader_options import ResolutionPolicy
+from pinterest_downloader import PinterestDownloader
+from conftest import send
+
+class FlakyCDN:
+    """Answer each path with its queued statuses in turn, then with an image."""
+
+    def __init__(self, script):
+        self.script = {path: list(statuses) for path, statuses in script.items()}
+        self.times = {}
+
+    def __call__(self, request):
+        self.times.setdefault(request.path, []).append(time.monotonic())
+        statuses = self.script.get(request.path)
+        if statuses is None:
+            send(request, 404, b"Not Found", "text/plain")
+        elif statuses:
+            status, headers = statuses.pop(0)
+            send(request, status, b"busy", "text/plain", headers)
+        else:
+            send(request, 200, b"\xff\xd8\xff" + request.path.encode() * 64, "image/jpeg")
+
+def fetch_over_http(url):
+    """A fetch callable for FetchScheduler.run that GETs url in a thread."""
+    def get():
+        response = requests.get(url, timeout=5)
+        check_response(response)
+        return response.status_code
+    return lambda: asyncio.get_running_loop().run_in_executor(None, get)
+
+def test_downloads_recover_from_throttling_and_server_errors(stub_server, tmp_path):
+    cdn = FlakyCDN({
+        "/originals/aa/bb/cc/throttled.jpg": [(429, {"Retry-After": "1"})],
+        "/originals/dd/ee/ff/flaky.jpg": [(503, {}), (500, {})],
+    })
+    server = stub_server(cdn)
+    downloader = PinterestDownloader(download_folder=str(tmp_path), use_manifest=False,
+                                     resolution=ResolutionPolicy(probe_resolutions=False), quiet=True)
+
+    asyncio.run(downloader.download_images([
+        server.url + "/originals/aa/bb/cc/throttled.jpg",
+        server.url + "/originals/dd/ee/ff/flaky.jpg",
+        server.url + "/originals/00/11/22/gone.jpg",
+    ]))
+    downloader.close()
+
+    summary = downloader.get_summary()
+    assert summary["downloaded_count"] == 2
+    assert summary["failed_count"] == 1
+    assert summary["retry_count"] == 3
+    assert summary["throttled_count"] == 2
+    first, retry = cdn.times["/originals/aa/bb/cc/throttled.jpg"]
+    assert retry - first >= 1.0
+    assert len(cdn.times["/originals/dd/ee/ff/flaky.jpg"]) == 3
+    # A missing image is not worth retrying
+    assert len(cdn.times["/originals/00/11/22/gone.jpg"]) == 1
+
+def test_scheduler_gives_up_after_max_retries(stub_server):
+    cdn = FlakyCDN({"/down.jpg": [(500, {})] * 10})
+    server = stub_server(cdn)
+    events = []
+
+    async def run():
+        scheduler = FetchScheduler(2, max_retries=2, backoff_base=0.01, on_event=events.append)
+        try:
+            await scheduler.run("cdn", fetch_over_http(server.url + "/down.jpg"))
+        except TransientFetchError as e:
+            return scheduler, e
+
+    scheduler, error = asyncio.run(run())
+
+    assert error.status == 500
+    assert scheduler.retry_count == 2
+    assert len(cdn.times["/down.jpg"]) == 3
+
+def test_throttled_response_halves_concurrency(stub_server):
+    server = stub_server(FlakyCDN({"/busy.jpg": [(429, {})]}))
+
+    async def run():
+        scheduler = FetchScheduler(8, backoff_base=0.01, on_event=lambda event: None)
+        status = await scheduler.run("cdn", fetch_over_http(server.url + "/busy.jpg"))
+        return scheduler, status
+
+    scheduler, status = asyncio.run(run())
+
+    assert status == 200
+    assert scheduler.throttled_count == 1
+    # Halved by the 429, then one additive step for the success
+    assert scheduler._limits["cdn"].limit == 4.25
+
+def test_adaptive_limit_decreases_once_per_interval():
+    limit = AdaptiveLimit(8, decrease_interval=60)
+
+    limit.decrease()
+    limit.decrease()
+
+    assert limit.limit == 4
+
+def test_circuit_breaker_opens_then_closes_after_probe():
+    events = []
+    breaker = CircuitBreaker(failure_ratio=0.5, window=4, min_calls=4, cooldown=0.05, on_event=events.append)
+
+    for ok in (True, False, True, False):
+        breaker.record(ok)
+
+    assert breaker.state == OPEN
+    assert breaker.trips == 1
+    assert isinstance(events[0], DownloadsPaused)
+
+    # The failed probe reopens the breaker for twice as long
+    asyncio.run(breaker.wait())
+    assert breaker.state == HALF_OPEN
+    breaker.record(False)
+    assert breaker.state == OPEN
+    assert breaker.cooldown == 0.1
+
+    asyncio.run(breaker.wait())
+    breaker.record(True)
+    assert breaker.state == CLOSED
+    assert breaker.cooldown == 0.05
+    assert breaker.trips == 2
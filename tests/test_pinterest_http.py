@@ -0,0 +1,130 @@
+"""
+Tests for the HTTP-only extraction path against a stub serving recorded Pinterest responses.
+"""
+
+import asyncio
+import json
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+import requests
+
+from pinterest_downloader import BrowserPagePool, PinterestDownloader
+from pinterest_http import PinterestHTTPExtractor, find_pin_images
+from conftest import read_fixture, send, serve_pinterest
+
+def resource_options(path):
+    """Return the options a resource request was sent with."""
+    return json.loads(parse_qs(urlparse(path).query)["data"][0])["options"]
+
+def extract(url):
+    with requests.Session() as session:
+        return list(PinterestHTTPExtractor(session).iter_pin_images(url))
+
+def test_board_pages_through_feed_with_bookmarks(pinterest_stub):
+    pages = extract(pinterest_stub.url + "/cats/fluffy-cats/")
+
+    assert [sorted(pin_id for _, pin_id in page) for page in pages] == [
+        ["1001", "1002"], ["1003", "1004"], ["1005"]
+    ]
+    feed = pinterest_stub.paths("/resource/BoardFeedResource/")
+    assert len(feed) == 2
+    assert resource_options(feed[0]) == {"board_id": "901", "page_size": 25}
+    first_page = json.loads(read_fixture("board_feed_1.json"))
+    assert resource_options(feed[1])["bookmarks"] == [first_page["resource_response"]["bookmark"]]
+    # The board ID came from the embedded JSON, so BoardResource was never asked
+    assert not pinterest_stub.paths("/resource/BoardResource/")
+
+def test_pin_page_resolves_from_embedded_json(pinterest_stub):
+    pages = extract(pinterest_stub.url + "/pin/1006/")
+
+    assert pages == [[("https://i.pinimg.com/originals/fe/dc/ba/fedcba9876543210fedcba9876543210.jpg", "1006")]]
+    assert pinterest_stub.paths() == ["/pin/1006/"]
+
+def test_search_uses_search_resource(pinterest_stub):
+    pages = extract(pinterest_stub.url + "/search/pins/?q=cats")
+
+    assert sorted(pin_id for page in pages for _, pin_id in page) == ["1007", "1008"]
+    search = pinterest_stub.paths("/resource/BaseSearchResource/")
+    assert len(search) == 1
+    assert resource_options(search[0]) == {"query": "cats", "scope": "pins", "page_size": 25}
+
+def test_find_pin_images_prefers_orig_then_widest():
+    data = [
+        {"id": "1", "images": {
+            "236x": {"url": "https://i.pinimg.com/236x/a.jpg", "width": 236},
+            "orig": {"url": "https://i.pinimg.com/originals/a.jpg", "width": 1200},
+        }},
+        {"id": 2, "images": {
+            "236x": {"url": "https://i.pinimg.com/236x/b.jpg", "width": 236},
+            "736x": {"url": "https://i.pinimg.com/736x/b.jpg", "width": 736},
+            "474x": {"url": "https://i.pinimg.com/474x/b.jpg", "width": 474},
+        }},
+        {"id": "3", "images": {"orig": None}},
+    ]
+
+    assert sorted(find_pin_images(data)) == [
+        ("https://i.pinimg.com/736x/b.jpg", "2"),
+        ("https://i.pinimg.com/originals/a.jpg", "1"),
+    ]
+
+def test_list_images_resolves_board_without_browser(pinterest_stub, tmp_path):
+    downloader = PinterestDownloader(download_folder=str(tmp_path), use_manifest=False, quiet=True)
+    found = []
+
+    count = asyncio.run(downloader.list_images(
+        [pinterest_stub.url + "/cats/fluffy-cats/"],
+        lambda url, pin_id, source: found.append(pin_id)
+    ))
+
+    assert count == 5
+    assert sorted(found) == ["1001", "1002", "1003", "1004", "1005"]
+
+class BrokenPool:
+    """A page pool whose browser never launches."""
+
+    size = 1
+    max_page_retries = 1
+
+    def __init__(self):
+        self.acquired = 0
+
+    async def acquire(self):
+        self.acquired += 1
+        raise RuntimeError("browser unavailable")
+
+def test_failed_paging_falls_back_to_the_browser(stub_server, tmp_path):
+    def handle(request):
+        if request.path.startswith("/resource/BoardFeedResource/") and "bookmarks" in request.path:
+            send(request, 403, b"Forbidden", content_type="text/plain")
+        else:
+            serve_pinterest(request)
+    server = stub_server(handle)
+    events = []
+    downloader = PinterestDownloader(download_folder=str(tmp_path), use_manifest=False, on_event=events.append)
+    pool = BrokenPool()
+    found = []
+
+    count = asyncio.run(downloader.list_images(
+        [server.url + "/cats/fluffy-cats/"],
+        lambda url, pin_id, source: found.append(pin_id),
+        page_pool=pool
+    ))
+
+    assert count == 4
+    assert sorted(found) == ["1001", "1002", "1003", "1004"]
+    # The browser was asked to finish the board, and its failure ended only that URL
+    assert pool.acquired == 1
+    assert any("browser unavailable" in getattr(event, "text", "") for event in events)
+
+def test_failed_browser_launch_leaves_pool_unstarted(monkeypatch):
+    pool = BrowserPagePool()
+
+    async def launch():
+        raise RuntimeError("browser unavailable")
+    monkeypatch.setattr(pool, "_launch_browser", launch)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(pool.start())
+    assert pool._playwright is None
+    assert pool._idle is None
@@ -0,0 +1,35 @@
+"""
+Tests for the entry points' import budget and for --dry-run leaving the disk untouched.
+"""
+
+import json
+import os
+
+import pytest
+
+import batch_downloader
+from benchmark import STARTUP_MODULES, STARTUP_BUDGET_SECONDS, measure_startup
+
+@pytest.mark.parametrize("module", sorted(STARTUP_MODULES))
+def test_entry_point_imports_within_budget(module):
+    seconds, loaded = measure_startup(module)
+
+    assert loaded == []
+    assert seconds <= STARTUP_BUDGET_SECONDS
+
+@pytest.mark.parametrize("extra", [[], ["--stream"]])
+def test_dry_run_prints_json_lines_and_creates_no_folders(extra, pinterest_stub, tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(batch_downloader, "PINTEREST_HOSTS", ("127.0.0.1",))
+
+    batch_downloader.main(["--dry-run", *extra, pinterest_stub.url + "/cats/fluffy-cats/"])
+
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert sorted(line["pin_id"] for line in lines) == ["1001", "1002", "1003", "1004", "1005"]
+    assert os.listdir(tmp_path) == []
+
+def test_post_workers_without_a_stage_is_rejected(capsys):
+    with pytest.raises(SystemExit):
+        batch_downloader.main(["--post-workers", "2", "https://www.pinterest.com/cats/fluffy-cats/"])
+
+    assert "--post-workers needs a post-processing option" in capsys.readouterr().err